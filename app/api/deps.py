@@ -1,44 +1,43 @@
-from typing import Generator
+from typing import TYPE_CHECKING, AsyncGenerator, Callable
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, Response, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from motor.motor_asyncio import AsyncIOMotorClient
 from pydantic import ValidationError
-from sqlalchemy.orm import Session
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.db.session import SessionLocal
+from app.core.rate_limit import RateLimitExceededError, RateLimitResult, rate_limit_rejected, rate_limiter
+from app.core.resources import resources
+from app.db.session import AsyncSessionLocal
 from app.models import user as models
 from app.schemas import user as schemas
+from app.services.usage_meter import seconds_until_next_day, usage_meter
 from app.services.user_service import UserService
 
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorDatabase
+
 # トークン取得のためのエンドポイント
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
-def get_db() -> Generator:
+async def get_db() -> AsyncGenerator[AsyncSession, None]:
     """
     データベースセッションの依存関係
     """
-    try:
-        db = SessionLocal()
+    async with AsyncSessionLocal() as db:
         yield db
-    finally:
-        db.close()
 
 ## MONGODBの依存関係はここでは定義
-def get_mongo_db() -> Generator:
+def get_mongo_db() -> "AsyncIOMotorDatabase":
     """
     MongoDBセッションの依存関係
+
+    リクエストごとにクライアントを作らず、lifespan で作成した共有クライアント (コネクションプール) を使う
     """
-    try:
-        client = AsyncIOMotorClient(settings.MONGODB_URL)
-        mongodb = client[settings.MONGODB_DB_NAME]
-        yield mongodb
-    finally:
-        client.close()
+    return resources.get_mongo_client()[settings.MONGODB_DB_NAME]
 
-def get_user_service(db: Session = Depends(get_db)) -> UserService:
+def get_user_service(db: AsyncSession = Depends(get_db)) -> UserService:
     """
     ユーザーサービスの依存関係
     
@@ -50,7 +49,7 @@ def get_user_service(db: Session = Depends(get_db)) -> UserService:
     """
     return UserService(db=db)
 
-def get_current_user(
+async def get_current_user(
     user_service: UserService = Depends(get_user_service), token: str = Depends(oauth2_scheme)
 ) -> models.User:
     """
@@ -77,7 +76,7 @@ def get_current_user(
             detail="認証情報が無効です",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    user = user_service.get(user_id=token_data.sub)
+    user = await user_service.get(user_id=token_data.sub)
     if not user:
         raise HTTPException(status_code=404, detail="ユーザーが見つかりません")
     if not user.is_active:
@@ -85,7 +84,27 @@ def get_current_user(
     return user
 
 
-def get_current_active_superuser(
+async def get_current_user_detached(
+    current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)
+) -> models.User:
+    """
+    認証後にセッションを閉じ、DB接続をプールに返す依存関係
+
+    セッションは読み取りのトランザクション中は接続を保持し続けるため、ロングポーリングなど
+    DBを使わずに長く待つエンドポイントではこちらを使う (返すユーザーはセッションから切り離される)
+
+    Args:
+        current_user: 現在のユーザー
+        db: データベースセッション (get_current_user と同じもの)
+
+    Returns:
+        models.User: 現在のユーザー
+    """
+    await db.close()
+    return current_user
+
+
+async def get_current_active_superuser(
     current_user: models.User = Depends(get_current_user),
 ) -> models.User:
     """
@@ -104,4 +123,106 @@ def get_current_active_superuser(
         raise HTTPException(
             status_code=400, detail="十分な権限がありません"
         )
-    return current_user
\ No newline at end of file
+    return current_user
+
+
+def _set_rate_limit_headers(response: Response, result: RateLimitResult) -> None:
+    response.headers["X-RateLimit-Limit"] = str(result.limit)
+    response.headers["X-RateLimit-Remaining"] = str(result.remaining)
+    response.headers["X-RateLimit-Reset"] = str(result.reset_after)
+
+
+async def _enforce_rate_limit(scope: str, principal: str, limit: int, window: int, response: Response) -> None:
+    result = await rate_limiter.hit(f"{scope}:{principal}", limit, window)
+    if not result.allowed:
+        rate_limit_rejected.inc(scope=scope, kind="window")
+        raise RateLimitExceededError(limit=limit, retry_after=max(1, result.reset_after))
+    _set_rate_limit_headers(response, result)
+
+
+def client_ip(request: Request) -> str:
+    """
+    レート制限に使うクライアントIP
+
+    接続元が FORWARDED_ALLOW_IPS に含まれるプロキシ (ingress など) の場合のみ、ProxyHeadersMiddleware により
+    X-Forwarded-For のクライアントの値になる。含まれない場合は接続元 (プロキシ自身) のIPになり、
+    プロキシ経由の全クライアントが同じ枠を共有するため、デプロイ時に必ず設定する
+    """
+    return request.client.host if request.client else "unknown"
+
+
+def user_rate_limit(scope: str, limit: int, window: int) -> Callable:
+    """
+    ログインユーザーごとのリクエスト数制限の依存関係を作成
+
+    Args:
+        scope: 制限の名前 (Redis のキーとメトリクスのラベルに使う)
+        limit: window 秒あたりの上限
+        window: ウィンドウの長さ (秒)
+    """
+
+    async def dependency(response: Response, current_user: models.User = Depends(get_current_user)) -> None:
+        if settings.RATE_LIMIT_ENABLED:
+            await _enforce_rate_limit(scope, f"user:{current_user.id}", limit, window, response)
+
+    return dependency
+
+
+def ip_rate_limit(scope: str, limit: int, window: int) -> Callable:
+    """未ログインのルート (ログイン・登録など) 向けに、クライアントIPごとのリクエスト数制限の依存関係を作成"""
+
+    async def dependency(request: Request, response: Response) -> None:
+        if settings.RATE_LIMIT_ENABLED:
+            await _enforce_rate_limit(scope, f"ip:{client_ip(request)}", limit, window, response)
+
+    return dependency
+
+
+def user_concurrency_limit(scope: str, limit: int) -> Callable:
+    """
+    ログインユーザーごとの同時実行数制限の依存関係を作成
+
+    枠はレスポンスの送信後に返却する
+    """
+
+    async def dependency(current_user: models.User = Depends(get_current_user)) -> AsyncGenerator[None, None]:
+        if not settings.RATE_LIMIT_ENABLED:
+            yield
+            return
+        lease = await rate_limiter.acquire(f"{scope}:inflight:user:{current_user.id}", limit, settings.RATE_LIMIT_CONCURRENCY_TTL)
+        if lease is None:
+            rate_limit_rejected.inc(scope=scope, kind="concurrency")
+            raise RateLimitExceededError(limit=limit, retry_after=settings.RATE_LIMIT_CONCURRENCY_RETRY_AFTER)
+        try:
+            yield
+        finally:
+            await rate_limiter.release(lease)
+
+    return dependency
+
+
+def daily_token_quota(scope: str, quota: int) -> Callable:
+    """
+    ログインユーザーごとの1日 (UTC) あたりの LLM トークン数の上限の依存関係を作成
+
+    集計済みのトークン数 (Mongo) とこのプロセスで未反映の分を合わせて判定する。
+    他の pod の未反映分は含まれないため、上限は最大 USAGE_FLUSH_INTERVAL 秒分だけ超えることがある。
+
+    Args:
+        scope: 制限の名前 (メトリクスのラベルに使う)
+        quota: 1日あたりのトークン数の上限 (0 の場合は制限しない)
+    """
+
+    async def dependency(response: Response, current_user: models.User = Depends(get_current_user)) -> None:
+        if quota <= 0:
+            return
+        used = await usage_meter.daily_tokens(current_user.id)
+        reset_after = seconds_until_next_day()
+        if used >= quota:
+            rate_limit_rejected.inc(scope=scope, kind="token_quota")
+            raise RateLimitExceededError(limit=quota, retry_after=reset_after)
+        response.headers["X-TokenQuota-Limit"] = str(quota)
+        response.headers["X-TokenQuota-Remaining"] = str(quota - used)
+        response.headers["X-TokenQuota-Reset"] = str(reset_after)
+
+    return dependency
@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from .endpoints import auth, chat, healthcheck, user
+from .endpoints import auth, chat, chat_ws, healthcheck, metrics, usage, user
 
 api_router = APIRouter()
 
@@ -15,3 +15,10 @@ api_router.include_router(user.router, prefix="/users", tags=["user"])
 
 # Include the chat router
 api_router.include_router(chat.router, tags=["chat"])
+api_router.include_router(chat_ws.router, tags=["chat"])
+
+# Include the usage router
+api_router.include_router(usage.router, prefix="/usage", tags=["usage"])
+
+# Include the metrics router
+api_router.include_router(metrics.router, prefix="/metrics", tags=["metrics"])
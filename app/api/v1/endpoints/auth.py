@@ -1,3 +1,4 @@
+import asyncio
 import secrets
 from datetime import timedelta
 from typing import Any
@@ -7,26 +8,45 @@ import httpx
 from fastapi import APIRouter, Depends, HTTPException, Request, status
 from fastapi.responses import RedirectResponse
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from redis.asyncio import Redis
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import deps
 from app.core import security
 from app.core.config import settings
+from app.core.http_client import get_http_client
+from app.core.redis_client import get_redis
 from app.core.security import generate_state_token
 from app.schemas import user as schemas
+from app.services.refresh_token_service import RefreshTokenService
 from app.services.user_service import UserService
 
 router = APIRouter()
 
-def get_user_service(db: Session = Depends(deps.get_db)) -> UserService:
+# パスワード総当たりやアカウントの大量作成を防ぐため、認証系のルートはクライアントIPごとに制限する
+auth_rate_limit = deps.ip_rate_limit("auth", settings.RATE_LIMIT_AUTH_REQUESTS, settings.RATE_LIMIT_AUTH_WINDOW)
+# トークンの再発行は通常の利用でも定期的に行われるため、ログイン・登録の枠とは別に数える
+refresh_rate_limit = deps.ip_rate_limit("refresh", settings.RATE_LIMIT_REFRESH_REQUESTS, settings.RATE_LIMIT_REFRESH_WINDOW)
+
+def get_user_service(db: AsyncSession = Depends(deps.get_db)) -> UserService:
     """
     ユーザーサービスの依存関係
     """
     return UserService(db=db)
 
-@router.post("/login/password", response_model=schemas.Token)
-def login_password(
-    user_service: UserService = Depends(get_user_service), form_data: OAuth2PasswordRequestForm = Depends()
+def get_refresh_token_service(
+    user_service: UserService = Depends(get_user_service), redis: Redis = Depends(get_redis)
+) -> RefreshTokenService:
+    """
+    リフレッシュトークンサービスの依存関係
+    """
+    return RefreshTokenService(redis=redis, user_service=user_service)
+
+@router.post("/login/password", response_model=schemas.Token, dependencies=[Depends(auth_rate_limit)])
+async def login_password(
+    user_service: UserService = Depends(get_user_service),
+    refresh_token_service: RefreshTokenService = Depends(get_refresh_token_service),
+    form_data: OAuth2PasswordRequestForm = Depends(),
 ) -> Any:
     """
     メールアドレスとパスワードによる認証
@@ -34,7 +54,7 @@ def login_password(
     - **username**: メールアドレス
     - **password**: パスワード
     """
-    user = user_service.authenticate(
+    user = await user_service.authenticate(
         email=form_data.username, password=form_data.password
     )
     if not user:
@@ -43,7 +63,7 @@ def login_password(
         raise HTTPException(status_code=400, detail="ユーザーは無効です")
     
     # ログイン時間を更新
-    user_service.update_login_time(user=user)
+    await user_service.update_login_time(user=user)
     
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     return {
@@ -52,10 +72,41 @@ def login_password(
         ),
         "token_type": "bearer",
         "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,  # 秒単位
+        "refresh_token": await refresh_token_service.issue(user.id),
     }
 
-@router.post("/register", response_model=schemas.User)
-def register_new_user(
+@router.post("/refresh", response_model=schemas.Token, dependencies=[Depends(refresh_rate_limit)])
+async def refresh_access_token(
+    token_in: schemas.TokenRefresh,
+    refresh_token_service: RefreshTokenService = Depends(get_refresh_token_service),
+) -> Any:
+    """
+    リフレッシュトークンでアクセストークンを再発行
+
+    リフレッシュトークンは使い捨てで、毎回新しいトークンに交換される。
+    使用済みのトークンが再提示された場合は、同じログインから発行されたトークンをすべて失効させる。
+    """
+    rotated = await refresh_token_service.rotate(token_in.refresh_token)
+    if not rotated:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="リフレッシュトークンが無効です",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    user_id, refresh_token = rotated
+
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    return {
+        "access_token": security.create_access_token(
+            user_id, expires_delta=access_token_expires
+        ),
+        "token_type": "bearer",
+        "expires_in": settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60,  # 秒単位
+        "refresh_token": refresh_token,
+    }
+
+@router.post("/register", response_model=schemas.User, dependencies=[Depends(auth_rate_limit)])
+async def register_new_user(
     *,
     user_service: UserService = Depends(get_user_service),
     user_in: schemas.UserCreate,
@@ -63,13 +114,13 @@ def register_new_user(
     """
     新しいユーザーを登録
     """
-    user = user_service.get_by_email(email=user_in.email)
+    user = await user_service.get_by_email(email=user_in.email)
     if user:
         raise HTTPException(
             status_code=400,
             detail="このメールアドレスはすでに登録されています。",
         )
-    user = user_service.create(obj_in=user_in)
+    user = await user_service.create(obj_in=user_in)
     return user
 
 @router.get("/github/login")
@@ -79,12 +130,11 @@ async def login_github(request: Request):
     """
     # セッションIDを取得またはCookieから生成
     session_id = request.cookies.get("session_id")
-    print(f"Session ID: {session_id}")
     if not session_id:
         session_id = secrets.token_urlsafe(16)
     
     # stateトークンを生成
-    state = generate_state_token(session_id)
+    state = await generate_state_token(session_id)
     
     # GitHub認証URL生成
     params = {
@@ -92,19 +142,21 @@ async def login_github(request: Request):
         "scope": "user:email",
         "state": state,
     }
-    github_auth_url = f"https://github.com/login/oauth/authorize?{urlencode(params)}"
+    github_auth_url = f"{settings.GITHUB_OAUTH_BASE_URL}/login/oauth/authorize?{urlencode(params)}"
     
     # セッションIDをCookieに設定してリダイレクト
     response = RedirectResponse(url=github_auth_url)
     response.set_cookie(key="session_id", value=session_id, httponly=True, samesite="none")
     return response
 
-@router.get("/github/callback")
+@router.get("/github/callback", dependencies=[Depends(auth_rate_limit)])
 async def github_callback(
     request: Request,
     code: str,
     state: str,
     user_service: UserService = Depends(get_user_service),
+    refresh_token_service: RefreshTokenService = Depends(get_refresh_token_service),
+    client: httpx.AsyncClient = Depends(get_http_client),
 ):
     """
     GitHub OAuth認証のコールバック処理
@@ -131,14 +183,14 @@ async def github_callback(
     #         )
         
     #     # stateトークンを検証
-    #     if not verify_state_token(session_id, state):
+    #     if not await verify_state_token(session_id, state):
     #         raise HTTPException(
     #             status_code=status.HTTP_400_BAD_REQUEST,
     #             detail="不正なリクエスト - stateトークンが無効です"
     #         )
     
     # GitHubからアクセストークンを取得
-    token_url = "https://github.com/login/oauth/access_token"
+    token_url = f"{settings.GITHUB_OAUTH_BASE_URL}/login/oauth/access_token"
     
     token_payload = {
         "client_id": settings.GITHUB_CLIENT_ID,
@@ -151,112 +203,111 @@ async def github_callback(
         "Accept": "application/json"
     }
     
-    async with httpx.AsyncClient() as client:
-        # アクセストークン取得
-        token_response = await client.post(token_url, json=token_payload, headers=headers)
-        
-        if token_response.status_code != 200:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="GitHubからのトークン取得に失敗しました"
-            )
-        
-        token_data = token_response.json()
-        access_token = token_data.get("access_token")
-        
-        if not access_token:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="GitHubからのアクセストークン取得に失敗しました"
-            )
-        
-        # GitHubからユーザー情報を取得
-        user_api_url = "https://api.github.com/user"
-        user_email_url = "https://api.github.com/user/emails"
-        
-        auth_headers = {
-            "Authorization": f"token {access_token}",
-            "Accept": "application/json"
-        }
-        
-        # ユーザープロファイルを取得
-        user_response = await client.get(user_api_url, headers=auth_headers)
-        
-        if user_response.status_code != 200:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="GitHubからのユーザー情報取得に失敗しました"
-            )
-        
-        github_user = user_response.json()
-        
-        # ユーザーのメールアドレスを取得
-        email_response = await client.get(user_email_url, headers=auth_headers)
-        
-        if email_response.status_code != 200:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="GitHubからのメールアドレス取得に失敗しました"
-            )
-        
-        emails = email_response.json()
-        primary_email = next((email.get("email") for email in emails if email.get("primary")), None)
-        
-        if not primary_email:
-            primary_email = emails[0].get("email") if emails else None
-        
-        if not primary_email:
-            raise HTTPException(
-                status_code=status.HTTP_400_BAD_REQUEST,
-                detail="GitHubからのメールアドレス取得に失敗しました"
-            )
-        
-        # データベースにユーザーがすでに存在するか確認
-        user = user_service.get_by_oauth_id(provider="github", oauth_id=str(github_user.get("id")))
-        
-        if not user:
-            # メールアドレスで検索
-            user = user_service.get_by_email(email=primary_email)
-            
-            if user:
-                # 既存ユーザーにGitHub情報を追加
-                if not user.oauth_provider:
-                    user_update = {
-                        "oauth_provider": "github",
-                        "oauth_id": str(github_user.get("id")),
-                        "github_username": github_user.get("login"),
-                        "github_avatar_url": github_user.get("avatar_url"),
-                    }
-                    user = user_service.update(db_obj=user, obj_in=user_update)
-            else:
-                # 新規ユーザーの作成
-                user_oauth_data = schemas.UserOAuthCreate(
-                    email=primary_email,
-                    name=github_user.get("name") or github_user.get("login"),
-                    oauth_provider="github",
-                    oauth_id=str(github_user.get("id")),
-                    github_username=github_user.get("login"),
-                    github_avatar_url=github_user.get("avatar_url"),
-                )
-                user = user_service.create_oauth_user(obj_in=user_oauth_data)
-        
-        # ログイン時間を更新
-        user_service.update_login_time(user=user)
-        
-        # JWTトークンの生成
-        access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
-        access_token = security.create_access_token(
-            user.id, expires_delta=access_token_expires
+    # アクセストークン取得 (共有クライアントのkeep-alive接続を再利用)
+    token_response = await client.post(token_url, json=token_payload, headers=headers)
+    
+    if token_response.status_code != 200:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="GitHubからのトークン取得に失敗しました"
+        )
+    
+    token_data = token_response.json()
+    access_token = token_data.get("access_token")
+    
+    if not access_token:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="GitHubからのアクセストークン取得に失敗しました"
+        )
+    
+    # GitHubからユーザー情報を取得
+    user_api_url = f"{settings.GITHUB_API_BASE_URL}/user"
+    user_email_url = f"{settings.GITHUB_API_BASE_URL}/user/emails"
+    
+    auth_headers = {
+        "Authorization": f"token {access_token}",
+        "Accept": "application/json"
+    }
+    
+    # ユーザープロファイルとメールアドレスを並行して取得
+    user_response, email_response = await asyncio.gather(
+        client.get(user_api_url, headers=auth_headers),
+        client.get(user_email_url, headers=auth_headers),
+    )
+    
+    if user_response.status_code != 200:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="GitHubからのユーザー情報取得に失敗しました"
+        )
+    
+    github_user = user_response.json()
+    
+    if email_response.status_code != 200:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="GitHubからのメールアドレス取得に失敗しました"
         )
+    
+    emails = email_response.json()
+    primary_email = next((email.get("email") for email in emails if email.get("primary")), None)
+    
+    if not primary_email:
+        primary_email = emails[0].get("email") if emails else None
+    
+    if not primary_email:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="GitHubからのメールアドレス取得に失敗しました"
+        )
+    
+    # データベースにユーザーがすでに存在するか確認
+    user = await user_service.get_by_oauth_id(provider="github", oauth_id=str(github_user.get("id")))
+    
+    if not user:
+        # メールアドレスで検索
+        user = await user_service.get_by_email(email=primary_email)
         
-        # フロントエンドのURLにトークン情報をクエリパラメータとして追加してリダイレクト
-        frontend_url = settings.FRONTEND_REDIRECT_URL
-        redirect_params = {
-            "access_token": access_token,
-            "token_type": "bearer",
-            "expires_in": str(settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60),
-        }
-        print(f"{frontend_url}/auth/callback?{urlencode(redirect_params)}")
-        return RedirectResponse(
-            url=f"{frontend_url}/auth/callback?{urlencode(redirect_params)}"
-        )
\ No newline at end of file
+        if user:
+            # 既存ユーザーにGitHub情報を追加
+            if not user.oauth_provider:
+                user_update = {
+                    "oauth_provider": "github",
+                    "oauth_id": str(github_user.get("id")),
+                    "github_username": github_user.get("login"),
+                    "github_avatar_url": github_user.get("avatar_url"),
+                }
+                user = await user_service.update(db_obj=user, obj_in=user_update)
+        else:
+            # 新規ユーザーの作成
+            user_oauth_data = schemas.UserOAuthCreate(
+                email=primary_email,
+                name=github_user.get("name") or github_user.get("login"),
+                oauth_provider="github",
+                oauth_id=str(github_user.get("id")),
+                github_username=github_user.get("login"),
+                github_avatar_url=github_user.get("avatar_url"),
+            )
+            user = await user_service.create_oauth_user(obj_in=user_oauth_data)
+    
+    # ログイン時間を更新
+    await user_service.update_login_time(user=user)
+    
+    # JWTトークンの生成
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = security.create_access_token(
+        user.id, expires_delta=access_token_expires
+    )
+    
+    # フロントエンドのURLにトークン情報をクエリパラメータとして追加してリダイレクト
+    frontend_url = settings.FRONTEND_REDIRECT_URL
+    redirect_params = {
+        "access_token": access_token,
+        "token_type": "bearer",
+        "expires_in": str(settings.ACCESS_TOKEN_EXPIRE_MINUTES * 60),
+        "refresh_token": await refresh_token_service.issue(user.id),
+    }
+    return RedirectResponse(
+        url=f"{frontend_url}/auth/callback?{urlencode(redirect_params)}"
+    )
\ No newline at end of file
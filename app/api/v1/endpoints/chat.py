@@ -1,23 +1,44 @@
 import logging
-
-from fastapi import APIRouter, Depends, HTTPException
-from motor.motor_asyncio import AsyncIOMotorDatabase
-
-from app.api.deps import get_current_user, get_mongo_db
-from app.core.llm.client.gemini_client import GeminiClient
-from app.repositories.chat_history_repository import ChatHistoryRepository
-from app.schemas.chat import ChatInput, ChatOutput
-from app.services.chat_service import ChatService
+from typing import TYPE_CHECKING, Optional
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from redis.exceptions import RedisError
+
+from app.api.deps import (
+    daily_token_quota,
+    get_current_user,
+    get_current_user_detached,
+    get_mongo_db,
+    user_concurrency_limit,
+    user_rate_limit,
+)
+from app.core.config import settings
+from app.core.resources import resources
+from app.schemas.chat import ChatInput, ChatJob, ChatOutput
+from app.services.chat_job_queue import ChatJobTooLargeError, chat_job_queue
+
+# LangChain / Motor は import に時間がかかるため、チャットの初回利用時まで読み込まない
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorDatabase
+
+    from app.core.llm.client.gemini_client import GeminiClient
+    from app.services.chat_service import ChatService
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# 1ユーザーが LLM のクォータや MongoDB を占有しないよう、回数と同時実行数を制限する
+chat_rate_limit = user_rate_limit("chat", settings.RATE_LIMIT_CHAT_REQUESTS, settings.RATE_LIMIT_CHAT_WINDOW)
+chat_concurrency_limit = user_concurrency_limit("chat", settings.RATE_LIMIT_CHAT_CONCURRENCY)
+# 1日あたりのトークン数の上限 (USAGE_DAILY_TOKEN_QUOTA=0 の場合は無効)
+chat_token_quota = daily_token_quota("chat", settings.USAGE_DAILY_TOKEN_QUOTA)
+
 
-def get_gemini_client() -> GeminiClient:
-    """Dependency to get Gemini client"""
+def get_gemini_client() -> "GeminiClient":
+    """Dependency to get the shared Gemini client created at startup"""
     try:
-        return GeminiClient()
+        return resources.get_llm_client()
     except Exception as e:
         logger.error(f"Failed to create Gemini client: {str(e)}")
         raise HTTPException(
@@ -26,8 +47,8 @@ def get_gemini_client() -> GeminiClient:
 
 
 def get_chat_service(
-    gemini_client: GeminiClient = Depends(get_gemini_client), mongodb: AsyncIOMotorDatabase = Depends(get_mongo_db)
-) -> ChatService:
+    gemini_client: "GeminiClient" = Depends(get_gemini_client), mongodb: "AsyncIOMotorDatabase" = Depends(get_mongo_db)
+) -> "ChatService":
     """Dependency to get chat service with history repository
 
     Args:
@@ -37,6 +58,9 @@ def get_chat_service(
     Returns:
         Configured chat service with history repository
     """
+    from app.repositories.chat_history_repository import ChatHistoryRepository
+    from app.services.chat_service import ChatService
+
     try:
         # Create history repository with MongoDB connection
         chat_history_repository = ChatHistoryRepository(mongodb)
@@ -48,9 +72,16 @@ def get_chat_service(
         raise HTTPException(status_code=500, detail="Failed to initialize chat service.")
 
 
-@router.post("/chat", response_model=ChatOutput)
+@router.post(
+    "/chat",
+    response_model=ChatOutput,
+    dependencies=[Depends(chat_rate_limit), Depends(chat_token_quota), Depends(chat_concurrency_limit)],
+)
 async def chat_endpoint(
-    chat_input: ChatInput, chat_service: ChatService = Depends(get_chat_service), current_user=Depends(get_current_user)
+    chat_input: ChatInput,
+    chat_service: "ChatService" = Depends(get_chat_service),
+    # LLM の応答を待つ間 DB 接続を保持しないよう、認証後にセッションを閉じる
+    current_user=Depends(get_current_user_detached),
 ) -> ChatOutput:
     """Chat endpoint using Gemini LLM with persistent history
 
@@ -82,3 +113,71 @@ async def chat_endpoint(
     except Exception as e:
         logger.error(f"Error processing chat request: {str(e)}")
         raise HTTPException(status_code=500, detail=f"Failed to process chat request: {str(e)}")
+
+
+@router.post(
+    "/chat/jobs",
+    response_model=ChatJob,
+    status_code=202,
+    dependencies=[Depends(chat_rate_limit), Depends(chat_token_quota)],
+)
+async def create_chat_job(
+    chat_input: ChatInput,
+    response: Response,
+    idempotency_key: Optional[str] = Header(None, max_length=200),
+    current_user=Depends(get_current_user),
+) -> ChatJob:
+    """Submit a chat turn to be processed by a worker
+
+    The response is returned as soon as the job is queued. Poll (or long-poll with `wait`)
+    `GET /chat/jobs/{job_id}` for the result. Retries with the same `Idempotency-Key` header
+    return the existing job instead of running the turn again. The `history` field is ignored:
+    the worker loads the history from MongoDB.
+
+    Args:
+        chat_input: Chat input containing role, response, history, and chat_id
+        response: Response used to set the status code and Location header
+        idempotency_key: Optional client-generated key to deduplicate retries
+        current_user: Current authenticated user
+
+    Returns:
+        The queued job (200 with the existing job for a duplicate submission)
+    """
+    try:
+        job, created = await chat_job_queue.enqueue(current_user.id, chat_input, idempotency_key)
+    except ChatJobTooLargeError as e:
+        raise HTTPException(status_code=413, detail=f"Chat message is too large ({e.size} bytes, limit: {e.limit}).")
+    except (RedisError, OSError, LookupError) as e:
+        logger.error(f"Failed to enqueue chat job: {str(e)}")
+        raise HTTPException(status_code=503, detail="Chat job queue is unavailable.")
+    if not created:
+        response.status_code = 200
+    response.headers["Location"] = f"{settings.API_V1_STR}/chat/jobs/{job.job_id}"
+    return job
+
+
+@router.get("/chat/jobs/{job_id}", response_model=ChatJob)
+async def read_chat_job(
+    job_id: str,
+    wait: float = Query(0, ge=0, le=settings.CHAT_JOB_MAX_WAIT),
+    # 待っている間 DB 接続を保持しないよう、認証後にセッションを閉じる
+    current_user=Depends(get_current_user_detached),
+) -> ChatJob:
+    """Get the status and result of a chat job
+
+    Args:
+        job_id: Job identifier returned by `POST /chat/jobs`
+        wait: Seconds to wait for the job to finish before responding (long polling)
+        current_user: Current authenticated user
+
+    Returns:
+        The job status, with the chat response once it has succeeded
+    """
+    try:
+        job = await chat_job_queue.wait(job_id, current_user.id, wait)
+    except (RedisError, OSError) as e:
+        logger.error(f"Failed to read chat job {job_id}: {str(e)}")
+        raise HTTPException(status_code=503, detail="Chat job queue is unavailable.")
+    if job is None:
+        raise HTTPException(status_code=404, detail="Chat job not found.")
+    return job
@@ -0,0 +1,347 @@
+"""
+WebSocket によるチャット (/chat/ws)
+
+接続ごとに1回だけ認証し、会話ごとの履歴 (直近 WS_HISTORY_WINDOW 件) を接続中はメモリに保持する。
+アシスタントの応答はトークン (チャンク) ごとに送信する。
+
+メッセージはすべて JSON のテキストフレーム:
+
+    クライアント → サーバー
+        {"type": "auth", "token": "<アクセストークン>"}          接続直後に1回 (WS_AUTH_TIMEOUT 秒以内)
+        {"type": "chat", "chat_id": "...", "response": "...", "role": "user", "model_name": null}
+        {"type": "ping"} / {"type": "pong"}
+
+    サーバー → クライアント
+        {"type": "ready", "user_id": 1}
+        {"type": "start", "chat_id": "..."}
+        {"type": "token", "chat_id": "...", "delta": "..."}
+        {"type": "done", "chat_id": "...", "response": "..."}
+        {"type": "error", "code": "...", "detail": "...", "retry_after": 10}
+        {"type": "ping"} / {"type": "pong"}
+
+1つの接続で同時に生成する応答は1つまでで、生成中は次の1件まで受け付け、それ以上の chat には busy を返す。
+ユーザーごとの同時生成数は HTTP の /chat と同じ枠 (RATE_LIMIT_CHAT_CONCURRENCY) で数え、複数の接続を開いても超えられない
+(超えた場合は concurrency_limited を返す)。
+送信待ちが WS_SEND_QUEUE_SIZE に達すると LLM からの読み出しを止め (バックプレッシャー)、
+WS_SEND_TIMEOUT 秒以上送信が進まないクライアントは切断する。
+"""
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import TYPE_CHECKING, Any, Deque, Dict, Optional, Tuple
+
+import orjson
+from fastapi import APIRouter, HTTPException, WebSocket, WebSocketDisconnect
+from jose import jwt
+from pydantic import ValidationError
+
+from app.api.deps import get_current_user
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.rate_limit import rate_limit_rejected, rate_limiter
+from app.core.resources import resources
+from app.db.session import AsyncSessionLocal
+from app.models import user as models
+from app.schemas.chat import ChatInput, ChatMessage
+from app.services.usage_meter import seconds_until_next_day, usage_meter
+from app.services.user_service import UserService
+
+if TYPE_CHECKING:
+    from app.repositories.chat_history_repository import ChatHistoryRepository
+    from app.services.chat_service import ChatService
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter()
+
+ws_connections = registry.gauge("ws_connections", "接続中のチャット WebSocket 数")
+ws_closed = registry.counter("ws_connections_closed_total", "サーバーから切断・拒否したチャット WebSocket 数", ["reason"])
+
+# WebSocket のクローズコード (RFC 6455)
+CLOSE_GOING_AWAY = 1001
+CLOSE_POLICY_VIOLATION = 1008
+CLOSE_INTERNAL_ERROR = 1011
+CLOSE_TRY_AGAIN_LATER = 1013
+
+# 1つの接続で履歴を保持する会話数 (超えたら最も使われていない会話の履歴を捨てる)
+MAX_CHATS_PER_CONNECTION = 8
+# 1つの接続で受け付けておける chat の数 (生成中の1件 + 待機中の1件)
+MAX_PENDING_TURNS = 2
+
+
+class ConnectionSlots:
+    """プロセスあたりの同時接続数の上限"""
+
+    def __init__(self, limit: int):
+        self.limit = limit
+        self.active = 0
+
+    def acquire(self) -> bool:
+        if self.active >= self.limit:
+            return False
+        self.active += 1
+        ws_connections.set(self.active)
+        return True
+
+    def release(self) -> None:
+        self.active -= 1
+        ws_connections.set(self.active)
+
+
+connection_slots = ConnectionSlots(settings.WS_MAX_CONNECTIONS)
+
+
+class ChatSocket:
+    """
+    認証済みの1接続分の状態と処理
+
+    受信・生成・送信・ping をそれぞれ別のタスクで動かし、いずれかが終わったら接続を閉じる。
+    受信を生成と分けることで、長い生成の途中でも pong を受け取れる。
+    """
+
+    def __init__(
+        self,
+        websocket: WebSocket,
+        user: models.User,
+        token_expires_at: Optional[float],
+        chat_service: "ChatService",
+        repository: "ChatHistoryRepository",
+    ):
+        self.websocket = websocket
+        self.user = user
+        self.token_expires_at = token_expires_at
+        self.chat_service = chat_service
+        self.repository = repository
+        self.histories: "OrderedDict[str, Deque[ChatMessage]]" = OrderedDict()
+        self.outbox: asyncio.Queue = asyncio.Queue(maxsize=settings.WS_SEND_QUEUE_SIZE)
+        self.turns: asyncio.Queue = asyncio.Queue()
+        # 受け付けて完了していない chat の数 (キューの長さだけでは、取り出される前の生成中の分を数えられないため)
+        self.pending_turns = 0
+        self.last_received = time.monotonic()
+        self.close_code: Optional[int] = None
+
+    async def run(self) -> None:
+        # 生成タスクは終了時も送信待ちを送り切ってから閉じるため、終了の判定には含めない (close で _deliver を止める)
+        generate = asyncio.create_task(self._generate())
+        tasks = [
+            asyncio.create_task(self._receive()),
+            asyncio.create_task(self._deliver()),
+            asyncio.create_task(self._keepalive()),
+        ]
+        try:
+            done, _ = await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if not task.cancelled() and task.exception() is not None and not isinstance(task.exception(), WebSocketDisconnect):
+                    logger.error(f"WebSocket chat task failed: {str(task.exception())}")
+                    self.close_code = self.close_code or CLOSE_INTERNAL_ERROR
+        finally:
+            for task in [generate, *tasks]:
+                task.cancel()
+            await asyncio.gather(generate, *tasks, return_exceptions=True)
+
+    async def send(self, frame: Dict[str, Any]) -> None:
+        """送信キューに追加 (満杯の間は待つ)"""
+        await self.outbox.put(frame)
+
+    async def close(self, code: int) -> None:
+        """送信待ちのメッセージを送り終えてから接続を閉じる"""
+        self.close_code = code
+        await self.outbox.put(None)
+
+    async def _deliver(self) -> None:
+        while True:
+            frame = await self.outbox.get()
+            if frame is None:
+                return
+            try:
+                await asyncio.wait_for(self.websocket.send_text(orjson.dumps(frame).decode()), timeout=settings.WS_SEND_TIMEOUT)
+            except asyncio.TimeoutError:
+                ws_closed.inc(reason="slow_consumer")
+                self.close_code = CLOSE_POLICY_VIOLATION
+                return
+
+    async def _receive(self) -> None:
+        while True:
+            raw = await self.websocket.receive_text()
+            self.last_received = time.monotonic()
+            try:
+                message = orjson.loads(raw)
+                kind = message.get("type")
+            except (orjson.JSONDecodeError, AttributeError):
+                await self.send({"type": "error", "code": "invalid_message", "detail": "Messages must be JSON objects."})
+                continue
+            if kind == "ping":
+                await self.send({"type": "pong"})
+            elif kind == "pong":
+                continue
+            elif kind == "chat":
+                try:
+                    chat_input = ChatInput(
+                        role=message.get("role", "user"),
+                        response=message.get("response"),
+                        chat_id=message.get("chat_id"),
+                        model_name=message.get("model_name"),
+                    )
+                except ValidationError as e:
+                    await self.send({"type": "error", "code": "invalid_message", "detail": str(e)})
+                    continue
+                if self.pending_turns >= MAX_PENDING_TURNS:
+                    await self.send({"type": "error", "code": "busy", "chat_id": chat_input.chat_id, "detail": "A response is already being generated."})
+                    continue
+                self.pending_turns += 1
+                self.turns.put_nowait(chat_input)
+            else:
+                await self.send({"type": "error", "code": "invalid_message", "detail": f"Unknown message type: {kind}"})
+
+    async def _keepalive(self) -> None:
+        while True:
+            await asyncio.sleep(settings.WS_PING_INTERVAL)
+            if time.monotonic() - self.last_received > settings.WS_PING_INTERVAL + settings.WS_PING_TIMEOUT:
+                # 応答の無いクライアント (ネットワークの切断など) の接続を解放する
+                ws_closed.inc(reason="idle")
+                self.close_code = CLOSE_GOING_AWAY
+                return
+            await self.send({"type": "ping"})
+
+    async def _history(self, chat_id: str) -> Deque[ChatMessage]:
+        """会話の履歴 (初回のみ MongoDB から読み込む)"""
+        history = self.histories.get(chat_id)
+        if history is None:
+            messages = await self.repository.get_history(chat_id)
+            history = deque(messages, maxlen=settings.WS_HISTORY_WINDOW)
+            self.histories[chat_id] = history
+            if len(self.histories) > MAX_CHATS_PER_CONNECTION:
+                self.histories.popitem(last=False)
+        self.histories.move_to_end(chat_id)
+        return history
+
+    async def _admit(self, chat_id: str) -> Optional[Dict[str, Any]]:
+        """1ターン分の生成を許可するか判定し、拒否する場合はエラーのフレームを返す"""
+        if settings.RATE_LIMIT_ENABLED:
+            result = await rate_limiter.hit(f"chat:user:{self.user.id}", settings.RATE_LIMIT_CHAT_REQUESTS, settings.RATE_LIMIT_CHAT_WINDOW)
+            if not result.allowed:
+                rate_limit_rejected.inc(scope="chat", kind="window")
+                return {"type": "error", "code": "rate_limited", "chat_id": chat_id, "retry_after": max(1, result.reset_after)}
+        quota = settings.USAGE_DAILY_TOKEN_QUOTA
+        if quota > 0 and await usage_meter.daily_tokens(self.user.id) >= quota:
+            rate_limit_rejected.inc(scope="chat", kind="token_quota")
+            return {"type": "error", "code": "quota_exceeded", "chat_id": chat_id, "retry_after": seconds_until_next_day()}
+        return None
+
+    async def _generate(self) -> None:
+        try:
+            while True:
+                chat_input: ChatInput = await self.turns.get()
+                if self.token_expires_at is not None and time.time() >= self.token_expires_at:
+                    # 再接続して新しいトークンで認証し直してもらう
+                    await self.send({"type": "error", "code": "token_expired", "detail": "The access token has expired."})
+                    ws_closed.inc(reason="token_expired")
+                    await self.close(CLOSE_POLICY_VIOLATION)
+                    return
+                try:
+                    await self._turn(chat_input)
+                finally:
+                    self.pending_turns -= 1
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"WebSocket chat generation failed: {str(e)}")
+            await self.close(CLOSE_INTERNAL_ERROR)
+
+    async def _turn(self, chat_input: ChatInput) -> None:
+        """1ターン分の応答を生成して送信"""
+        chat_id = chat_input.chat_id
+        rejection = await self._admit(chat_id)
+        if rejection is not None:
+            await self.send(rejection)
+            return
+
+        lease = None
+        if settings.RATE_LIMIT_ENABLED:
+            # HTTP の /chat と同じキーで数え、ユーザーが接続を増やしても同時生成数を超えないようにする
+            lease = await rate_limiter.acquire(
+                f"chat:inflight:user:{self.user.id}", settings.RATE_LIMIT_CHAT_CONCURRENCY, settings.RATE_LIMIT_CONCURRENCY_TTL
+            )
+            if lease is None:
+                rate_limit_rejected.inc(scope="chat", kind="concurrency")
+                await self.send(
+                    {"type": "error", "code": "concurrency_limited", "chat_id": chat_id, "retry_after": settings.RATE_LIMIT_CONCURRENCY_RETRY_AFTER}
+                )
+                return
+        try:
+            await self._stream_turn(chat_input)
+        finally:
+            if lease is not None:
+                await rate_limiter.release(lease)
+
+    async def _stream_turn(self, chat_input: ChatInput) -> None:
+        chat_id = chat_input.chat_id
+        history = await self._history(chat_id)
+        chat_input.history = list(history)
+        user_message = ChatMessage(role=chat_input.role, content=chat_input.response)
+        await self.send({"type": "start", "chat_id": chat_id})
+        parts = []
+        try:
+            async for delta in self.chat_service.stream_chat(chat_input, self.user.id):
+                parts.append(delta)
+                await self.send({"type": "token", "chat_id": chat_id, "delta": delta})
+        except Exception as e:
+            logger.error(f"Error in WebSocket chat for chat_id {chat_id}: {str(e)}")
+            # ユーザーのメッセージは保存済みのため、履歴にも残す
+            history.append(user_message)
+            await self.send({"type": "error", "code": "generation_failed", "chat_id": chat_id, "detail": "Failed to generate a response."})
+            return
+        response = "".join(parts)
+        history.append(user_message)
+        history.append(ChatMessage(role="assistant", content=response))
+        await self.send({"type": "done", "chat_id": chat_id, "response": response})
+
+
+async def _authenticate(websocket: WebSocket) -> Optional[Tuple[models.User, Optional[float]]]:
+    """最初のメッセージのアクセストークンでユーザーを認証 (失敗した場合は None)"""
+    try:
+        message = orjson.loads(await asyncio.wait_for(websocket.receive_text(), timeout=settings.WS_AUTH_TIMEOUT))
+        if message.get("type") != "auth" or not isinstance(message.get("token"), str):
+            return None
+        token = message["token"]
+        async with AsyncSessionLocal() as db:
+            user = await get_current_user(user_service=UserService(db=db), token=token)
+        expires_at = jwt.get_unverified_claims(token).get("exp")
+    except (asyncio.TimeoutError, orjson.JSONDecodeError, AttributeError, KeyError, HTTPException):
+        return None
+    return user, float(expires_at) if expires_at is not None else None
+
+
+@router.websocket("/chat/ws")
+async def chat_websocket(websocket: WebSocket) -> None:
+    """Chat over a WebSocket with per-connection authentication and token streaming"""
+    if not connection_slots.acquire():
+        # accept 前に閉じると 403 で拒否される
+        ws_closed.inc(reason="capacity")
+        await websocket.close(code=CLOSE_TRY_AGAIN_LATER)
+        return
+    try:
+        await websocket.accept()
+        authenticated = await _authenticate(websocket)
+        if authenticated is None:
+            ws_closed.inc(reason="unauthorized")
+            await websocket.close(code=CLOSE_POLICY_VIOLATION)
+            return
+        user, expires_at = authenticated
+
+        from app.repositories.chat_history_repository import ChatHistoryRepository
+        from app.services.chat_service import ChatService
+
+        repository = ChatHistoryRepository(resources.get_mongo_client()[settings.MONGODB_DB_NAME])
+        chat_service = ChatService(resources.get_llm_client(), repository)
+        connection = ChatSocket(websocket, user, expires_at, chat_service, repository)
+        await connection.send({"type": "ready", "user_id": user.id})
+        await connection.run()
+        if connection.close_code is not None:
+            await websocket.close(code=connection.close_code)
+    except (WebSocketDisconnect, RuntimeError):
+        # クライアントが先に切断した場合 (切断後の close は RuntimeError になる)
+        pass
+    finally:
+        connection_slots.release()
@@ -1,12 +1,22 @@
 from fastapi import APIRouter
-from starlette.responses import JSONResponse
+
+from app.core.resources import resources
+from app.core.responses import ORJSONResponse
 
 router = APIRouter()
 
 @router.get("/readiness", tags=["healthcheck"])
-def readiness_check():
-    return JSONResponse(content={"status": "ok", "check": "readiness"})
+async def readiness_check():
+    # 依存先ごとの状態を返し、いずれかが利用できない・停止処理中の場合は503でトラフィックを止める
+    result = await resources.check_readiness()
+    content = {
+        "status": "ok" if result["ready"] else "unavailable",
+        "check": "readiness",
+        "draining": result["draining"],
+        "dependencies": result["dependencies"],
+    }
+    return ORJSONResponse(content=content, status_code=200 if result["ready"] else 503)
 
 @router.get("/liveness", tags=["healthcheck"])
 def liveness_check():
-    return JSONResponse(content={"status": "ok", "check": "liveness"})
\ No newline at end of file
+    return ORJSONResponse(content={"status": "ok", "check": "liveness"})
@@ -0,0 +1,17 @@
+from typing import Any
+
+from fastapi import APIRouter, Depends
+
+from app.api import deps
+from app.core.metrics import registry
+
+router = APIRouter()
+
+@router.get("", dependencies=[Depends(deps.get_current_active_superuser)])
+async def read_metrics(prefix: str = "") -> Any:
+    """
+    プロセス内メトリクスのスナップショットを取得 (管理者のみ)
+
+    - **prefix**: メトリクス名で絞り込む (例: `db_pool_` でコネクションプールのみ)
+    """
+    return registry.snapshot(prefix=prefix)
@@ -0,0 +1,83 @@
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, Dict
+
+from fastapi import APIRouter, Depends, Query
+
+from app.api import deps
+from app.core.config import settings
+from app.schemas import usage as schemas
+from app.services.usage_meter import CHAT_COLLECTION, COUNTER_FIELDS, DAILY_COLLECTION, usage_date
+
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorDatabase
+
+router = APIRouter()
+
+
+def _counters(document: Dict[str, Any]) -> Dict[str, Any]:
+    return {field: document.get(field, 0) for field in COUNTER_FIELDS}
+
+
+# 自分のトークン使用量を取得するエンドポイント
+@router.get("/me", response_model=schemas.UserUsage)
+async def read_usage_me(
+    days: int = Query(7, ge=1, le=90),
+    chats: int = Query(20, ge=1, le=100),
+    mongodb: "AsyncIOMotorDatabase" = Depends(deps.get_mongo_db),
+    current_user = Depends(deps.get_current_user),
+) -> Any:
+    """
+    現在ログインしているユーザーの LLM トークン使用量を取得
+
+    - **days**: 日別の集計を返す日数 (UTC, 当日を含む)
+    - **chats**: トークン数の多い順に返す会話の件数
+
+    集計は一定間隔でまとめて反映するため、直近の数秒分は含まれないことがある
+    """
+    today = datetime.now(timezone.utc)
+    since = usage_date(today - timedelta(days=days - 1))
+    daily = await (
+        mongodb[DAILY_COLLECTION].find({"user_id": current_user.id, "date": {"$gte": since}}).sort("date", -1).to_list(length=days)
+    )
+    top_chats = await (
+        mongodb[CHAT_COLLECTION].find({"user_id": current_user.id}).sort("total_tokens", -1).to_list(length=chats)
+    )
+    today_document = next((document for document in daily if document["date"] == usage_date(today)), {})
+    return schemas.UserUsage(
+        user_id=current_user.id,
+        daily_token_quota=settings.USAGE_DAILY_TOKEN_QUOTA or None,
+        today=schemas.UsageCounters(**_counters(today_document)),
+        days=[schemas.DailyUsage(date=document["date"], **_counters(document)) for document in daily],
+        chats=[schemas.ChatUsage(chat_id=document["chat_id"], **_counters(document)) for document in top_chats],
+    )
+
+
+# トークン使用量の多いユーザーを取得するエンドポイント (管理者のみ)
+@router.get("/top", response_model=schemas.TopConsumers)
+async def read_top_consumers(
+    days: int = Query(1, ge=1, le=90),
+    limit: int = Query(10, ge=1, le=100),
+    mongodb: "AsyncIOMotorDatabase" = Depends(deps.get_mongo_db),
+    current_user = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    期間内の LLM トークン使用量が多いユーザーを取得
+
+    - **days**: 集計する日数 (UTC, 当日を含む)
+    - **limit**: 返すユーザー数
+    """
+    today = datetime.now(timezone.utc)
+    since, until = usage_date(today - timedelta(days=days - 1)), usage_date(today)
+    # 日別の集計ドキュメントを合算する (date のインデックスで期間を絞り込む)
+    pipeline = [
+        {"$match": {"date": {"$gte": since, "$lte": until}}},
+        {"$group": {"_id": "$user_id", **{field: {"$sum": f"${field}"} for field in COUNTER_FIELDS}}},
+        {"$sort": {"total_tokens": -1}},
+        {"$limit": limit},
+    ]
+    results = await mongodb[DAILY_COLLECTION].aggregate(pipeline).to_list(length=limit)
+    return schemas.TopConsumers(
+        since=since,
+        until=until,
+        items=[schemas.TopConsumer(user_id=document["_id"], **_counters(document)) for document in results],
+    )
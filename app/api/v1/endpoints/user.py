@@ -1,23 +1,54 @@
-from typing import Any
+from typing import Any, Optional
 
-from fastapi import APIRouter, Depends
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, File, HTTPException, Query, UploadFile
+from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.api import deps
 from app.schemas import user as schemas
-from app.services.user_service import UserService
+from app.services.user_import_service import SUPPORTED_FORMATS, UserImportService, detect_format
+from app.services.user_service import SEARCH_MATCH_MODES, UserService, decode_cursor, encode_cursor
 
 router = APIRouter()
 
-def get_user_service(db: Session = Depends(deps.get_db)) -> UserService:
+def get_user_service(db: AsyncSession = Depends(deps.get_db)) -> UserService:
     """
     ユーザーサービスの依存関係
     """
     return UserService(db=db)
 
+# ユーザー一覧・検索エンドポイント (管理者のみ)
+@router.get("", response_model=schemas.UserPage)
+async def list_users(
+    limit: int = Query(50, ge=1, le=200),
+    cursor: Optional[str] = None,
+    q: Optional[str] = Query(None, max_length=100),
+    match: str = "prefix",
+    user_service: UserService = Depends(get_user_service),
+    current_user = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    ユーザーを登録日時の新しい順に一覧・検索
+
+    - **limit**: 1ページの件数
+    - **cursor**: 前ページの `next_cursor`
+    - **q**: メールアドレス・ユーザー名・GitHubユーザー名の検索文字列
+    - **match**: `prefix` (前方一致) / `fuzzy` (部分一致・表記ゆれ)
+    """
+    if match not in SEARCH_MATCH_MODES:
+        raise HTTPException(status_code=400, detail=f"対応していない検索方法です: {match}")
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="不正なカーソルです")
+
+    # 1件多く取得して次ページの有無を判定する
+    users = await user_service.search(limit=limit + 1, after=after, q=q, match=match)
+    next_cursor = encode_cursor(users[limit - 1]) if len(users) > limit else None
+    return schemas.UserPage(items=[schemas.User.from_orm(user) for user in users[:limit]], next_cursor=next_cursor)
+
 # 自分のユーザー情報を取得するエンドポイント
 @router.get("/me", response_model=schemas.UserMe)
-def read_users_me(current_user = Depends(deps.get_current_user)) -> Any:
+async def read_users_me(current_user = Depends(deps.get_current_user)) -> Any:
     """
     現在ログインしているユーザー情報を取得
     """
@@ -27,7 +58,7 @@ def read_users_me(current_user = Depends(deps.get_current_user)) -> Any:
 
 # ユーザー情報を更新するエンドポイント
 @router.put("/me", response_model=schemas.UserMe)
-def update_user_me(
+async def update_user_me(
     user_update: schemas.UserUpdate,
     user_service: UserService = Depends(get_user_service),
     current_user = Depends(deps.get_current_user),
@@ -35,5 +66,24 @@ def update_user_me(
     """
     現在ログインしているユーザー情報を更新
     """
-    updated_user = user_service.update(db_obj=current_user, obj_in=user_update)
-    return schemas.UserMe.from_orm(updated_user)
\ No newline at end of file
+    updated_user = await user_service.update(db_obj=current_user, obj_in=user_update)
+    return schemas.UserMe.from_orm(updated_user)
+
+# ユーザーを一括登録するエンドポイント (管理者のみ)
+@router.post("/import", response_model=schemas.UserImportReport)
+async def import_users(
+    file: UploadFile = File(...),
+    format: Optional[str] = None,
+    db: AsyncSession = Depends(deps.get_db),
+    current_user = Depends(deps.get_current_active_superuser),
+) -> Any:
+    """
+    CSV / NDJSON からユーザーを一括登録
+
+    - **file**: `email,name,password` を列 (キー) に持つ CSV または NDJSON
+    - **format**: `csv` / `ndjson` (省略時はファイル名から判定)
+    """
+    fmt = format or detect_format(file.filename, file.content_type)
+    if fmt not in SUPPORTED_FORMATS:
+        raise HTTPException(status_code=400, detail=f"対応していない形式です: {fmt}")
+    return await UserImportService(db=db).import_stream(file.file, fmt)
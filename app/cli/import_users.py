@@ -0,0 +1,36 @@
+"""
+ユーザー一括登録のCLI
+
+    python -m app.cli.import_users users.csv
+    python -m app.cli.import_users users.ndjson --format ndjson
+"""
+import argparse
+import asyncio
+import sys
+
+from app.db.session import AsyncSessionLocal, async_engine
+from app.services.user_import_service import SUPPORTED_FORMATS, UserImportService, detect_format, import_hash_pool
+
+
+async def main(args: argparse.Namespace) -> int:
+    fmt = args.format or detect_format(args.path)
+    with open(args.path, "rb") as stream:
+        async with AsyncSessionLocal() as db:
+            report = await UserImportService(db=db).import_stream(stream, fmt)
+    await import_hash_pool.shutdown()
+    await async_engine.dispose()
+
+    print(report.model_dump_json(indent=2))
+    print(
+        f"total={report.total} inserted={report.inserted} duplicates={report.duplicates} "
+        f"failed={report.failed} rows/s={report.rows_per_second:.1f}",
+        file=sys.stderr,
+    )
+    return 1 if report.failed else 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("path", help="CSV または NDJSON ファイル")
+    parser.add_argument("--format", choices=SUPPORTED_FORMATS, default=None)
+    sys.exit(asyncio.run(main(parser.parse_args())))
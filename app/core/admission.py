@@ -0,0 +1,197 @@
+import asyncio
+import logging
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from app.core.config import settings
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+# ルートの分類 (優先度の高い順)
+EXEMPT = "exempt"  # ヘルスチェック・メトリクス (常に受け付ける)
+NORMAL = "normal"  # 通常の API
+LOW = "low"  # LLM を呼ぶチャットなど、過負荷時に最初に拒否する処理
+
+# 待ち時間の移動平均の重み (直近の1件の割合)
+WAIT_EWMA_ALPHA = 0.2
+# 待ち時間の移動平均が max_wait のこの割合を超えたら、待たせずにすぐ拒否する
+# (時間切れが続くと移動平均は max_wait に漸近するだけで到達しないため、1 より小さくする)
+WAIT_SHED_RATIO = 0.5
+
+event_loop_lag = registry.gauge("event_loop_lag_seconds", "イベントループの遅延 (定期的なタイマーが予定より遅れた時間)")
+admission_inflight = registry.gauge("admission_inflight", "受け付けて処理中のリクエスト数", ["route_class"])
+admission_queued = registry.gauge("admission_queued", "同時処理数の上限に達して受付を待っているリクエスト数", ["route_class"])
+admission_queue_wait = registry.histogram(
+    "admission_queue_wait_seconds",
+    "受付を待った時間 (拒否されたものを含む)",
+    ["route_class"],
+    buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0),
+)
+admission_rejected = registry.counter("admission_rejected_total", "過負荷のため 503 で拒否したリクエスト数", ["route_class", "reason"])
+
+
+class AdmissionRejectedError(Exception):
+    """受付を拒否した場合に送出される例外"""
+
+    def __init__(self, route_class: str, reason: str, retry_after: int):
+        super().__init__(f"{route_class} request rejected: {reason}")
+        self.route_class = route_class
+        self.reason = reason
+        self.retry_after = retry_after
+
+
+class RouteClassLimiter:
+    """
+    ルートの分類ごとの同時処理数の上限と、上限に達した場合の有限の待ち行列
+
+    空きを待つ件数・時間はどちらも上限を設け、超えた分はすぐに拒否する。受付までの待ち時間の移動平均が
+    max_wait の WAIT_SHED_RATIO 倍を超えている (待っても時間切れになりやすい) 間は、待たせずにすぐ拒否する。
+    """
+
+    def __init__(self, route_class: str, limit: int, max_queue: int, max_wait: float, max_loop_lag: float):
+        self.route_class = route_class
+        self.limit = limit
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self.max_loop_lag = max_loop_lag
+        self.inflight = 0
+        self.wait_ewma = 0.0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+    def _observe_wait(self, waited: float) -> None:
+        self.wait_ewma += WAIT_EWMA_ALPHA * (waited - self.wait_ewma)
+        admission_queue_wait.observe(waited, route_class=self.route_class)
+
+    def _reject(self, reason: str) -> AdmissionRejectedError:
+        admission_rejected.inc(route_class=self.route_class, reason=reason)
+        return AdmissionRejectedError(self.route_class, reason, settings.ADMISSION_RETRY_AFTER)
+
+    async def acquire(self, loop_lag: float) -> None:
+        """
+        処理の枠を取得する
+
+        Raises:
+            AdmissionRejectedError: イベントループの遅延・待ち行列の長さ・待ち時間のいずれかが上限を超えた場合
+        """
+        if loop_lag > self.max_loop_lag:
+            raise self._reject("loop_lag")
+        if self.inflight < self.limit and not self._waiters:
+            self.inflight += 1
+            admission_inflight.set(self.inflight, route_class=self.route_class)
+            # 待たずに受け付けた分も移動平均に含め、混雑が解消したら待ち行列を再開する
+            self._observe_wait(0.0)
+            return
+        if len(self._waiters) >= self.max_queue:
+            raise self._reject("queue_full")
+        if self.wait_ewma >= self.max_wait * WAIT_SHED_RATIO:
+            raise self._reject("queue_wait")
+
+        loop = asyncio.get_running_loop()
+        waiter = loop.create_future()
+        self._waiters.append(waiter)
+        admission_queued.set(len(self._waiters), route_class=self.route_class)
+        started = loop.time()
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), timeout=self.max_wait)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # 時間切れと同時に枠を譲られた場合は受け付ける
+                self._observe_wait(loop.time() - started)
+                return
+            waiter.cancel()
+            self._observe_wait(loop.time() - started)
+            raise self._reject("queue_timeout")
+        except BaseException:
+            # 呼び出し元 (クライアントの切断など) がキャンセルされた場合、譲られた枠は次に回す
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            admission_queued.set(len(self._waiters), route_class=self.route_class)
+        self._observe_wait(loop.time() - started)
+
+    def release(self) -> None:
+        """枠を返却する (待っているリクエストがあればそのまま譲る)"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                return
+        self.inflight -= 1
+        admission_inflight.set(self.inflight, route_class=self.route_class)
+
+
+class AdmissionController:
+    """
+    過負荷時にリクエストを早期に拒否する受付制御
+
+    イベントループの遅延を一定間隔で計測し、ルートの分類ごとの同時処理数・受付の待ち時間と合わせて判定する。
+    LLM の応答が遅くなった場合でも、処理中・待機中のリクエスト (とそれが保持するメモリ) が上限を超えて
+    積み上がらないようにし、超えた分は 503 と Retry-After で他の pod や後の再試行に回す。
+    優先度の低い分類ほど低い閾値で拒否し、ヘルスチェックは常に受け付ける。
+    """
+
+    def __init__(self, lag_interval: float):
+        self.lag_interval = lag_interval
+        self.loop_lag = 0.0
+        self.limiters: Dict[str, RouteClassLimiter] = {
+            NORMAL: RouteClassLimiter(
+                NORMAL,
+                settings.ADMISSION_NORMAL_MAX_INFLIGHT,
+                settings.ADMISSION_MAX_QUEUE,
+                settings.ADMISSION_MAX_QUEUE_WAIT,
+                settings.ADMISSION_NORMAL_MAX_LOOP_LAG,
+            ),
+            LOW: RouteClassLimiter(
+                LOW,
+                settings.ADMISSION_LOW_MAX_INFLIGHT,
+                settings.ADMISSION_MAX_QUEUE,
+                settings.ADMISSION_MAX_QUEUE_WAIT,
+                settings.ADMISSION_LOW_MAX_LOOP_LAG,
+            ),
+        }
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        """イベントループの遅延の計測を開始する"""
+        if self._task is None:
+            self._task = asyncio.create_task(self._monitor_loop_lag(), name="event-loop-lag-monitor")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self.loop_lag = 0.0
+
+    async def _monitor_loop_lag(self) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            scheduled = loop.time() + self.lag_interval
+            await asyncio.sleep(self.lag_interval)
+            # ループが他の処理で塞がっていた分だけ、タイマーの実行が予定より遅れる
+            self.loop_lag = max(0.0, loop.time() - scheduled)
+            event_loop_lag.set(self.loop_lag)
+
+    async def acquire(self, route_class: str) -> None:
+        """
+        リクエストを受け付ける (受け付けた場合は処理後に release を呼ぶ)
+
+        Raises:
+            AdmissionRejectedError: 過負荷のため受け付けない場合
+        """
+        await self.limiters[route_class].acquire(self.loop_lag)
+
+    def release(self, route_class: str) -> None:
+        self.limiters[route_class].release()
+
+
+admission = AdmissionController(lag_interval=settings.ADMISSION_LAG_INTERVAL)
@@ -1,5 +1,5 @@
 import os
-from typing import Any, Optional
+from typing import Any, List, Optional
 
 from dotenv import load_dotenv
 from pydantic_settings import BaseSettings
@@ -16,18 +16,103 @@ class Settings(BaseSettings):
     ALLOWED_ORIGINS: str = os.getenv("ALLOWED_ORIGINS", "*")
     ENVIRONMENT: str = os.getenv("ENVIRONMENT", "development")
 
+    # 本番用サーバー (python -m app.server) の設定
+    SERVER_HOST: str = os.getenv("SERVER_HOST", "0.0.0.0")
+    SERVER_PORT: int = int(os.getenv("SERVER_PORT", 8000))
+    SERVER_WORKERS: int = int(os.getenv("SERVER_WORKERS", 0))  # 0の場合はcgroupのCPU上限から決める
+    SERVER_BACKLOG: int = int(os.getenv("SERVER_BACKLOG", 2048))  # listen の backlog
+    SERVER_KEEPALIVE_TIMEOUT: int = int(os.getenv("SERVER_KEEPALIVE_TIMEOUT", 60))  # ロードバランサーのアイドルタイムアウトより長くする (秒)
+    SERVER_GRACEFUL_TIMEOUT: int = int(os.getenv("SERVER_GRACEFUL_TIMEOUT", 25))  # 終了時に処理中のリクエストを待つ上限 (秒)
+    SERVER_LOG_LEVEL: str = os.getenv("SERVER_LOG_LEVEL", "info")
+    # X-Forwarded-For / X-Forwarded-Proto を信頼する接続元 (ingress controller など。IP または CIDR のカンマ区切り, "*" で全て)
+    FORWARDED_ALLOW_IPS: str = os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1")
+
+    # Prometheus 形式のメトリクスとヘルスチェック (/livez, /readyz) を公開する内部ポート (Service / ingress には含めない, 0で無効)
+    METRICS_HOST: str = os.getenv("METRICS_HOST", "0.0.0.0")
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", 9100))
+    METRICS_PATH: str = os.getenv("METRICS_PATH", "/metrics")
+    # 複数ワーカーの場合にワーカーごとのメトリクスを書き出すディレクトリ (python -m app.server が設定する)
+    METRICS_MULTIPROC_DIR: str = os.getenv("METRICS_MULTIPROC_DIR", "")
+    METRICS_EXPORT_INTERVAL: float = float(os.getenv("METRICS_EXPORT_INTERVAL", 5))  # ワーカーが書き出す間隔 (秒, スクレイプ間隔より短くする)
+
+    # レスポンス圧縮 (gzip / brotli)
+    COMPRESSION_MINIMUM_SIZE: int = int(os.getenv("COMPRESSION_MINIMUM_SIZE", 1024))  # この大きさ未満は圧縮しない (バイト)
+    COMPRESSION_GZIP_LEVEL: int = int(os.getenv("COMPRESSION_GZIP_LEVEL", 6))
+    COMPRESSION_BROTLI_QUALITY: int = int(os.getenv("COMPRESSION_BROTLI_QUALITY", 4))  # 0-11 (高いほど遅い)
+
+    # 処理段階ごとの計測 (Server-Timing ヘッダー / OpenTelemetry 互換のトレース)
+    # Server-Timing は内部の処理段階名と所要時間をクライアントに公開するため、既定では返さない (開発時のみ有効にする)
+    SERVER_TIMING_ENABLED: bool = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
+    TRACE_EXPORTER: str = os.getenv("TRACE_EXPORTER", "")  # "" (無効) / "file" / "otlp"
+    TRACE_SERVICE_NAME: str = os.getenv("TRACE_SERVICE_NAME", "ai-agent-2-backend")
+    TRACE_SAMPLE_RATE: float = float(os.getenv("TRACE_SAMPLE_RATE", 1.0))  # traceparent がない場合のサンプリング率
+    TRACE_FILE_PATH: str = os.getenv("TRACE_FILE_PATH", "traces.jsonl")
+    TRACE_OTLP_ENDPOINT: str = os.getenv("TRACE_OTLP_ENDPOINT", "http://localhost:4318/v1/traces")
+    TRACE_EXPORT_INTERVAL: float = float(os.getenv("TRACE_EXPORT_INTERVAL", 5))  # 秒
+    TRACE_EXPORT_MAX_PENDING: int = int(os.getenv("TRACE_EXPORT_MAX_PENDING", 2000))  # エクスポート待ちのトレース数の上限
+
     # JWT認証
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key-for-development")
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: Optional[int] = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 60 * 24))  # 1日
+    REFRESH_TOKEN_EXPIRE_DAYS: int = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", 30))
+
+    # パスワードハッシュ (bcrypt) 専用ワーカープールの設定
+    PASSWORD_HASH_WORKERS: int = int(os.getenv("PASSWORD_HASH_WORKERS", 2))
+    PASSWORD_HASH_QUEUE_SIZE: int = int(os.getenv("PASSWORD_HASH_QUEUE_SIZE", 16))  # 実行中以外に待機できる件数
+    PASSWORD_HASH_RETRY_AFTER: int = int(os.getenv("PASSWORD_HASH_RETRY_AFTER", 1))  # 503時のRetry-After (秒)
+
+    # レート制限 (ログイン済みはユーザーID、未ログインのルートはクライアントIPごと)
+    RATE_LIMIT_ENABLED: bool = os.getenv("RATE_LIMIT_ENABLED", "true").lower() == "true"
+    RATE_LIMIT_CHAT_REQUESTS: int = int(os.getenv("RATE_LIMIT_CHAT_REQUESTS", 20))  # ウィンドウあたりのチャット回数
+    RATE_LIMIT_CHAT_WINDOW: int = int(os.getenv("RATE_LIMIT_CHAT_WINDOW", 60))  # 秒
+    RATE_LIMIT_CHAT_CONCURRENCY: int = int(os.getenv("RATE_LIMIT_CHAT_CONCURRENCY", 2))  # ユーザーあたりの同時実行数
+    RATE_LIMIT_CONCURRENCY_TTL: int = int(os.getenv("RATE_LIMIT_CONCURRENCY_TTL", 120))  # 解放されなかった枠の有効期限 (秒)
+    RATE_LIMIT_CONCURRENCY_RETRY_AFTER: int = int(os.getenv("RATE_LIMIT_CONCURRENCY_RETRY_AFTER", 1))  # 429時のRetry-After (秒)
+    RATE_LIMIT_AUTH_REQUESTS: int = int(os.getenv("RATE_LIMIT_AUTH_REQUESTS", 10))  # ウィンドウあたりの認証リクエスト数
+    RATE_LIMIT_AUTH_WINDOW: int = int(os.getenv("RATE_LIMIT_AUTH_WINDOW", 60))  # 秒
+    RATE_LIMIT_REFRESH_REQUESTS: int = int(os.getenv("RATE_LIMIT_REFRESH_REQUESTS", 60))  # ウィンドウあたりのトークン再発行数 (ログインとは別に数える)
+    RATE_LIMIT_REFRESH_WINDOW: int = int(os.getenv("RATE_LIMIT_REFRESH_WINDOW", 60))  # 秒
+
+    # 過負荷時の受付制御 (イベントループの遅延・分類ごとの処理中の件数・受付の待ち時間が閾値を超えたら 503 で早期に拒否する)
+    ADMISSION_ENABLED: bool = os.getenv("ADMISSION_ENABLED", "true").lower() == "true"
+    ADMISSION_EXEMPT_PATHS: str = os.getenv("ADMISSION_EXEMPT_PATHS", "/api/v1/healthcheck")  # 常に受け付けるパス (前方一致, カンマ区切り)
+    # 先に拒否する POST のパス (完全一致, カンマ区切り)。LLM を呼ぶもののみで、キューに積むだけの /chat/jobs は含めない
+    ADMISSION_LOW_PRIORITY_PATHS: str = os.getenv("ADMISSION_LOW_PRIORITY_PATHS", "/api/v1/chat")
+    # 低優先度の同時処理数 (プロセスあたり)。チャットは認証後に DB 接続を返すため、DB_POOL_SIZE ではなく
+    # LLM のクォータとイベントループの負荷に合わせて決める
+    ADMISSION_LOW_MAX_INFLIGHT: int = int(os.getenv("ADMISSION_LOW_MAX_INFLIGHT", 32))
+    ADMISSION_NORMAL_MAX_INFLIGHT: int = int(os.getenv("ADMISSION_NORMAL_MAX_INFLIGHT", 128))  # 通常の同時処理数 (プロセスあたり)
+    ADMISSION_MAX_QUEUE: int = int(os.getenv("ADMISSION_MAX_QUEUE", 32))  # 同時処理数の上限に達した場合に待機できる件数 (分類ごと)
+    ADMISSION_MAX_QUEUE_WAIT: float = float(os.getenv("ADMISSION_MAX_QUEUE_WAIT", 1))  # 受付を待つ上限 (秒)
+    ADMISSION_LOW_MAX_LOOP_LAG: float = float(os.getenv("ADMISSION_LOW_MAX_LOOP_LAG", 0.1))  # この遅延を超えたら低優先度を拒否 (秒)
+    ADMISSION_NORMAL_MAX_LOOP_LAG: float = float(os.getenv("ADMISSION_NORMAL_MAX_LOOP_LAG", 0.5))  # この遅延を超えたら通常も拒否 (秒)
+    ADMISSION_LAG_INTERVAL: float = float(os.getenv("ADMISSION_LAG_INTERVAL", 0.1))  # イベントループの遅延の計測間隔 (秒)
+    ADMISSION_RETRY_AFTER: int = int(os.getenv("ADMISSION_RETRY_AFTER", 2))  # 503時のRetry-After (秒)
+
+    # ユーザー一括登録の設定
+    USER_IMPORT_CHUNK_SIZE: int = int(os.getenv("USER_IMPORT_CHUNK_SIZE", 500))  # 1回のINSERTで登録する行数
+    USER_IMPORT_HASH_WORKERS: int = int(os.getenv("USER_IMPORT_HASH_WORKERS", 0))  # 0の場合はCPUコア数
+    USER_IMPORT_MAX_ERRORS: int = int(os.getenv("USER_IMPORT_MAX_ERRORS", 1000))  # レポートに含めるエラー行の上限
 
     # Github OAuthの設定
     GITHUB_CLIENT_ID: Optional[str] = os.getenv("GITHUB_CLIENT_ID")
     GITHUB_CLIENT_SECRET: Optional[str] = os.getenv("GITHUB_CLIENT_SECRET")
     GITHUB_REDIRECT_URI: Optional[str] = os.getenv("GITHUB_REDIRECT_URI")
 
+    # ローカルのスタンドインサーバーに向ける場合に変更する
+    GITHUB_OAUTH_BASE_URL: str = os.getenv("GITHUB_OAUTH_BASE_URL", "https://github.com")
+    GITHUB_API_BASE_URL: str = os.getenv("GITHUB_API_BASE_URL", "https://api.github.com")
+
     FRONTEND_REDIRECT_URL: Optional[str] = os.getenv("FRONTEND_REDIRECT_URL")
 
+    # 外部API呼び出し用の共有HTTPクライアント設定
+    HTTP_CLIENT_MAX_CONNECTIONS: int = int(os.getenv("HTTP_CLIENT_MAX_CONNECTIONS", 100))
+    HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv("HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS", 20))
+    HTTP_CLIENT_KEEPALIVE_EXPIRY: float = float(os.getenv("HTTP_CLIENT_KEEPALIVE_EXPIRY", 30))  # 秒
+    HTTP_CLIENT_TIMEOUT: float = float(os.getenv("HTTP_CLIENT_TIMEOUT", 10))  # 秒
+    HTTP_CLIENT_CONNECT_TIMEOUT: float = float(os.getenv("HTTP_CLIENT_CONNECT_TIMEOUT", 5))  # 秒
+
     # データベース設定
     POSTGRES_SERVER: str = os.getenv("POSTGRES_SERVER", "db")  # Docker環境ではサービス名を使用
     POSTGRES_USER: str = os.getenv("POSTGRES_USER", "postgres")
@@ -36,15 +121,73 @@ class Settings(BaseSettings):
     POSTGRES_PORT: str = os.getenv("POSTGRES_PORT", "5432")
 
     # SQLAlchemy
-    SQLALCHEMY_DATABASE_URI: Optional[str] = None
+    DATABASE_URL: Optional[str] = os.getenv("DATABASE_URL")  # 指定時は POSTGRES_* より優先 (負荷試験の SQLite など)
+    SQLALCHEMY_DATABASE_URI: Optional[str] = None  # 同期ドライバ (Alembic用)
+    SQLALCHEMY_ASYNC_DATABASE_URI: Optional[str] = None  # 非同期ドライバ (アプリケーション用)
+
+    # コネクションプール設定 (レプリカ数・ワーカー数に応じてpodごとに調整する)
+    DB_POOL_SIZE: int = int(os.getenv("DB_POOL_SIZE", 5))
+    DB_MAX_OVERFLOW: int = int(os.getenv("DB_MAX_OVERFLOW", 10))
+    DB_POOL_TIMEOUT: float = float(os.getenv("DB_POOL_TIMEOUT", 30))  # 取得待ちの上限 (秒)
+    DB_POOL_RECYCLE: int = int(os.getenv("DB_POOL_RECYCLE", 1800))  # 接続の再作成間隔 (秒, -1で無効)
+    # True: 取得のたびに死活確認する (悲観的) / False: 切断エラー検知時にプールを無効化する (楽観的)
+    DB_POOL_PRE_PING: bool = os.getenv("DB_POOL_PRE_PING", "true").lower() == "true"
+
+    # 読み取り専用レプリカ (指定時は UserService などの読み取りをレプリカに振り分ける。プールの設定はプライマリと共通)
+    DB_REPLICA_URLS: str = os.getenv("DB_REPLICA_URLS", "")  # DATABASE_URL と同じ形式のカンマ区切り
+    SQLALCHEMY_ASYNC_REPLICA_URIS: List[str] = []  # 非同期ドライバ (DB_REPLICA_URLS から作成)
+    DB_REPLICA_MAX_LAG: float = float(os.getenv("DB_REPLICA_MAX_LAG", 5))  # これ以上遅れているレプリカには振り分けない (秒)
+    DB_REPLICA_CHECK_INTERVAL: float = float(os.getenv("DB_REPLICA_CHECK_INTERVAL", 5))  # 死活・遅延の確認間隔 (秒)
+    DB_REPLICA_CHECK_TIMEOUT: float = float(os.getenv("DB_REPLICA_CHECK_TIMEOUT", 2))  # 確認の上限 (秒, 超えた場合は異常とみなす)
+
+    # 最終ログイン日時の書き込み遅延 (write-behind) 設定
+    LAST_LOGIN_FLUSH_INTERVAL: float = float(os.getenv("LAST_LOGIN_FLUSH_INTERVAL", 5))  # 最大遅延 (秒)
+    LAST_LOGIN_MAX_PENDING: int = int(os.getenv("LAST_LOGIN_MAX_PENDING", 1000))  # この件数に達したら即時反映
+
+    # リフレッシュトークンのハッシュの永続化 (Redis 障害時の照合用) の書き込み遅延設定
+    REFRESH_TOKEN_FLUSH_INTERVAL: float = float(os.getenv("REFRESH_TOKEN_FLUSH_INTERVAL", 1))  # 最大遅延 (秒)
+    REFRESH_TOKEN_MAX_PENDING: int = int(os.getenv("REFRESH_TOKEN_MAX_PENDING", 1000))  # この件数に達したら即時反映
+
+    # LLMのトークン使用量の集計 (MongoDBへの書き込みをまとめる) 設定
+    USAGE_FLUSH_INTERVAL: float = float(os.getenv("USAGE_FLUSH_INTERVAL", 5))  # 最大遅延 (秒)
+    USAGE_MAX_PENDING: int = int(os.getenv("USAGE_MAX_PENDING", 1000))  # 未反映の集計ドキュメントがこの数に達したら即時反映
+    USAGE_DAILY_TOKEN_QUOTA: int = int(os.getenv("USAGE_DAILY_TOKEN_QUOTA", 0))  # ユーザーごとの1日 (UTC) のトークン数の上限 (0で無効)
 
     # Redis設定
     REDIS_URL: Optional[str] = None  # RedisのURLが設定されている場合
     REDIS_HOST: str = os.getenv("REDIS_HOST", "redis")  # Docker環境ではサービス名を使用
     REDIS_PORT: int = int(os.getenv("REDIS_PORT", 6379))
+    REDIS_MAX_CONNECTIONS: int = int(os.getenv("REDIS_MAX_CONNECTIONS", 50))  # プロセスあたりの上限
+    REDIS_SOCKET_TIMEOUT: float = float(os.getenv("REDIS_SOCKET_TIMEOUT", 5))  # 秒
     REDIS_IMAGE_CACHE_TTL: int = 3600  # 1時間
     REDIS_MAX_IMAGE_SIZE: int = 1024 * 1024 * 5  # 最大5MB
 
+    # チャットジョブ (Redis Streams) 設定
+    CHAT_JOB_STREAM: str = os.getenv("CHAT_JOB_STREAM", "chat:jobs")
+    CHAT_JOB_GROUP: str = os.getenv("CHAT_JOB_GROUP", "chat-workers")
+    CHAT_JOB_STREAM_MAXLEN: int = int(os.getenv("CHAT_JOB_STREAM_MAXLEN", 10000))  # ストリームに残すエントリ数の目安
+    # ストリームに追加する入力 (履歴を除く JSON) の上限 (バイト)。超えた場合は 413 で拒否する
+    CHAT_JOB_MAX_PAYLOAD_BYTES: int = int(os.getenv("CHAT_JOB_MAX_PAYLOAD_BYTES", 16 * 1024))
+    CHAT_JOB_RESULT_TTL: int = int(os.getenv("CHAT_JOB_RESULT_TTL", 3600))  # ジョブの状態・結果と冪等キーの保持期間 (秒)
+    CHAT_JOB_MAX_WAIT: float = float(os.getenv("CHAT_JOB_MAX_WAIT", 30))  # 結果取得のロングポーリングの上限 (秒)
+    CHAT_JOB_POLL_INTERVAL: float = float(os.getenv("CHAT_JOB_POLL_INTERVAL", 0.5))  # ロングポーリング中の確認間隔 (秒)
+
+    # チャットワーカー (python -m app.worker) 設定
+    WORKER_CONCURRENCY: int = int(os.getenv("WORKER_CONCURRENCY", 8))  # プロセスあたりの同時実行ジョブ数
+    WORKER_BLOCK_TIMEOUT: float = float(os.getenv("WORKER_BLOCK_TIMEOUT", 2))  # XREADGROUP の待ち時間 (REDIS_SOCKET_TIMEOUT より短くする)
+    WORKER_CLAIM_IDLE: int = int(os.getenv("WORKER_CLAIM_IDLE", 60))  # 応答の無いワーカーのジョブを引き取るまでの時間 (秒)
+    WORKER_MAX_ATTEMPTS: int = int(os.getenv("WORKER_MAX_ATTEMPTS", 3))  # ジョブの最大実行回数 (超えたら failed)
+    WORKER_SHUTDOWN_TIMEOUT: float = float(os.getenv("WORKER_SHUTDOWN_TIMEOUT", 30))  # 終了時に実行中のジョブを待つ時間 (秒)
+
+    # WebSocket チャット (/chat/ws) 設定
+    WS_MAX_CONNECTIONS: int = int(os.getenv("WS_MAX_CONNECTIONS", 200))  # プロセスあたりの同時接続数の上限
+    WS_AUTH_TIMEOUT: float = float(os.getenv("WS_AUTH_TIMEOUT", 10))  # 接続後に認証メッセージを待つ時間 (秒)
+    WS_PING_INTERVAL: float = float(os.getenv("WS_PING_INTERVAL", 20))  # ping を送る間隔 (秒)
+    WS_PING_TIMEOUT: float = float(os.getenv("WS_PING_TIMEOUT", 20))  # ping の後、クライアントからの受信が無ければ切断するまでの時間 (秒)
+    WS_HISTORY_WINDOW: int = int(os.getenv("WS_HISTORY_WINDOW", 50))  # 接続中にメモリに保持する会話ごとの履歴の件数
+    WS_SEND_QUEUE_SIZE: int = int(os.getenv("WS_SEND_QUEUE_SIZE", 64))  # 送信待ちのメッセージ数の上限 (超えたら生成を待たせる)
+    WS_SEND_TIMEOUT: float = float(os.getenv("WS_SEND_TIMEOUT", 10))  # 送信が進まない場合に切断するまでの時間 (秒)
+
     # MinIO設定
     MINIO_ENDPOINT_URL: str = os.getenv("MINIO_ENDPOINT_URL")
     MINIO_ACCESS_KEY_ID: str = os.getenv("MINIO_ACCESS_KEY_ID", "minioadmin")
@@ -55,12 +198,35 @@ class Settings(BaseSettings):
     GOOGLE_API_KEY: str = os.getenv("GOOGLE_API_KEY")
     GOOGLE_CHAT_MODEL: str = os.getenv("GOOGLE_CHAT_MODEL", "gemini-1.5-flash")
 
+    # 検索による長期記憶 (過去のメッセージから関連するものだけをプロンプトに含める) 設定
+    MEMORY_ENABLED: bool = os.getenv("MEMORY_ENABLED", "false").lower() == "true"
+    MEMORY_EMBEDDER: str = os.getenv("MEMORY_EMBEDDER", "google")  # google / hashing (ローカルで決定的, オフラインの試験用)
+    MEMORY_EMBEDDING_MODEL: str = os.getenv("MEMORY_EMBEDDING_MODEL", "models/text-embedding-004")
+    MEMORY_HASHING_DIM: int = int(os.getenv("MEMORY_HASHING_DIM", 512))  # hashing の次元数
+    MEMORY_RECENT_WINDOW: int = int(os.getenv("MEMORY_RECENT_WINDOW", 20))  # そのままプロンプトに含める直近のメッセージ数
+    MEMORY_TOP_K: int = int(os.getenv("MEMORY_TOP_K", 5))  # それより前のメッセージから検索して含める件数
+    MEMORY_MIN_SCORE: float = float(os.getenv("MEMORY_MIN_SCORE", 0.2))  # 含めるメッセージのコサイン類似度の下限
+    MEMORY_MAX_ENTRIES: int = int(os.getenv("MEMORY_MAX_ENTRIES", 2000))  # 会話ごとに保持するベクトル数 (古いものから削除, 1ドキュメント16MBの上限に収める)
+    # プロセス内にキャッシュする会話のインデックスの合計の上限 (バイト, ベクトルとテキスト)。1会話あたり最大で
+    # MEMORY_MAX_ENTRIES × 次元 × 4 バイト (既定の768次元では約6MB) になるため、pod のメモリ上限 ÷ ワーカー数に収める
+    MEMORY_CACHE_MAX_BYTES: int = int(os.getenv("MEMORY_CACHE_MAX_BYTES", 32 * 1024 * 1024))
+
     # MongoDB設定
     MONGODB_URL: Optional[str] = None
     MONGODB_HOST: Optional[str] = os.getenv("MONGODB_HOST", "mongo")  # Docker環境ではサービス名を使用
     MONGODB_USERNAME: Optional[str] = os.getenv("MONGODB_USERNAME", "mongdb")
     MONGODB_PASSWORD: Optional[str] = os.getenv("MONGODB_PASSWORD", "mongdb")
     MONGODB_DB_NAME: Optional[str] = os.getenv("MONGODB_DB_NAME", "furniaizer")
+    MONGODB_MAX_POOL_SIZE: int = int(os.getenv("MONGODB_MAX_POOL_SIZE", 50))  # プロセスあたりの上限
+    MONGODB_SERVER_SELECTION_TIMEOUT: float = float(os.getenv("MONGODB_SERVER_SELECTION_TIMEOUT", 5))  # 秒
+
+    # 起動時のウォームアップとreadinessの設定
+    STARTUP_WARM_DB_CONNECTIONS: int = int(os.getenv("STARTUP_WARM_DB_CONNECTIONS", 0))  # 0の場合はDB_POOL_SIZE
+    # False: LLM関連のモジュールを初回のチャットまで読み込まない (認証のみのpodなど)
+    STARTUP_WARM_LLM: bool = os.getenv("STARTUP_WARM_LLM", "true").lower() == "true"
+    STARTUP_WARMUP_TIMEOUT: float = float(os.getenv("STARTUP_WARMUP_TIMEOUT", 10))  # 起動時の接続確認の上限 (秒)
+    READINESS_PROBE_TIMEOUT: float = float(os.getenv("READINESS_PROBE_TIMEOUT", 2))  # 依存先ごとの確認の上限 (秒)
+    READINESS_OPTIONAL_CHECKS: str = os.getenv("READINESS_OPTIONAL_CHECKS", "")  # 失敗してもreadyとする依存先 (カンマ区切り)
 
     def __init__(self, **data: Any):
         super().__init__(**data)
@@ -77,7 +243,13 @@ class Settings(BaseSettings):
                 f"postgresql://{self.POSTGRES_USER}:{self.POSTGRES_PASSWORD}"
                 f"@{self.POSTGRES_SERVER}:{self.POSTGRES_PORT}/{self.POSTGRES_DB}"
             )
-            # または: self.SQLALCHEMY_DATABASE_URI = "sqlite:///./test.db"
+            # または: DATABASE_URL=sqlite:///./test.db
+        if self.DATABASE_URL:
+            self.SQLALCHEMY_DATABASE_URI = self.DATABASE_URL
+
+        # アプリケーションからはasyncpg (SQLiteの場合はaiosqlite) 経由で接続する
+        self.SQLALCHEMY_ASYNC_DATABASE_URI = self._async_uri(self.SQLALCHEMY_DATABASE_URI)
+        self.SQLALCHEMY_ASYNC_REPLICA_URIS = [self._async_uri(url.strip()) for url in self.DB_REPLICA_URLS.split(",") if url.strip()]
 
         self.REDIS_URL = f"redis://{self.REDIS_HOST}:{self.REDIS_PORT}"
 
@@ -89,6 +261,10 @@ class Settings(BaseSettings):
             # Docker環境などでは認証情報を使用
             self.MONGODB_URL = f"mongodb://{self.MONGODB_USERNAME}:{self.MONGODB_PASSWORD}@{self.MONGODB_HOST}:27017"
 
+    @staticmethod
+    def _async_uri(uri: str) -> str:
+        return uri.replace("postgresql://", "postgresql+asyncpg://", 1).replace("sqlite://", "sqlite+aiosqlite://", 1)
+
     class Config:
         case_sensitive = True
 
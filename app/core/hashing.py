@@ -0,0 +1,98 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.security import get_password_hash, verify_password
+
+hash_duration = registry.histogram(
+    "password_hash_duration_seconds", "bcrypt のハッシュ/検証にかかった時間", ["operation"], buckets=(0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0)
+)
+hash_queue_wait = registry.histogram("password_hash_queue_wait_seconds", "ハッシュ処理がワーカーに渡るまでの待ち時間", ["operation"])
+hash_rejected = registry.counter("password_hash_rejected_total", "待ち行列が満杯で拒否されたハッシュ処理の件数", ["operation"])
+hash_pending = registry.gauge("password_hash_pending", "実行中および待機中のハッシュ処理の件数")
+
+
+class PasswordHasherBusyError(Exception):
+    """ハッシュ処理の待ち行列が満杯の場合に送出される例外"""
+
+    def __init__(self, retry_after: int):
+        super().__init__("password hasher queue is full")
+        self.retry_after = retry_after
+
+
+class PasswordHasher:
+    """
+    bcrypt 専用のワーカープール
+
+    AnyIO のデフォルトスレッドプールとは別のスレッドで bcrypt を実行し、
+    実行中 + 待機中の件数が上限を超えた場合は即座に PasswordHasherBusyError を送出する。
+    bcrypt は計算中に GIL を解放するため、スレッドでもコア数分の並列度が得られる。
+    """
+
+    def __init__(self, max_workers: int, queue_size: int, retry_after: int):
+        self.max_workers = max_workers
+        self.queue_size = queue_size
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(max_workers + queue_size)
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="password-hash")
+        return self._executor
+
+    def _release(self, _future: Any = None) -> None:
+        hash_pending.dec()
+        self._slots.release()
+
+    @staticmethod
+    def _run(operation: str, enqueued_at: float, func: Callable[..., Any], *args: Any) -> Any:
+        started = time.perf_counter()
+        hash_queue_wait.observe(started - enqueued_at, operation=operation)
+        try:
+            return func(*args)
+        finally:
+            hash_duration.observe(time.perf_counter() - started, operation=operation)
+
+    async def _submit(self, operation: str, func: Callable[..., Any], *args: Any) -> Any:
+        if not self._slots.acquire(blocking=False):
+            hash_rejected.inc(operation=operation)
+            raise PasswordHasherBusyError(self.retry_after)
+        hash_pending.inc()
+        try:
+            future = self._get_executor().submit(self._run, operation, time.perf_counter(), func, *args)
+        except BaseException:
+            self._release()
+            raise
+        # 呼び出し元がキャンセルされてもワーカーの完了時にスロットを返却する
+        future.add_done_callback(self._release)
+        return await asyncio.wrap_future(future)
+
+    async def hash(self, password: str) -> str:
+        """パスワードハッシュを生成"""
+        return await self._submit("hash", get_password_hash, password)
+
+    async def verify(self, plain_password: str, hashed_password: str) -> bool:
+        """パスワードを検証"""
+        return await self._submit("verify", verify_password, plain_password, hashed_password)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """ワーカープールを停止"""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=wait)
+                self._executor = None
+
+
+password_hasher = PasswordHasher(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    queue_size=settings.PASSWORD_HASH_QUEUE_SIZE,
+    retry_after=settings.PASSWORD_HASH_RETRY_AFTER,
+)
@@ -0,0 +1,62 @@
+import os
+from typing import Optional
+
+import httpx
+
+from app.core.config import settings
+
+_client: Optional[httpx.AsyncClient] = None
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """
+    外部API呼び出し用のHTTPクライアントを作成
+
+    keep-alive したコネクションを再利用することで、呼び出しごとのTLSハンドシェイクを避ける
+    """
+    return httpx.AsyncClient(
+        limits=httpx.Limits(
+            max_connections=settings.HTTP_CLIENT_MAX_CONNECTIONS,
+            max_keepalive_connections=settings.HTTP_CLIENT_MAX_KEEPALIVE_CONNECTIONS,
+            keepalive_expiry=settings.HTTP_CLIENT_KEEPALIVE_EXPIRY,
+        ),
+        timeout=httpx.Timeout(settings.HTTP_CLIENT_TIMEOUT, connect=settings.HTTP_CLIENT_CONNECT_TIMEOUT),
+    )
+
+
+async def start_http_client() -> httpx.AsyncClient:
+    """アプリケーション起動時に共有クライアントを作成"""
+    global _client
+    if _client is None:
+        _client = create_http_client()
+    return _client
+
+
+async def close_http_client() -> None:
+    """アプリケーション終了時に共有クライアントを閉じる"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+def get_http_client() -> httpx.AsyncClient:
+    """
+    共有HTTPクライアントの依存関係
+
+    lifespan を経由しない実行 (スクリプトなど) でも使えるよう、未作成なら作成する
+    """
+    global _client
+    if _client is None:
+        _client = create_http_client()
+    return _client
+
+
+def _reset_after_fork() -> None:
+    # 親プロセスのコネクションを子プロセスで使わないよう、次回利用時に作り直す
+    global _client
+    _client = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
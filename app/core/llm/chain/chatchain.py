@@ -1,10 +1,19 @@
 import logging
+import time
+from typing import TYPE_CHECKING, Any, AsyncIterator, List, Optional, Tuple
 
 from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessageChunk, BaseMessage
 from langchain_core.prompts import PromptTemplate
 
+from app.core.config import settings
 from app.core.llm.chain.base import BaseChain
-from app.schemas.chat import ChatInput, ChatOutput
+from app.core.tracing import span
+from app.schemas.chat import ChatInput, ChatMessage, ChatOutput
+from app.schemas.usage import LLMUsage
+
+if TYPE_CHECKING:
+    from app.core.llm.memory.retrieval import RetrievalMemory
 
 logger = logging.getLogger(__name__)
 
@@ -12,8 +21,10 @@ logger = logging.getLogger(__name__)
 class ChatChain(BaseChain):
     """Custom chat chain that handles history formatting"""
 
-    def __init__(self, chat_llm: BaseChatModel):
+    def __init__(self, chat_llm: BaseChatModel, memory: Optional["RetrievalMemory"] = None):
         self.chat_llm = chat_llm
+        # 指定された場合、直近の MEMORY_RECENT_WINDOW 件より前の履歴は関連するものだけを検索して含める
+        self.memory = memory
         self.prompt = PromptTemplate(
             template="""You are a helpful AI assistant. Based on the conversation history and the current message, provide a helpful response.
 
@@ -27,38 +38,111 @@ Model name: {model_name}
 Please provide a helpful and relevant response.""",
             input_variables=["role", "response", "history", "model_name"],
         )
-        self.chain = self.prompt | self.chat_llm.with_structured_output(ChatOutput, method="function_calling")
+        # include_raw=True: パース結果と一緒に元の AIMessage (usage_metadata にトークン数) を受け取る
+        self.structured_llm = self.chat_llm.with_structured_output(ChatOutput, method="function_calling", include_raw=True)
+        self.chain = self.prompt | self.structured_llm
 
-    def get_prompt(self, inputs: ChatInput, **kwargs) -> str:
-        """Get the prompt string with formatted history."""
-        # Format history
+    @staticmethod
+    def _history_text(messages: List[ChatMessage]) -> str:
         history_text = ""
-        for msg in inputs.history:
+        for msg in messages:
             history_text += f"{msg.role}: {msg.content}\n"
+        return history_text
 
-        # Create formatted input
-        formatted_input = {
+    def _format_input(self, inputs: ChatInput) -> dict:
+        """Build the prompt variables with formatted history."""
+        return {
             "role": inputs.role,
             "response": inputs.response,
-            "history": history_text,
+            "history": self._history_text(inputs.history),
             "model_name": inputs.model_name or "gemini-pro",
         }
 
-        return self.prompt.invoke(formatted_input, **kwargs).to_string()
+    async def _aformat_input(self, inputs: ChatInput) -> dict:
+        """Build the prompt variables, replacing the older history with retrieved relevant messages.
+
+        Without a memory, or while the history fits in the recent window, this is the same as _format_input.
+        """
+        window = settings.MEMORY_RECENT_WINDOW
+        if self.memory is None or len(inputs.history) <= window:
+            return self._format_input(inputs)
+        recent = inputs.history[-window:] if window > 0 else []
+        current = ChatMessage(role=inputs.role, content=inputs.response)
+        retrieved = await self.memory.search(
+            inputs.chat_id, inputs.response, settings.MEMORY_TOP_K, settings.MEMORY_MIN_SCORE, exclude=[*recent, current]
+        )
+        history_text = self._history_text(recent)
+        if retrieved:
+            relevant = self._history_text([message for _, message in retrieved])
+            history_text = f"\nRelevant earlier messages:\n{relevant}\nRecent messages:\n{history_text}"
+        return {**self._format_input(inputs), "history": history_text}
 
-    def invoke(self, inputs: ChatInput, **kwargs) -> ChatOutput:
-        """Invoke the chain with history formatting."""
-        # Format history
-        history_text = ""
-        for msg in inputs.history:
-            history_text += f"{msg.role}: {msg.content}\n"
+    def get_prompt(self, inputs: ChatInput, **kwargs) -> str:
+        """Get the prompt string with formatted history."""
+        return self.prompt.invoke(self._format_input(inputs), **kwargs).to_string()
 
-        # Create formatted input
-        formatted_input = {
-            "role": inputs.role,
-            "response": inputs.response,
-            "history": history_text,
-            "model_name": inputs.model_name or "gemini-pro",
-        }
+    def invoke(self, inputs: ChatInput, **kwargs) -> ChatOutput:
+        """Invoke the chain with history formatting.
+
+        Prompt rendering and the model call are timed as separate stages.
+        """
+        output, _ = self.invoke_with_usage(inputs, **kwargs)
+        return output
+
+    def invoke_with_usage(self, inputs: ChatInput, **kwargs) -> Tuple[ChatOutput, LLMUsage]:
+        """Invoke the chain and return the token usage and latency of the model call."""
+        with span("prompt", history_messages=len(inputs.history)):
+            prompt_value = self.prompt.invoke(self._format_input(inputs), **kwargs)
+        with span("llm"):
+            started = time.perf_counter()
+            result = self.structured_llm.invoke(prompt_value, **kwargs)
+            latency_ms = (time.perf_counter() - started) * 1000
+        return self._parse_result(inputs, result, latency_ms)
+
+    async def ainvoke_with_usage(self, inputs: ChatInput, **kwargs) -> Tuple[ChatOutput, LLMUsage]:
+        """Async variant of invoke_with_usage that does not block the event loop during the model call.
+
+        With a memory, only the recent window and the retrieved relevant messages are sent as history.
+        """
+        with span("prompt", history_messages=len(inputs.history)):
+            prompt_value = self.prompt.invoke(await self._aformat_input(inputs), **kwargs)
+        with span("llm"):
+            started = time.perf_counter()
+            result = await self.structured_llm.ainvoke(prompt_value, **kwargs)
+            latency_ms = (time.perf_counter() - started) * 1000
+        return self._parse_result(inputs, result, latency_ms)
+
+    async def astream(self, inputs: ChatInput, **kwargs) -> AsyncIterator[AIMessageChunk]:
+        """Stream the answer as plain-text message chunks (without structured output).
+
+        The last chunks carry usage_metadata; add the chunks together and pass the result to usage_from_message.
+        """
+        with span("prompt", history_messages=len(inputs.history)):
+            prompt_value = self.prompt.invoke(await self._aformat_input(inputs), **kwargs)
+        async for chunk in self.chat_llm.astream(prompt_value, **kwargs):
+            yield chunk
+
+    @staticmethod
+    def chunk_text(chunk: BaseMessage) -> str:
+        """Text of a message chunk (content may be a list of parts for multimodal models)."""
+        if isinstance(chunk.content, str):
+            return chunk.content
+        return "".join(part if isinstance(part, str) else part.get("text", "") for part in chunk.content)
+
+    @staticmethod
+    def usage_from_message(inputs: ChatInput, message: Any, latency_ms: float) -> LLMUsage:
+        """Build LLMUsage from the raw model message (0 tokens when the model does not report usage)."""
+        usage_metadata = getattr(message, "usage_metadata", None) or {}
+        response_metadata = getattr(message, "response_metadata", None) or {}
+        return LLMUsage(
+            model=response_metadata.get("model_name") or inputs.model_name or "gemini-pro",
+            prompt_tokens=usage_metadata.get("input_tokens", 0),
+            completion_tokens=usage_metadata.get("output_tokens", 0),
+            total_tokens=usage_metadata.get("total_tokens", 0),
+            latency_ms=latency_ms,
+        )
 
-        return self.chain.invoke(formatted_input, **kwargs)
+    def _parse_result(self, inputs: ChatInput, result: dict, latency_ms: float) -> Tuple[ChatOutput, LLMUsage]:
+        if result.get("parsing_error") is not None:
+            raise result["parsing_error"]
+        return result["parsed"], self.usage_from_message(inputs, result.get("raw"), latency_ms)
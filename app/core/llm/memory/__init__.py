@@ -0,0 +1 @@
+# LLM memory components
@@ -0,0 +1,98 @@
+import hashlib
+import re
+from abc import ABC, abstractmethod
+from typing import List, Optional
+
+import numpy as np
+
+from app.core.config import settings
+
+TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+
+class BaseEmbedder(ABC):
+    """Base class for text embedders used by the retrieval memory"""
+
+    # Identifier stored with the vectors; indexes built by a different embedder are not mixed
+    name: str
+
+    @abstractmethod
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        """Embed texts
+
+        Args:
+            texts: Texts to embed
+
+        Returns:
+            float32 array of shape (len(texts), dim), L2-normalized per row
+        """
+        pass
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (vectors / norms).astype(np.float32)
+
+
+class HashingEmbedder(BaseEmbedder):
+    """Deterministic local embedder (feature hashing of words and character trigrams)
+
+    Needs no network access or model files, so it is used for offline testing and load tests.
+    Character trigrams make it work for Japanese text without word boundaries.
+    """
+
+    def __init__(self, dim: int = 512):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _features(self, text: str) -> List[str]:
+        text = text.lower()
+        words = TOKEN_RE.findall(text)
+        compact = "".join(words)
+        return words + [compact[i : i + 3] for i in range(max(0, len(compact) - 2))]
+
+    def embed_one(self, text: str) -> np.ndarray:
+        vector = np.zeros(self.dim, dtype=np.float32)
+        for feature in self._features(text):
+            digest = hashlib.blake2b(feature.encode("utf-8"), digest_size=8).digest()
+            value = int.from_bytes(digest, "little")
+            # 下位ビットで次元、最上位ビットで符号を決め、衝突による偏りを打ち消す
+            vector[value % self.dim] += 1.0 if value >> 63 else -1.0
+        return vector
+
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+        return _normalize(np.stack([self.embed_one(text) for text in texts]))
+
+
+class GoogleEmbedder(BaseEmbedder):
+    """Embedder backed by the Google Generative AI embedding API"""
+
+    def __init__(self, model: str, api_key: Optional[str] = None):
+        from langchain_google_genai import GoogleGenerativeAIEmbeddings
+
+        self.name = f"google:{model}"
+        self._client = GoogleGenerativeAIEmbeddings(model=model, google_api_key=api_key or settings.GOOGLE_API_KEY)
+
+    async def aembed(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+        return _normalize(np.asarray(await self._client.aembed_documents(texts), dtype=np.float32))
+
+
+_embedder: Optional[BaseEmbedder] = None
+
+
+def get_embedder() -> BaseEmbedder:
+    """Process-wide embedder selected by MEMORY_EMBEDDER"""
+    global _embedder
+    if _embedder is None:
+        if settings.MEMORY_EMBEDDER == "hashing":
+            _embedder = HashingEmbedder(settings.MEMORY_HASHING_DIM)
+        elif settings.MEMORY_EMBEDDER == "google":
+            _embedder = GoogleEmbedder(settings.MEMORY_EMBEDDING_MODEL)
+        else:
+            raise ValueError(f"Unknown MEMORY_EMBEDDER: {settings.MEMORY_EMBEDDER}")
+    return _embedder
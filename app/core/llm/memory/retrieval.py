@@ -0,0 +1,222 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import TYPE_CHECKING, List, Optional, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.core.llm.memory.embedders import BaseEmbedder, get_embedder
+from app.core.llm.memory.vector_index import VectorIndex
+from app.core.metrics import registry
+from app.core.tracing import span
+from app.schemas.chat import ChatMessage
+
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorDatabase
+
+logger = logging.getLogger(__name__)
+
+COLLECTION = "chat_memory"
+# 直前に埋め込んだテキストのベクトルを保持する件数 (保存したユーザーのメッセージを、そのまま検索クエリに使い回す)
+EMBEDDING_MEMO_SIZE = 64
+
+memory_search_duration = registry.histogram("memory_search_duration_seconds", "長期記憶の検索 (クエリの埋め込みを含む) にかかった時間")
+memory_index_loads = registry.counter("memory_index_loads_total", "長期記憶のインデックスを Mongo から読み込んだ回数")
+memory_errors = registry.counter("memory_errors_total", "長期記憶の埋め込み・保存・検索に失敗した回数", ["op"])
+memory_cache_bytes = registry.gauge("memory_cache_bytes", "キャッシュしている長期記憶のインデックスの大きさ (バイト)")
+
+
+class _CachedIndex:
+    def __init__(self, count: int, index: VectorIndex):
+        # Mongo 側の count (追加されたメッセージの累計) とインデックスが一致していれば再読み込みしない
+        self.count = count
+        self.index = index
+        self.text_bytes = sum(len(message.content) for message in index.items)
+
+    def add(self, vector: np.ndarray, message: ChatMessage) -> None:
+        self.index.add(vector, message)
+        self.count += 1
+        self.text_bytes += len(message.content)
+
+    @property
+    def nbytes(self) -> int:
+        # テキストは文字数で近似する (ベクトルに比べて小さいため)
+        return self.index.nbytes + self.text_bytes
+
+
+class RetrievalMemory:
+    """Long-term memory that retrieves relevant past messages of a chat by embedding similarity
+
+    Every saved message is embedded and appended to one document per chat in the chat_memory
+    collection (capped at MEMORY_MAX_ENTRIES vectors). Searches run against a per-chat VectorIndex
+    kept in a process-wide LRU cache, which is revalidated by reading only the document's counter.
+    The cache is bounded by MEMORY_CACHE_MAX_BYTES rather than by a number of chats, since one
+    long chat can hold thousands of vectors while most hold a few.
+    """
+
+    # インデックスのキャッシュはリクエストごとに作るインスタンス間で共有する
+    _cache: "OrderedDict[str, _CachedIndex]" = OrderedDict()
+    _cache_bytes = 0
+    _memo: "OrderedDict[str, np.ndarray]" = OrderedDict()
+    _indexed = False
+
+    def __init__(self, mongodb: "AsyncIOMotorDatabase", embedder: BaseEmbedder):
+        self.collection = mongodb[COLLECTION]
+        self.embedder = embedder
+
+    def _key(self, chat_id: str) -> dict:
+        # 埋め込みモデルを切り替えた場合は別のドキュメントとして扱う (次元・空間が異なるため混ぜない)
+        return {"chatId": chat_id, "embedder": self.embedder.name}
+
+    async def _embed(self, text: str) -> np.ndarray:
+        vector = self._memo.get(text)
+        if vector is None:
+            with span("memory_embed"):
+                vector = (await self.embedder.aembed([text]))[0]
+            self._memo[text] = vector
+            while len(self._memo) > EMBEDDING_MEMO_SIZE:
+                self._memo.popitem(last=False)
+        else:
+            self._memo.move_to_end(text)
+        return vector
+
+    @classmethod
+    def _cache_put(cls, chat_id: str, cached: _CachedIndex) -> None:
+        previous = cls._cache.pop(chat_id, None)
+        cls._cache_bytes += cached.nbytes - (previous.nbytes if previous is not None else 0)
+        cls._cache[chat_id] = cached
+        cls._evict()
+
+    @classmethod
+    def _cache_drop(cls, chat_id: str) -> None:
+        cached = cls._cache.pop(chat_id, None)
+        if cached is not None:
+            cls._cache_bytes -= cached.nbytes
+            memory_cache_bytes.set(cls._cache_bytes)
+
+    @classmethod
+    def _evict(cls) -> None:
+        # 古いものから上限に収まるまで削除する (上限より大きい1件はキャッシュせず、その検索でのみ使う)
+        while cls._cache and cls._cache_bytes > settings.MEMORY_CACHE_MAX_BYTES:
+            _, evicted = cls._cache.popitem(last=False)
+            cls._cache_bytes -= evicted.nbytes
+        memory_cache_bytes.set(cls._cache_bytes)
+
+    async def ensure_index(self) -> None:
+        """Create the unique index used by the upserts (once per process)"""
+        if RetrievalMemory._indexed:
+            return
+        RetrievalMemory._indexed = True
+        try:
+            await self.collection.create_index([("chatId", 1), ("embedder", 1)], unique=True)
+        except Exception as e:
+            # インデックスが無くても動作はするため、処理は続ける
+            logger.warning(f"Failed to create chat memory index: {str(e) or e.__class__.__name__}")
+
+    async def add(self, chat_id: str, message: ChatMessage) -> None:
+        """Embed a message and append it to the chat's memory (failures are logged, not raised)"""
+        try:
+            await self._add(chat_id, message)
+        except Exception as e:
+            memory_errors.inc(op="add")
+            logger.error(f"Error adding message to memory for chat_id {chat_id}: {str(e) or e.__class__.__name__}")
+
+    async def _add(self, chat_id: str, message: ChatMessage) -> None:
+        await self.ensure_index()
+        vector = await self._embed(message.content)
+        with span("mongo_update_one", collection=COLLECTION):
+            await self.collection.update_one(
+                self._key(chat_id),
+                {
+                    "$push": {
+                        "entries": {
+                            "$each": [{"role": message.role, "text": message.content, "vector": VectorIndex.encode(vector)}],
+                            "$slice": -settings.MEMORY_MAX_ENTRIES,
+                        }
+                    },
+                    "$inc": {"count": 1},
+                    "$setOnInsert": {"dim": int(vector.shape[0])},
+                },
+                upsert=True,
+            )
+        cached = self._cache.get(chat_id)
+        if cached is not None:
+            if len(cached.index) < settings.MEMORY_MAX_ENTRIES:
+                # 他のプロセスが同時に追加した場合は count が合わなくなり、次の検索で読み込み直す
+                before = cached.nbytes
+                cached.add(vector, ChatMessage(role=message.role, content=message.content))
+                RetrievalMemory._cache_bytes += cached.nbytes - before
+                self._evict()
+            else:
+                # 古いエントリが削除された後の並びは読み込み直して合わせる
+                self._cache_drop(chat_id)
+
+    async def _load(self, chat_id: str) -> Optional[VectorIndex]:
+        with span("mongo_find_one", collection=COLLECTION):
+            head = await self.collection.find_one(self._key(chat_id), projection={"count": 1})
+        if head is None:
+            return None
+        cached = self._cache.get(chat_id)
+        if cached is not None and cached.count == head.get("count"):
+            self._cache.move_to_end(chat_id)
+            return cached.index
+        with span("mongo_find_one", collection=COLLECTION):
+            document = await self.collection.find_one(self._key(chat_id))
+        if document is None:
+            return None
+        memory_index_loads.inc()
+        index = VectorIndex.from_entries(
+            document["dim"],
+            ((entry["vector"], ChatMessage(role=entry["role"], content=entry["text"])) for entry in document.get("entries", [])),
+        )
+        self._cache_put(chat_id, _CachedIndex(document.get("count", 0), index))
+        return index
+
+    async def search(
+        self, chat_id: str, query: str, k: int, min_score: float, exclude: List[ChatMessage]
+    ) -> List[Tuple[float, ChatMessage]]:
+        """Find the past messages of a chat most relevant to the query
+
+        Args:
+            chat_id: Chat to search
+            query: Query text (usually the current user message)
+            k: Maximum number of messages to return
+            min_score: Minimum cosine similarity
+            exclude: Messages already in the prompt (e.g. the recent window); they are not returned again
+
+        Returns:
+            List of (score, message), most relevant first (empty when the search fails)
+        """
+        started = time.perf_counter()
+        try:
+            with span("memory_retrieve", k=k):
+                index = await self._load(chat_id)
+                if index is None:
+                    return []
+                vector = await self._embed(query)
+                seen = {(message.role, message.content) for message in exclude}
+                results = []
+                # 除外するメッセージと同じ内容が上位に来る分を見越して多めに取り出す
+                for score, _, message in index.search(vector, k + len(seen), min_score):
+                    if (message.role, message.content) in seen:
+                        continue
+                    seen.add((message.role, message.content))
+                    results.append((score, message))
+                    if len(results) == k:
+                        break
+                return results
+        except Exception as e:
+            # 検索できなくても直近のメッセージだけで応答できるため、呼び出し元には伝えない
+            memory_errors.inc(op="search")
+            logger.error(f"Error searching memory for chat_id {chat_id}: {str(e) or e.__class__.__name__}")
+            return []
+        finally:
+            memory_search_duration.observe(time.perf_counter() - started)
+
+
+def get_retrieval_memory(mongodb: "AsyncIOMotorDatabase") -> Optional[RetrievalMemory]:
+    """RetrievalMemory for the database, or None when MEMORY_ENABLED is off"""
+    if not settings.MEMORY_ENABLED:
+        return None
+    return RetrievalMemory(mongodb, get_embedder())
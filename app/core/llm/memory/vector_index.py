@@ -0,0 +1,80 @@
+from typing import Any, Iterable, List, Tuple
+
+import numpy as np
+
+# 検索に使う要素型。float16 のままでは行列積に BLAS が使えず、変換のコピーが検索時間の大半を占める
+DTYPE = np.float32
+# 保存に使う要素型。float16 で保存サイズを半分にする (コサイン類似度の順位にはほぼ影響しない)
+STORAGE_DTYPE = np.dtype("<f2")
+INITIAL_CAPACITY = 16
+
+
+class VectorIndex:
+    """In-memory exact nearest-neighbour index over L2-normalized vectors
+
+    Rows are kept in one contiguous array that grows by doubling, so a search is a single
+    matrix-vector product followed by a partial sort. Conversations hold at most a few thousand
+    messages, which is well within the range where brute force beats an approximate index.
+    """
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self._vectors = np.zeros((INITIAL_CAPACITY, dim), dtype=DTYPE)
+        self._items: List[Any] = []
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @property
+    def items(self) -> List[Any]:
+        return self._items
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the vector array (including the unused capacity)"""
+        return self._vectors.nbytes
+
+    def add(self, vector: np.ndarray, item: Any) -> None:
+        """Append a vector and the item it identifies"""
+        size = len(self._items)
+        if size == self._vectors.shape[0]:
+            grown = np.zeros((size * 2, self.dim), dtype=DTYPE)
+            grown[:size] = self._vectors
+            self._vectors = grown
+        self._vectors[size] = vector
+        self._items.append(item)
+
+    def search(self, query: np.ndarray, k: int, min_score: float = -1.0) -> List[Tuple[float, int, Any]]:
+        """Find the k most similar vectors
+
+        Args:
+            query: L2-normalized query vector
+            k: Maximum number of results
+            min_score: Results with a lower cosine similarity are dropped
+
+        Returns:
+            List of (score, position, item), most similar first
+        """
+        size = len(self._items)
+        if size == 0 or k <= 0:
+            return []
+        scores = self._vectors[:size] @ np.asarray(query, dtype=DTYPE)
+        k = min(k, size)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind="stable")]
+        return [(float(scores[i]), int(i), self._items[i]) for i in top if scores[i] >= min_score]
+
+    @staticmethod
+    def encode(vector: np.ndarray) -> bytes:
+        """Serialize one vector for storage (little-endian float16)"""
+        return np.asarray(vector, dtype=STORAGE_DTYPE).tobytes()
+
+    @classmethod
+    def from_entries(cls, dim: int, entries: Iterable[Tuple[bytes, Any]]) -> "VectorIndex":
+        """Rebuild an index from stored (encoded vector, item) pairs; vectors of another size are skipped"""
+        index = cls(dim)
+        for data, item in entries:
+            vector = np.frombuffer(data, dtype=STORAGE_DTYPE)
+            if vector.shape[0] == dim:
+                index.add(vector, item)
+        return index
@@ -0,0 +1,251 @@
+import threading
+import time
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# レイテンシ計測用のデフォルトバケット (秒)
+DEFAULT_BUCKETS: Tuple[float, ...] = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# Prometheus テキスト形式 (exposition format 0.0.4)
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+LabelKey = Tuple[str, ...]
+
+
+def _escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Dict[str, str]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape_label_value(value)}"' for name, value in labels.items()) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+def _render_samples(name: str, type_name: str, samples: List[Dict[str, Any]]) -> List[str]:
+    if type_name != "histogram":
+        return [f"{name}{_format_labels(sample['labels'])} {_format_value(sample['value'])}" for sample in samples]
+    lines = []
+    for sample in samples:
+        labels = sample["labels"]
+        for bound, count in sample["buckets"].items():
+            lines.append(f"{name}_bucket{_format_labels({**labels, 'le': bound})} {count}")
+        lines.append(f"{name}_sum{_format_labels(labels)} {_format_value(sample['sum'])}")
+        lines.append(f"{name}_count{_format_labels(labels)} {sample['count']}")
+    return lines
+
+
+def render_snapshot(snapshot: Dict[str, Any]) -> str:
+    """MetricsRegistry.snapshot() の形式の値を Prometheus テキスト形式で返す"""
+    lines: List[str] = []
+    for name, metric in snapshot.items():
+        documentation = metric["help"].replace("\\", "\\\\").replace("\n", "\\n")
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} {metric['type']}")
+        lines.extend(_render_samples(name, metric["type"], metric["samples"]))
+    return "\n".join(lines) + "\n"
+
+
+def merge_snapshots(snapshots: Dict[str, Dict[str, Any]], label: str = "pid") -> Dict[str, Any]:
+    """
+    プロセスごとのスナップショットを1つにまとめる
+
+    同じメトリクスの系列をプロセスごとに分けるため、各サンプルに label (値はプロセスの識別子) を追加する
+
+    Args:
+        snapshots: プロセスの識別子 → MetricsRegistry.snapshot() の値
+        label: プロセスを表すラベルの名前
+    """
+    merged: Dict[str, Any] = {}
+    for process, snapshot in snapshots.items():
+        for name, metric in snapshot.items():
+            target = merged.setdefault(name, {"type": metric["type"], "help": metric["help"], "samples": []})
+            target["samples"].extend({**sample, "labels": {**sample["labels"], label: process}} for sample in metric["samples"])
+    return merged
+
+
+class _Metric(ABC):
+    """メトリクスの共通処理"""
+
+    type_name = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, Any]) -> LabelKey:
+        if len(labels) != len(self.labelnames):
+            raise ValueError(f"{self.name}: ラベルが一致しません (expected={self.labelnames}, got={tuple(labels)})")
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    def _labels(self, key: LabelKey) -> Dict[str, str]:
+        return dict(zip(self.labelnames, key))
+
+    @abstractmethod
+    def snapshot(self) -> List[Dict[str, Any]]:
+        """ラベルごとの現在値"""
+
+    def render(self) -> List[str]:
+        """Prometheus テキスト形式のサンプル行"""
+        return _render_samples(self.name, self.type_name, self.snapshot())
+
+
+class Counter(_Metric):
+    """単調増加するカウンター"""
+
+    type_name = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{"labels": self._labels(key), "value": value} for key, value in self._values.items()]
+
+
+class Gauge(_Metric):
+    """増減する現在値"""
+
+    type_name = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[LabelKey, float] = {}
+
+    def set(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def inc(self, amount: float = 1.0, **labels: Any) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0.0) + amount
+
+    def dec(self, amount: float = 1.0, **labels: Any) -> None:
+        self.inc(-amount, **labels)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            return [{"labels": self._labels(key), "value": value} for key, value in self._values.items()]
+
+
+class Histogram(_Metric):
+    """バケット付きヒストグラム"""
+
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # キーごとに [バケット別件数(+Inf含む), 合計, 件数] を保持
+        self._counts: Dict[LabelKey, List[int]] = {}
+        self._sums: Dict[LabelKey, float] = {}
+
+    def observe(self, value: float, **labels: Any) -> None:
+        key = self._key(labels)
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[index] += 1
+            self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels: Any) -> Iterator[None]:
+        """with ブロックの経過時間を記録"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def snapshot(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            items = [(key, list(counts), self._sums[key]) for key, counts in self._counts.items()]
+        result = []
+        for key, counts, total in items:
+            cumulative = 0
+            buckets = {}
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                buckets["+Inf" if bound == float("inf") else repr(bound)] = cumulative
+            result.append({"labels": self._labels(key), "count": cumulative, "sum": total, "buckets": buckets})
+        return result
+
+
+class MetricsRegistry:
+    """アプリケーション全体のメトリクスを保持するレジストリ"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+        self._lock = threading.Lock()
+
+    def _get_or_create(self, cls, name: str, documentation: str, labelnames: Sequence[str], **kwargs: Any):
+        with self._lock:
+            metric = self._metrics.get(name)
+            if metric is None:
+                metric = self._metrics[name] = cls(name, documentation, labelnames, **kwargs)
+            elif not isinstance(metric, cls) or metric.labelnames != tuple(labelnames):
+                raise ValueError(f"メトリクス {name} は異なる定義で登録済みです")
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._get_or_create(Counter, name, documentation, labelnames)
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._get_or_create(Gauge, name, documentation, labelnames)
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Optional[Sequence[float]] = None) -> Histogram:
+        return self._get_or_create(Histogram, name, documentation, labelnames, buckets=buckets or DEFAULT_BUCKETS)
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """取得時に現在値をゲージへ反映するコールバックを登録"""
+        with self._lock:
+            self._collectors.append(collector)
+
+    def collect(self) -> List[_Metric]:
+        with self._lock:
+            collectors = list(self._collectors)
+        for collector in collectors:
+            collector()
+        with self._lock:
+            return list(self._metrics.values())
+
+    def snapshot(self, prefix: str = "") -> Dict[str, Any]:
+        """登録済みメトリクスの現在値を辞書で返す"""
+        return {
+            metric.name: {"type": metric.type_name, "help": metric.documentation, "samples": metric.snapshot()}
+            for metric in self.collect()
+            if metric.name.startswith(prefix)
+        }
+
+    def render_prometheus(self) -> str:
+        """
+        登録済みメトリクスを Prometheus テキスト形式で返す
+
+        値はプロセスごとに保持しているため、複数ワーカーで動かす場合は merge_snapshots でまとめたものを使う
+        """
+        return render_snapshot(self.snapshot())
+
+
+registry = MetricsRegistry()
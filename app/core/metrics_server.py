@@ -0,0 +1,203 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Optional
+
+from app.core.config import settings
+from app.core.metrics import PROMETHEUS_CONTENT_TYPE, merge_snapshots, registry, render_snapshot
+
+logger = logging.getLogger(__name__)
+
+# リクエストの読み取りの上限 (秒)。スクレイプ・probe 以外の接続を滞留させない
+READ_TIMEOUT = 5.0
+MAX_HEADER_LINES = 100
+SNAPSHOT_SUFFIX = ".json"
+
+REASONS = {200: "OK", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error", 503: "Service Unavailable"}
+
+
+class MetricsServer:
+    """
+    メトリクスとヘルスチェックを内部ポート (METRICS_PORT) で公開する最小限の HTTP サーバー
+
+    API のポート (Service / ingress 経由で外部に公開される) とは分け、pod の IP から直接スクレイプさせる。
+    HTTP サーバーを持たないチャットワーカーも、同じサーバーで probe とスクレイプに応答する。
+
+    - GET {METRICS_PATH}: Prometheus テキスト形式のメトリクス
+    - GET /livez: イベントループが応答できれば 200
+    - GET /readyz: ready() が True なら 200、それ以外は 503
+    """
+
+    def __init__(self, render: Callable[[], str], ready: Callable[[], bool] = lambda: True, path: str = settings.METRICS_PATH):
+        self.render = render
+        self.ready = ready
+        self.path = path
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self, host: str, port: int) -> None:
+        """待ち受けを開始 (ポートを使えない場合もアプリケーション自体は起動させる)"""
+        if self._server is not None:
+            return
+        try:
+            self._server = await asyncio.start_server(self._handle, host, port)
+        except OSError as e:
+            logger.warning(f"Failed to listen for metrics on {host}:{port}: {str(e)}")
+            return
+        logger.info(f"Serving metrics on {host}:{port}{self.path}")
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        try:
+            request_line = await asyncio.wait_for(reader.readline(), timeout=READ_TIMEOUT)
+            for _ in range(MAX_HEADER_LINES):
+                line = await asyncio.wait_for(reader.readline(), timeout=READ_TIMEOUT)
+                if line in (b"\r\n", b"\n", b""):
+                    break
+            method, _, rest = request_line.decode("latin1").partition(" ")
+            path = rest.split(" ", 1)[0].split("?", 1)[0]
+            status, content_type, body = self._respond(method, path)
+            writer.write(
+                f"HTTP/1.1 {status} {REASONS[status]}\r\nContent-Type: {content_type}\r\n"
+                f"Content-Length: {len(body)}\r\nConnection: close\r\n\r\n".encode("latin1") + body
+            )
+            await writer.drain()
+        except (asyncio.TimeoutError, ConnectionError, UnicodeDecodeError):
+            pass
+        finally:
+            writer.close()
+
+    def _respond(self, method: str, path: str):
+        if method != "GET":
+            return 405, "text/plain", b""
+        if path == self.path:
+            try:
+                return 200, PROMETHEUS_CONTENT_TYPE, self.render().encode()
+            except Exception as e:
+                logger.error(f"Failed to render metrics: {str(e)}")
+                return 500, "text/plain", b""
+        if path == "/livez":
+            return 200, "text/plain", b"ok"
+        if path == "/readyz":
+            return (200, "text/plain", b"ok") if self.ready() else (503, "text/plain", b"not ready")
+        return 404, "text/plain", b""
+
+
+def _process_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def read_snapshots(directory: str) -> Dict[str, Dict[str, Any]]:
+    """
+    ワーカーが書き出したメトリクスをプロセスIDごとに読み込む
+
+    終了したプロセスのファイルは削除し、その系列を公開し続けないようにする
+    """
+    snapshots: Dict[str, Dict[str, Any]] = {}
+    for path in sorted(Path(directory).glob(f"*{SNAPSHOT_SUFFIX}")):
+        pid = path.stem
+        if not pid.isdigit() or not _process_alive(int(pid)):
+            path.unlink(missing_ok=True)
+            continue
+        try:
+            snapshots[pid] = json.loads(path.read_text())
+        except (OSError, ValueError) as e:
+            # 書き出しの途中などで読めない場合は次回のスクレイプで読む
+            logger.warning(f"Failed to read metrics snapshot {path.name}: {str(e)}")
+    return snapshots
+
+
+def serve_aggregated_metrics(directory: str, host: str, port: int) -> threading.Thread:
+    """
+    複数ワーカーで動かす場合に、スーパーバイザープロセス (python -m app.server) で全ワーカーのメトリクスを公開する
+
+    uvicorn の各ワーカーは同じポートで待ち受けられず、API のポートへのスクレイプはどのワーカーに届くか決まらないため、
+    ワーカーが METRICS_MULTIPROC_DIR に書き出した値を pid ラベルを付けてまとめて返す。
+    uvicorn.run がメインスレッドを占有するため、専用のイベントループを持つデーモンスレッドで待ち受ける。
+    """
+
+    def render() -> str:
+        # このスレッドのイベントループはスクレイプ専用のため、ファイルの読み込みで止めてよい
+        return render_snapshot(merge_snapshots(read_snapshots(directory)))
+
+    async def run() -> None:
+        server = MetricsServer(render)
+        await server.start(host, port)
+        await asyncio.Event().wait()
+
+    thread = threading.Thread(target=asyncio.run, args=(run(),), name="metrics-server", daemon=True)
+    thread.start()
+    return thread
+
+
+class MetricsExporter:
+    """
+    プロセスのメトリクスの公開方法を起動方法に応じて切り替える
+
+    - METRICS_MULTIPROC_DIR がある場合 (python -m app.server の複数ワーカー): METRICS_EXPORT_INTERVAL 秒ごとに
+      スナップショットを {pid}.json に書き出し、スーパーバイザーの serve_aggregated_metrics が公開する
+    - それ以外 (単一ワーカー・チャットワーカー・開発時の uvicorn): このプロセスで MetricsServer を起動する
+    """
+
+    def __init__(self):
+        self.server: Optional[MetricsServer] = None
+        self._task: Optional[asyncio.Task] = None
+        self._path: Optional[Path] = None
+
+    async def start(self, ready: Callable[[], bool]) -> None:
+        if not settings.METRICS_PORT:
+            return
+        if settings.METRICS_MULTIPROC_DIR:
+            if self._task is None:
+                self._path = Path(settings.METRICS_MULTIPROC_DIR) / f"{os.getpid()}{SNAPSHOT_SUFFIX}"
+                self._task = asyncio.create_task(self._run(), name="metrics-snapshot")
+            return
+        if self.server is None:
+            self.server = MetricsServer(registry.render_prometheus, ready)
+            await self.server.start(settings.METRICS_HOST, settings.METRICS_PORT)
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            # 終了したワーカーの系列はスーパーバイザー側で公開しない
+            await asyncio.to_thread(self._path.unlink, missing_ok=True)
+        if self.server is not None:
+            await self.server.stop()
+            self.server = None
+
+    async def _run(self) -> None:
+        while True:
+            started = time.perf_counter()
+            try:
+                await asyncio.to_thread(self._write, json.dumps(registry.snapshot()))
+            except Exception as e:
+                logger.warning(f"Failed to write metrics snapshot: {str(e)}")
+            await asyncio.sleep(max(0.0, settings.METRICS_EXPORT_INTERVAL - (time.perf_counter() - started)))
+
+    def _write(self, content: str) -> None:
+        # 読み込み中のスーパーバイザーに書きかけのファイルを見せないよう、別名で書いてから置き換える
+        temporary = self._path.with_suffix(".tmp")
+        temporary.write_text(content)
+        os.replace(temporary, self._path)
+
+
+metrics_exporter = MetricsExporter()
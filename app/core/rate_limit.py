@@ -0,0 +1,187 @@
+import asyncio
+import logging
+import math
+import secrets
+import time
+from collections import defaultdict, deque
+from dataclasses import dataclass
+from typing import Deque, Dict, Optional
+
+from redis.exceptions import RedisError
+
+from app.core.metrics import registry
+from app.core.redis_client import get_redis
+
+logger = logging.getLogger(__name__)
+
+rate_limit_rejected = registry.counter("rate_limit_rejected_total", "レート制限で拒否したリクエスト数", ["scope", "kind"])
+rate_limit_fallbacks = registry.counter("rate_limit_local_fallback_total", "Redis に接続できずプロセス内の制限で判定した回数", ["kind"])
+
+KEY_PREFIX = "ratelimit:"
+
+# スライディングウィンドウ (ログ方式): ウィンドウ外の記録を消してから件数を数え、上限未満なら記録する。
+# 複数のpodで時刻がずれないよう、時刻は Redis の TIME を使う。
+# KEYS[1]: キー / ARGV[1]: ウィンドウ (ミリ秒), ARGV[2]: 上限, ARGV[3]: 記録の識別子
+# 戻り値: {許可=1/拒否=0, ウィンドウ内の件数, ウィンドウ内で最も古い記録からリセットまでのミリ秒}
+SLIDING_WINDOW_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+local window = tonumber(ARGV[1])
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - window)
+local count = redis.call('ZCARD', KEYS[1])
+local allowed = 0
+if count < tonumber(ARGV[2]) then
+    redis.call('ZADD', KEYS[1], now, now .. '-' .. ARGV[3])
+    count = count + 1
+    allowed = 1
+end
+redis.call('PEXPIRE', KEYS[1], window)
+local oldest = redis.call('ZRANGE', KEYS[1], 0, 0, 'WITHSCORES')
+local reset = window
+if oldest[2] then
+    reset = math.floor(tonumber(oldest[2]) + window - now)
+end
+return {allowed, count, reset}
+"""
+
+# 同時実行数: 期限切れのリース (処理中に pod が落ちた分) を消してから件数を数え、上限未満ならリースを追加する
+# KEYS[1]: キー / ARGV[1]: 上限, ARGV[2]: リースの有効期限 (ミリ秒), ARGV[3]: リースの識別子
+# 戻り値: {取得=1/拒否=0, 取得後 (拒否時は現在) のリース数}
+CONCURRENCY_ACQUIRE_SCRIPT = """
+local t = redis.call('TIME')
+local now = tonumber(t[1]) * 1000 + math.floor(tonumber(t[2]) / 1000)
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now)
+local count = redis.call('ZCARD', KEYS[1])
+if count < tonumber(ARGV[1]) then
+    redis.call('ZADD', KEYS[1], now + tonumber(ARGV[2]), ARGV[3])
+    redis.call('PEXPIRE', KEYS[1], ARGV[2])
+    return {1, count + 1}
+end
+return {0, count}
+"""
+
+
+class RateLimitExceededError(Exception):
+    """リクエスト数または同時実行数の上限を超えた場合に送出される例外"""
+
+    def __init__(self, limit: int, retry_after: int, reset_after: Optional[int] = None):
+        super().__init__("rate limit exceeded")
+        self.limit = limit
+        self.retry_after = retry_after
+        self.reset_after = reset_after if reset_after is not None else retry_after
+
+
+@dataclass
+class RateLimitResult:
+    """スライディングウィンドウの判定結果 (レスポンスヘッダーに使う)"""
+
+    allowed: bool
+    limit: int
+    remaining: int
+    reset_after: int  # ウィンドウ内で最も古いリクエストが枠から外れるまでの秒数
+
+
+@dataclass
+class ConcurrencyLease:
+    """同時実行数の枠 (処理の終了時に release する)"""
+
+    key: str
+    token: str
+    local: bool
+
+
+class RateLimiter:
+    """
+    Redis を使ったレート制限
+
+    判定と記録を Lua スクリプトで1回のラウンドトリップにまとめ、複数のpod・ワーカー間でも原子的に数える。
+    Redis に接続できない場合はリクエストを止めないよう、プロセス内の記録で判定する
+    (その間の上限はプロセスごとになるため、全体では緩くなる)。
+    """
+
+    def __init__(self):
+        self._sliding_window = None
+        self._concurrency_acquire = None
+        self._local_windows: Dict[str, Deque[float]] = defaultdict(deque)
+        self._local_leases: Dict[str, int] = defaultdict(int)
+
+    def _scripts(self):
+        # register_script はクライアントに紐づくため、Redis クライアントの作り直し (fork後など) に追従する
+        redis = get_redis()
+        if self._sliding_window is None or self._sliding_window.registered_client is not redis:
+            self._sliding_window = redis.register_script(SLIDING_WINDOW_SCRIPT)
+            self._concurrency_acquire = redis.register_script(CONCURRENCY_ACQUIRE_SCRIPT)
+        return self._sliding_window, self._concurrency_acquire
+
+    async def hit(self, key: str, limit: int, window: int) -> RateLimitResult:
+        """
+        スライディングウィンドウで1リクエスト分を判定・記録する
+
+        Args:
+            key: 制限の単位 (例: "chat:user:1")
+            limit: window 秒あたりの上限
+            window: ウィンドウの長さ (秒)
+        """
+        try:
+            sliding_window, _ = self._scripts()
+            allowed, count, reset_ms = await sliding_window(
+                keys=[f"{KEY_PREFIX}{key}"], args=[window * 1000, limit, secrets.token_hex(4)]
+            )
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            logger.warning(f"Rate limit check fell back to local state: {str(e)}")
+            rate_limit_fallbacks.inc(kind="window")
+            return self._hit_local(key, limit, window)
+        return RateLimitResult(
+            allowed=bool(allowed), limit=limit, remaining=max(0, limit - int(count)), reset_after=math.ceil(int(reset_ms) / 1000)
+        )
+
+    def _hit_local(self, key: str, limit: int, window: int) -> RateLimitResult:
+        now = time.monotonic()
+        timestamps = self._local_windows[key]
+        while timestamps and timestamps[0] <= now - window:
+            timestamps.popleft()
+        allowed = len(timestamps) < limit
+        if allowed:
+            timestamps.append(now)
+        reset_after = math.ceil(timestamps[0] + window - now) if timestamps else window
+        if not timestamps:
+            del self._local_windows[key]
+        return RateLimitResult(allowed=allowed, limit=limit, remaining=max(0, limit - len(timestamps)), reset_after=reset_after)
+
+    async def acquire(self, key: str, limit: int, ttl: int) -> Optional[ConcurrencyLease]:
+        """
+        同時実行数の枠を取得する (上限に達している場合は None)
+
+        Args:
+            key: 制限の単位
+            limit: 同時に実行できる数
+            ttl: 枠の有効期限 (秒)。release されずにプロセスが落ちた場合もこの時間で解放される
+        """
+        token = secrets.token_hex(8)
+        try:
+            _, concurrency_acquire = self._scripts()
+            acquired, _ = await concurrency_acquire(keys=[f"{KEY_PREFIX}{key}"], args=[limit, ttl * 1000, token])
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            logger.warning(f"Concurrency limit check fell back to local state: {str(e)}")
+            rate_limit_fallbacks.inc(kind="concurrency")
+            if self._local_leases[key] >= limit:
+                return None
+            self._local_leases[key] += 1
+            return ConcurrencyLease(key=key, token=token, local=True)
+        return ConcurrencyLease(key=key, token=token, local=False) if acquired else None
+
+    async def release(self, lease: ConcurrencyLease) -> None:
+        """acquire で取得した枠を返却する"""
+        if lease.local:
+            self._local_leases[lease.key] -= 1
+            if self._local_leases[lease.key] <= 0:
+                del self._local_leases[lease.key]
+            return
+        try:
+            await get_redis().zrem(f"{KEY_PREFIX}{lease.key}", lease.token)
+        except (RedisError, OSError, asyncio.TimeoutError) as e:
+            # 返却できなかった枠は有効期限で解放される
+            logger.warning(f"Failed to release concurrency lease for {lease.key}: {str(e)}")
+
+
+rate_limiter = RateLimiter()
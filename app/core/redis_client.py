@@ -0,0 +1,74 @@
+import logging
+import os
+from typing import Optional
+
+from redis.asyncio import ConnectionPool, Redis
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+_pool: Optional[ConnectionPool] = None
+_client: Optional[Redis] = None
+
+
+def _create_client() -> Redis:
+    global _pool
+    _pool = ConnectionPool.from_url(
+        settings.REDIS_URL,
+        db=0,
+        max_connections=settings.REDIS_MAX_CONNECTIONS,
+        socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT,
+        health_check_interval=30,
+        decode_responses=True,
+    )
+    return Redis(connection_pool=_pool)
+
+
+async def start_redis() -> Redis:
+    """
+    アプリケーション起動時に共有コネクションプールを作成し、接続を確認する
+
+    Redis が起動していなくてもアプリケーション自体は起動させ、利用時に再接続する
+    """
+    client = get_redis()
+    try:
+        await client.ping()
+    except Exception as e:
+        logger.warning(f"Redis is not reachable at startup: {str(e)}")
+    return client
+
+
+async def close_redis() -> None:
+    """アプリケーション終了時にコネクションプールを閉じる"""
+    global _client, _pool
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+    if _pool is not None:
+        await _pool.disconnect()
+        _pool = None
+
+
+def get_redis() -> Redis:
+    """
+    共有Redisクライアントを取得 (依存関係としても使用可能)
+
+    複数キーをまとめて操作する場合は `get_redis().pipeline()` でラウンドトリップをまとめること
+    """
+    global _client
+    if _client is None:
+        _client = _create_client()
+    return _client
+
+
+def _reset_after_fork() -> None:
+    # 親プロセスのコネクションプールを子プロセスで使わないよう、次回利用時に作り直す
+    global _client, _pool
+    _client = None
+    _pool = None
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_after_fork)
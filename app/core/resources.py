@@ -0,0 +1,260 @@
+import asyncio
+import importlib
+import inspect
+import logging
+import os
+import sys
+import time
+from typing import TYPE_CHECKING, Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from sqlalchemy import text
+
+from app.core.admission import admission
+from app.core.config import settings
+from app.core.hashing import password_hasher
+from app.core.http_client import close_http_client, start_http_client
+from app.core.metrics import registry
+from app.core.metrics_server import metrics_exporter
+from app.core.redis_client import close_redis, get_redis, start_redis
+from app.core.tracing import span_exporter
+from app.db.session import async_engine, replica_set
+from app.services.last_login_buffer import last_login_buffer
+from app.services.refresh_token_buffer import refresh_token_buffer
+from app.services.usage_meter import usage_meter
+from app.services.user_import_service import import_hash_pool
+
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from app.core.llm.client.gemini_client import GeminiClient
+
+logger = logging.getLogger(__name__)
+
+# LLM関連のモジュールは import に時間がかかるため、ウォームアップ時 (または初回利用時) に読み込む
+LLM_MODULES = ("app.core.llm.client.gemini_client", "app.services.chat_service")
+# 終了時にバックグラウンドの長期記憶への追加 (埋め込みAPIの呼び出し) を待つ上限 (秒)
+MEMORY_DRAIN_TIMEOUT = 5.0
+
+probe_latency = registry.histogram("readiness_probe_duration_seconds", "依存先ごとのreadiness確認にかかった時間", ["dependency"])
+probe_failures = registry.counter("readiness_probe_failures_total", "readiness確認に失敗した回数", ["dependency"])
+
+
+def create_mongo_client() -> "AsyncIOMotorClient":
+    """MongoDBクライアントを作成 (プロセスで1つを共有する)"""
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    from app.db.mongo_metrics import MongoCommandMetrics
+
+    return AsyncIOMotorClient(
+        settings.MONGODB_URL,
+        event_listeners=[MongoCommandMetrics()],
+        maxPoolSize=settings.MONGODB_MAX_POOL_SIZE,
+        serverSelectionTimeoutMS=int(settings.MONGODB_SERVER_SELECTION_TIMEOUT * 1000),
+    )
+
+
+def create_llm_client() -> "GeminiClient":
+    """LLMクライアントを作成 (プロセスで1つを共有する)"""
+    from app.core.llm.client.gemini_client import GeminiClient
+
+    return GeminiClient()
+
+
+class AppResources:
+    """
+    アプリケーションが共有する外部リソースを保持するコンテナ
+
+    lifespan の開始時にコネクションプールを温め、終了時にバックグラウンド処理を止めてから接続を閉じる。
+    起動が完了し、かつ各依存先への確認が成功している間だけ readiness を ready とする。
+    テストや負荷試験では factory を差し替えてスタンドインを使う。
+    """
+
+    def __init__(
+        self,
+        mongo_client_factory: Callable[[], Any] = create_mongo_client,
+        llm_client_factory: Callable[[], Any] = create_llm_client,
+    ):
+        self.mongo_client_factory = mongo_client_factory
+        self.llm_client_factory = llm_client_factory
+        self.mongo_client: Optional[Any] = None
+        self.llm_client: Optional[Any] = None
+        self.started = False
+        self.draining = False
+        self.probes: Dict[str, Callable[[], Awaitable[None]]] = {
+            "postgres": self._probe_postgres,
+            "redis": self._probe_redis,
+            "mongodb": self._probe_mongodb,
+            "llm": self._probe_llm,
+        }
+
+    def get_mongo_client(self) -> Any:
+        """共有MongoDBクライアントを取得 (lifespan を経由しない実行では初回利用時に作成)"""
+        if self.mongo_client is None:
+            self.mongo_client = self.mongo_client_factory()
+        return self.mongo_client
+
+    def get_llm_client(self) -> Any:
+        """共有LLMクライアントを取得 (lifespan を経由しない実行では初回利用時に作成)"""
+        if self.llm_client is None:
+            self.llm_client = self.llm_client_factory()
+        return self.llm_client
+
+    async def startup(self) -> None:
+        """共有リソースを作成し、コネクションプールを温める"""
+        self.draining = False
+        # ウォームアップ中も probe (/livez) に応答できるよう、最初に待ち受ける
+        await metrics_exporter.start(ready=self.is_ready)
+        await start_http_client()
+        await start_redis()
+        await asyncio.gather(self._warm_db_pool(), self._warm_mongodb(), self._warm_llm(), replica_set.start())
+        await last_login_buffer.start()
+        await refresh_token_buffer.start()
+        await usage_meter.start(self.get_mongo_client()[settings.MONGODB_DB_NAME])
+        await span_exporter.start()
+        await admission.start()
+        self.started = True
+        logger.info("Application resources are ready")
+
+    async def shutdown(self) -> None:
+        """
+        readiness を落としてからバックグラウンド処理を止め、接続を閉じる
+
+        1つの処理が失敗しても (DB の障害で未反映分を書き込めないなど)、残りの書き込みと接続のクローズは続ける
+        """
+        self.draining = True
+        steps: List[Tuple[str, Callable[[], Any]]] = [
+            ("stop admission control", admission.stop),
+            # 未反映の最終ログイン日時・リフレッシュトークンとトークン使用量を書き込んでからプールを閉じる
+            ("flush last_login updates", last_login_buffer.stop),
+            ("flush refresh token digests", refresh_token_buffer.stop),
+            ("flush usage counters", usage_meter.stop),
+            # 応答後にバックグラウンドで行っている長期記憶への追加を、MongoDB の接続を閉じる前に待つ
+            ("drain memory writes", self._drain_memory_writes),
+            ("stop span exporter", span_exporter.stop),
+            ("shut down password hasher", lambda: password_hasher.shutdown(wait=False)),
+            ("shut down import hash pool", import_hash_pool.shutdown),
+            ("close HTTP client", close_http_client),
+            ("close Redis", close_redis),
+            ("close MongoDB client", self._close_mongo_client),
+            ("stop replica checks", replica_set.stop),
+            ("dispose database pool", async_engine.dispose),
+            ("stop metrics exporter", metrics_exporter.stop),
+        ]
+        for name, step in steps:
+            try:
+                result = step()
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logger.error(f"Failed to {name} on shutdown: {str(e) or e.__class__.__name__}")
+        self.started = False
+
+    async def _drain_memory_writes(self) -> None:
+        # チャットを使っていない場合は読み込み済みでないため、motor を読み込まないよう確認してから
+        if "app.repositories.chat_history_repository" in sys.modules:
+            from app.repositories.chat_history_repository import drain_background_writes
+
+            await drain_background_writes(timeout=MEMORY_DRAIN_TIMEOUT)
+
+    def _close_mongo_client(self) -> None:
+        if self.mongo_client is not None:
+            self.mongo_client.close()
+            self.mongo_client = None
+
+    def is_ready(self) -> bool:
+        """起動が完了し、終了処理に入っていないか (依存先の確認は含まない)"""
+        return self.started and not self.draining
+
+    async def _warm_db_pool(self) -> None:
+        # 同時に接続を取得することで、プールの常駐接続数まで事前に接続を張る
+        count = min(settings.STARTUP_WARM_DB_CONNECTIONS or settings.DB_POOL_SIZE, settings.DB_POOL_SIZE)
+        results = await asyncio.gather(
+            *(asyncio.wait_for(self._probe_postgres(), timeout=settings.STARTUP_WARMUP_TIMEOUT) for _ in range(count)),
+            return_exceptions=True,
+        )
+        errors = [result for result in results if isinstance(result, Exception)]
+        if errors:
+            logger.warning(f"Failed to warm {len(errors)}/{count} database connections: {str(errors[0]) or errors[0].__class__.__name__}")
+
+    async def _warm_mongodb(self) -> None:
+        try:
+            await asyncio.wait_for(self._probe_mongodb(), timeout=settings.STARTUP_WARMUP_TIMEOUT)
+        except Exception as e:
+            logger.warning(f"MongoDB is not reachable at startup: {str(e) or e.__class__.__name__}")
+
+    async def _warm_llm(self) -> None:
+        if not settings.STARTUP_WARM_LLM:
+            return
+        try:
+            # import はイベントループを止めるため、スレッドで読み込んで liveness への応答を妨げない
+            await asyncio.to_thread(lambda: [importlib.import_module(name) for name in LLM_MODULES])
+            await self._probe_llm()
+        except Exception as e:
+            logger.warning(f"Failed to initialize LLM client at startup: {str(e)}")
+
+    async def _probe_postgres(self) -> None:
+        async with async_engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+
+    async def _probe_redis(self) -> None:
+        await get_redis().ping()
+
+    async def _probe_mongodb(self) -> None:
+        await self.get_mongo_client().admin.command("ping")
+
+    async def _probe_llm(self) -> None:
+        if not settings.STARTUP_WARM_LLM and self.llm_client is None:
+            # 初回のチャットまで読み込みを遅らせる設定では、未初期化を異常とみなさない
+            return
+        # 課金・レート制限を避けるため、推論は呼ばずにクライアントの初期化のみ確認する
+        self.get_llm_client().get_chat_model()
+
+    async def _run_probe(self, name: str, probe: Callable[[], Awaitable[None]]) -> Dict[str, Any]:
+        started = time.perf_counter()
+        try:
+            await asyncio.wait_for(probe(), timeout=settings.READINESS_PROBE_TIMEOUT)
+            status, error = "ok", None
+        except Exception as e:
+            probe_failures.inc(dependency=name)
+            # 接続先の情報を外部に出さないよう、レスポンスには例外の種類のみ含める
+            logger.warning(f"Readiness probe for {name} failed: {str(e) or e.__class__.__name__}")
+            status, error = "error", e.__class__.__name__
+        elapsed = time.perf_counter() - started
+        probe_latency.observe(elapsed, dependency=name)
+        result: Dict[str, Any] = {"status": status, "latency_ms": round(elapsed * 1000, 2)}
+        if error:
+            result["error"] = error
+        return result
+
+    async def check_readiness(self) -> Dict[str, Any]:
+        """
+        依存先ごとの状態を並行して確認
+
+        Returns:
+            ready: トラフィックを受け付けてよいか
+            dependencies: 依存先ごとの状態とレイテンシ
+        """
+        names = list(self.probes)
+        results = await asyncio.gather(*(self._run_probe(name, self.probes[name]) for name in names))
+        dependencies = dict(zip(names, results))
+        optional = {name.strip() for name in settings.READINESS_OPTIONAL_CHECKS.split(",") if name.strip()}
+        healthy = all(result["status"] == "ok" for name, result in dependencies.items() if name not in optional)
+        return {
+            "ready": self.started and not self.draining and healthy,
+            "started": self.started,
+            "draining": self.draining,
+            "dependencies": dependencies,
+        }
+
+    def reset_after_fork(self) -> None:
+        """fork した子プロセスで親のクライアント (ソケット) を使わないよう破棄する"""
+        self.mongo_client = None
+        self.llm_client = None
+        self.started = False
+        self.draining = False
+
+
+resources = AppResources()
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=resources.reset_after_fork)
@@ -0,0 +1,26 @@
+from typing import Any
+
+import orjson
+from pydantic import BaseModel
+from starlette.responses import JSONResponse
+
+
+def _default(obj: Any) -> Any:
+    # orjson が直接扱えない型 (Pydantic モデルなど) を変換する
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    raise TypeError(f"Type is not JSON serializable: {type(obj).__name__}")
+
+
+class ORJSONResponse(JSONResponse):
+    """
+    orjson でシリアライズする JSON レスポンス (アプリケーションのデフォルト)
+
+    datetime / UUID / dataclass は orjson がそのまま扱い、Pydantic モデルを直接返した場合も
+    response_model 経由と同じ JSON (model_dump(mode="json")) になる。
+    """
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS | orjson.OPT_SERIALIZE_NUMPY)
@@ -4,9 +4,9 @@ from typing import Any, Optional, Union
 
 from jose import jwt
 from passlib.context import CryptContext
-from redis import Redis
 
 from app.core.config import settings
+from app.core.redis_client import get_redis
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -35,9 +35,7 @@ def get_password_hash(password: str) -> str:
     """パスワードハッシュを生成"""
     return pwd_context.hash(password)
 
-redis_client = Redis(host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=0, decode_responses=True)
-
-def generate_state_token(session_id: str) -> str:
+async def generate_state_token(session_id: str) -> str:
     """
     OAuth認証用のstateトークンを生成し、Redisに保存
     
@@ -51,11 +49,11 @@ def generate_state_token(session_id: str) -> str:
     
     # Redisにstateトークンを保存 (10分間有効)
     key = f"oauth_state:{session_id}"
-    redis_client.setex(key, 600, state)
+    await get_redis().setex(key, 600, state)
     
     return state
 
-def verify_state_token(session_id: str, state: str) -> bool:
+async def verify_state_token(session_id: str, state: str) -> bool:
     """
     stateトークンを検証し、使用後に削除
     
@@ -67,12 +65,9 @@ def verify_state_token(session_id: str, state: str) -> bool:
         検証結果 (有効な場合True)
     """
     key = f"oauth_state:{session_id}"
-    stored_state = redis_client.get(key)
+    # 取得と削除を1回のラウンドトリップで行う (使用済みトークンの再利用防止)
+    async with get_redis().pipeline(transaction=True) as pipe:
+        stored_state, _ = await pipe.get(key).delete(key).execute()
     
     # トークンが存在し、値が一致する場合に検証成功
-    if stored_state and stored_state == state:
-        # 使用済みトークンを削除（再利用防止）
-        redis_client.delete(key)
-        return True
-    
-    return False
\ No newline at end of file
+    return bool(stored_state and secrets.compare_digest(stored_state, state))
\ No newline at end of file
@@ -0,0 +1,249 @@
+import asyncio
+import json
+import logging
+import random
+import re
+import secrets
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterator, List, Optional
+
+from app.core.config import settings
+from app.core.http_client import get_http_client
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+span_duration = registry.histogram(
+    "span_duration_seconds",
+    "処理段階 (span) ごとの所要時間",
+    ["name"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0),
+)
+spans_dropped = registry.counter("trace_spans_dropped_total", "エクスポート待ちの上限を超えて破棄したトレース数")
+export_errors = registry.counter("trace_export_errors_total", "トレースのエクスポートに失敗した回数")
+
+# W3C Trace Context: version-traceid-parentid-flags
+TRACEPARENT_RE = re.compile(r"^00-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+
+# OTLP の SpanKind / StatusCode
+SPAN_KIND_INTERNAL = 1
+SPAN_KIND_SERVER = 2
+STATUS_CODE_OK = 1
+STATUS_CODE_ERROR = 2
+
+
+@dataclass
+class Span:
+    """処理段階1つ分の計測結果"""
+
+    name: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    end_ns: int = 0
+    kind: int = SPAN_KIND_INTERNAL
+    error: bool = False
+    attributes: Dict[str, Any] = field(default_factory=dict)
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1_000_000
+
+    def to_otlp(self, trace_id: str) -> Dict[str, Any]:
+        data: Dict[str, Any] = {
+            "traceId": trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": self.kind,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(key, value) for key, value in self.attributes.items()],
+            "status": {"code": STATUS_CODE_ERROR if self.error else STATUS_CODE_OK},
+        }
+        if self.parent_id:
+            data["parentSpanId"] = self.parent_id
+        return data
+
+
+@dataclass
+class Trace:
+    """1リクエスト分の span をまとめたもの"""
+
+    trace_id: str
+    sampled: bool
+    root: Span
+    spans: List[Span] = field(default_factory=list)
+
+
+_current_trace: ContextVar[Optional[Trace]] = ContextVar("current_trace", default=None)
+_current_span: ContextVar[Optional[str]] = ContextVar("current_span", default=None)
+
+
+def _otlp_attribute(key: str, value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+def start_trace(traceparent: Optional[str] = None) -> Trace:
+    """
+    リクエストのトレースを開始 (現在のコンテキストに設定する)
+
+    traceparent ヘッダーがあれば呼び出し元のトレースに参加し、サンプリングの判定も引き継ぐ
+    """
+    match = TRACEPARENT_RE.match(traceparent or "")
+    if match:
+        trace_id, parent_id, flags = match.groups()
+        sampled = bool(int(flags, 16) & 1)
+    else:
+        trace_id, parent_id = secrets.token_hex(16), None
+        sampled = random.random() < settings.TRACE_SAMPLE_RATE
+    root = Span(name="request", span_id=secrets.token_hex(8), parent_id=parent_id, start_ns=time.time_ns(), kind=SPAN_KIND_SERVER)
+    trace = Trace(trace_id=trace_id, sampled=sampled, root=root)
+    _current_trace.set(trace)
+    _current_span.set(root.span_id)
+    return trace
+
+
+def finish_trace(trace: Trace, name: str, error: bool = False, **attributes: Any) -> None:
+    """リクエストの span を閉じる (名前はルーティング後に決まるため終了時に設定する)"""
+    trace.root.name = name
+    trace.root.error = error
+    trace.root.attributes.update(attributes)
+    trace.root.end_ns = time.time_ns()
+    trace.spans.append(trace.root)
+
+
+def current_trace() -> Optional[Trace]:
+    return _current_trace.get()
+
+
+@contextmanager
+def span(name: str, kind: int = SPAN_KIND_INTERNAL, **attributes: Any) -> Iterator[Span]:
+    """
+    with ブロックの処理時間を span として記録
+
+    リクエストのトレースが開始されていない場合 (スクリプトなど) もメトリクスには記録する
+    """
+    trace = _current_trace.get()
+    current = Span(
+        name=name,
+        span_id=secrets.token_hex(8),
+        parent_id=_current_span.get(),
+        start_ns=time.time_ns(),
+        kind=kind,
+        attributes=attributes,
+    )
+    token = _current_span.set(current.span_id)
+    try:
+        yield current
+    except BaseException:
+        current.error = True
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        span_duration.observe((current.end_ns - current.start_ns) / 1_000_000_000, name=current.name)
+        if trace is not None:
+            trace.spans.append(current)
+
+
+def server_timing_header(trace: Trace) -> str:
+    """Server-Timing ヘッダーの値 (span の終了順 + ここまでの合計)"""
+    metrics = [f"{item.name};dur={item.duration_ms:.1f}" for item in trace.spans]
+    metrics.append(f"total;dur={(time.time_ns() - trace.root.start_ns) / 1_000_000:.1f}")
+    return ", ".join(metrics)
+
+
+class SpanExporter:
+    """
+    サンプリングされたトレースを OTLP (JSON) 形式でまとめて書き出すエクスポーター
+
+    - file: 1行に1つの ExportTraceServiceRequest を追記する (OpenTelemetry Collector の otlpjsonfile で読み込める)
+    - otlp: OTLP/HTTP (JSON) でコレクターへ送信する
+    """
+
+    def __init__(self, kind: str, flush_interval: float, max_pending: int):
+        self.kind = kind
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending: List[Trace] = []
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self.kind in ("file", "otlp")
+
+    def submit(self, trace: Trace) -> None:
+        """エクスポート待ちに追加 (上限を超えた場合は破棄してリクエストを遅らせない)"""
+        if not self.enabled or not trace.sampled or not trace.spans:
+            return
+        if len(self._pending) >= self.max_pending:
+            spans_dropped.inc()
+            return
+        self._pending.append(trace)
+
+    async def start(self) -> None:
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run(), name="trace-export")
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            await self.flush()
+
+    async def flush(self) -> None:
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        payload = {
+            "resourceSpans": [
+                {
+                    "resource": {"attributes": [_otlp_attribute("service.name", settings.TRACE_SERVICE_NAME)]},
+                    "scopeSpans": [
+                        {
+                            "scope": {"name": "app"},
+                            "spans": [item.to_otlp(trace.trace_id) for trace in batch for item in trace.spans],
+                        }
+                    ],
+                }
+            ]
+        }
+        try:
+            if self.kind == "file":
+                await asyncio.to_thread(self._append_to_file, json.dumps(payload, separators=(",", ":")))
+            else:
+                response = await get_http_client().post(settings.TRACE_OTLP_ENDPOINT, json=payload)
+                response.raise_for_status()
+        except Exception as e:
+            export_errors.inc()
+            logger.warning(f"Failed to export {len(batch)} traces: {str(e)}")
+
+    @staticmethod
+    def _append_to_file(line: str) -> None:
+        with open(settings.TRACE_FILE_PATH, "a", encoding="utf-8") as f:
+            f.write(line + "\n")
+
+
+span_exporter = SpanExporter(
+    settings.TRACE_EXPORTER,
+    flush_interval=settings.TRACE_EXPORT_INTERVAL,
+    max_pending=settings.TRACE_EXPORT_MAX_PENDING,
+)
@@ -0,0 +1,33 @@
+from pymongo import monitoring
+
+from app.core.metrics import registry
+
+mongo_command_duration = registry.histogram(
+    "mongo_command_duration_seconds",
+    "MongoDBへのコマンド (ラウンドトリップ) にかかった時間",
+    ["command", "outcome"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0),
+)
+mongo_commands = registry.counter("mongo_commands_total", "MongoDBへ送信したコマンド数", ["command", "outcome"])
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """
+    MongoDBクライアントが送信するコマンドごとの件数と所要時間を記録するリスナー
+
+    クライアント作成時に event_listeners として登録する (リポジトリ側での計測は不要)
+    """
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._record(event.command_name, "success", event.duration_micros)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._record(event.command_name, "error", event.duration_micros)
+
+    @staticmethod
+    def _record(command: str, outcome: str, duration_micros: int) -> None:
+        mongo_commands.inc(command=command, outcome=outcome)
+        mongo_command_duration.observe(duration_micros / 1_000_000, command=command, outcome=outcome)
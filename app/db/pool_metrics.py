@@ -0,0 +1,87 @@
+import time
+from typing import Any, Dict
+
+from sqlalchemy import Engine, event
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+from app.core.metrics import registry
+
+pool_checkout_duration = registry.histogram(
+    "db_pool_checkout_duration_seconds",
+    "コネクションプールからの取得にかかった時間 (待ち時間・pre-ping・新規接続を含む)",
+    ["pool"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0, 30.0),
+)
+pool_checkout_timeouts = registry.counter("db_pool_checkout_timeouts_total", "pool_timeout 超過でコネクションを取得できなかった件数", ["pool"])
+pool_connects = registry.counter("db_pool_connects_total", "新規に確立したDB接続の件数", ["pool"])
+pool_invalidations = registry.counter("db_pool_invalidations_total", "無効化されたDB接続の件数", ["pool", "kind"])
+pool_size = registry.gauge("db_pool_size", "プールの基本サイズ (pool_size)", ["pool"])
+pool_checked_out = registry.gauge("db_pool_checked_out", "使用中のコネクション数", ["pool"])
+pool_checked_in = registry.gauge("db_pool_checked_in", "プール内で待機しているコネクション数", ["pool"])
+pool_overflow = registry.gauge("db_pool_overflow", "pool_size を超えて確立しているコネクション数", ["pool"])
+
+# 計装対象のエンジン (ラベル名 -> エンジン)
+_engines: Dict[str, Engine] = {}
+
+
+class _CheckoutTimingMixin:
+    """コネクション取得時間を計測するプールの共通処理"""
+
+    def connect(self) -> Any:
+        name = self._orig_logging_name or "default"
+        started = time.perf_counter()
+        try:
+            return super().connect()
+        except PoolTimeoutError:
+            pool_checkout_timeouts.inc(pool=name)
+            raise
+        finally:
+            pool_checkout_duration.observe(time.perf_counter() - started, pool=name)
+
+
+class InstrumentedQueuePool(_CheckoutTimingMixin, QueuePool):
+    """計装付き QueuePool (同期エンジン用)"""
+
+
+class InstrumentedAsyncAdaptedQueuePool(_CheckoutTimingMixin, AsyncAdaptedQueuePool):
+    """計装付き AsyncAdaptedQueuePool (非同期エンジン用)"""
+
+
+def instrument_engine(engine: Engine, name: str) -> None:
+    """
+    プールイベントを購読してメトリクスに反映する
+
+    Args:
+        engine: 計装対象のエンジン (非同期エンジンの場合は sync_engine を渡す)
+        name: メトリクスのラベルに使うプール名
+    """
+    _engines[name] = engine
+    # dispose() でプールが作り直されてもイベントリスナーは引き継がれる
+    pool = engine.pool
+
+    @event.listens_for(pool, "connect")
+    def _on_connect(dbapi_connection, connection_record):
+        pool_connects.inc(pool=name)
+
+    @event.listens_for(pool, "invalidate")
+    def _on_invalidate(dbapi_connection, connection_record, exception):
+        pool_invalidations.inc(pool=name, kind="hard")
+
+    @event.listens_for(pool, "soft_invalidate")
+    def _on_soft_invalidate(dbapi_connection, connection_record, exception):
+        pool_invalidations.inc(pool=name, kind="soft")
+
+
+def _collect_pool_gauges() -> None:
+    """現在のプール状態をゲージに反映する (メトリクス取得時に呼ばれる)"""
+    for name, engine in _engines.items():
+        pool = engine.pool
+        if isinstance(pool, QueuePool):
+            pool_size.set(pool.size(), pool=name)
+            pool_checked_out.set(pool.checkedout(), pool=name)
+            pool_checked_in.set(pool.checkedin(), pool=name)
+            pool_overflow.set(max(pool.overflow(), 0), pool=name)
+
+
+registry.add_collector(_collect_pool_gauges)
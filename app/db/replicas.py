@@ -0,0 +1,133 @@
+import asyncio
+import itertools
+import logging
+from typing import List, Optional
+
+from sqlalchemy import event, text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+from app.core.metrics import registry
+
+logger = logging.getLogger(__name__)
+
+replica_healthy = registry.gauge("db_replica_healthy", "レプリカに読み取りを振り分けているか (1: 振り分ける / 0: 除外中)", ["replica"])
+replica_lag = registry.gauge("db_replica_lag_seconds", "レプリカの反映遅延", ["replica"])
+replica_check_failures = registry.counter("db_replica_check_failures_total", "レプリカの死活・遅延の確認に失敗した回数", ["replica"])
+
+# レプリカの反映遅延 (秒)。受信済みの WAL をすべて適用済みであれば 0 とする
+# (更新の無い時間帯に最終適用時刻だけで判定すると、追いついていても遅延して見えるため)
+POSTGRES_LAG_QUERY = text(
+    """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN 0
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+    """
+)
+
+
+class Replica:
+    """読み取り専用レプリカの接続先と直近の確認結果"""
+
+    def __init__(self, name: str, engine: AsyncEngine):
+        self.name = name
+        self.engine = engine
+        # 最初の確認が成功するまでは振り分けない
+        self.healthy = False
+        self.lag: Optional[float] = None
+
+
+class ReplicaSet:
+    """
+    読み取り専用レプリカの集合
+
+    一定間隔で各レプリカの死活と反映遅延を確認し、応答があり遅延が max_lag 秒以内のものだけを
+    ラウンドロビンで選ぶ。選べるレプリカが無い場合、呼び出し側はプライマリで読み取る。
+    確認の合間でも、クエリの実行中に接続の切断を検知したレプリカはすぐに除外する。
+    """
+
+    def __init__(self, replicas: List[Replica], max_lag: float, check_interval: float, check_timeout: float):
+        self.replicas = replicas
+        self.max_lag = max_lag
+        self.check_interval = check_interval
+        self.check_timeout = check_timeout
+        self._next = itertools.count()
+        self._task: Optional[asyncio.Task] = None
+        for replica in replicas:
+            self._watch_disconnects(replica)
+
+    def _watch_disconnects(self, replica: Replica) -> None:
+        @event.listens_for(replica.engine.sync_engine, "handle_error")
+        def _on_error(context) -> None:
+            if context.is_disconnect:
+                self.mark_down(replica, "disconnected")
+
+    def choose(self) -> Optional[Replica]:
+        """読み取りに使うレプリカを選ぶ (正常なものが無い場合は None)"""
+        healthy = [replica for replica in self.replicas if replica.healthy]
+        if not healthy:
+            return None
+        return healthy[next(self._next) % len(healthy)]
+
+    def mark_down(self, replica: Replica, reason: str) -> None:
+        """次の確認で復旧するまで振り分けから外す"""
+        if replica.healthy:
+            logger.warning(f"Database replica {replica.name} is out of rotation: {reason}")
+        replica.healthy = False
+        replica_healthy.set(0, replica=replica.name)
+
+    async def _measure_lag(self, replica: Replica) -> float:
+        async with replica.engine.connect() as conn:
+            if conn.dialect.name != "postgresql":
+                # 負荷試験の SQLite など、レプリケーションの無い接続先は遅延 0 とみなす
+                await conn.execute(text("SELECT 1"))
+                return 0.0
+            return float((await conn.execute(POSTGRES_LAG_QUERY)).scalar() or 0.0)
+
+    async def check(self, replica: Replica) -> None:
+        """レプリカの死活と反映遅延を確認して振り分けの対象を更新"""
+        try:
+            lag = await asyncio.wait_for(self._measure_lag(replica), timeout=self.check_timeout)
+        except Exception as e:
+            replica_check_failures.inc(replica=replica.name)
+            replica.lag = None
+            self.mark_down(replica, f"health check failed ({str(e) or e.__class__.__name__})")
+            return
+        replica.lag = lag
+        replica_lag.set(lag, replica=replica.name)
+        if lag > self.max_lag:
+            self.mark_down(replica, f"replication lag {lag:.1f}s exceeds {self.max_lag:.1f}s")
+            return
+        if not replica.healthy:
+            logger.info(f"Database replica {replica.name} is in rotation (lag {lag:.1f}s)")
+        replica.healthy = True
+        replica_healthy.set(1, replica=replica.name)
+
+    async def check_all(self) -> None:
+        await asyncio.gather(*(self.check(replica) for replica in self.replicas))
+
+    async def start(self) -> None:
+        """最初の確認を行い、以降の定期確認を開始する"""
+        if not self.replicas or self._task is not None:
+            return
+        await self.check_all()
+        self._task = asyncio.create_task(self._run(), name="db-replica-monitor")
+
+    async def stop(self) -> None:
+        """定期確認を止めて接続を閉じる"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        for replica in self.replicas:
+            replica.healthy = False
+            await replica.engine.dispose()
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.check_all()
@@ -1,10 +1,111 @@
-from sqlalchemy import create_engine
+import os
+from typing import Any, Optional
+
+from sqlalchemy import Select, create_engine
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
 
 from app.core.config import settings
+from app.core.metrics import registry
+from app.db.pool_metrics import InstrumentedAsyncAdaptedQueuePool, InstrumentedQueuePool, instrument_engine
+from app.db.replicas import Replica, ReplicaSet
+
+# プール設定は同期・非同期エンジンで共通
+pool_options = {
+    "pool_size": settings.DB_POOL_SIZE,
+    "max_overflow": settings.DB_MAX_OVERFLOW,
+    "pool_timeout": settings.DB_POOL_TIMEOUT,
+    "pool_recycle": settings.DB_POOL_RECYCLE,
+    "pool_pre_ping": settings.DB_POOL_PRE_PING,
+}
 
-engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, pool_pre_ping=True)
+# 同期エンジン (Alembicやスクリプト用)
+engine = create_engine(settings.SQLALCHEMY_DATABASE_URI, poolclass=InstrumentedQueuePool, pool_logging_name="sync", **pool_options)
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
-Base = declarative_base()
\ No newline at end of file
+# 非同期エンジン (APIリクエスト用)
+async_engine = create_async_engine(
+    settings.SQLALCHEMY_ASYNC_DATABASE_URI, poolclass=InstrumentedAsyncAdaptedQueuePool, pool_logging_name="primary", **pool_options
+)
+
+instrument_engine(engine, "sync")
+instrument_engine(async_engine.sync_engine, "primary")
+
+# 読み取り専用レプリカ (DB_REPLICA_URLS 未指定の場合は空で、すべてプライマリを使う)
+replica_set = ReplicaSet(
+    [
+        Replica(
+            f"replica{i}",
+            create_async_engine(uri, poolclass=InstrumentedAsyncAdaptedQueuePool, pool_logging_name=f"replica{i}", **pool_options),
+        )
+        for i, uri in enumerate(settings.SQLALCHEMY_ASYNC_REPLICA_URIS)
+    ],
+    max_lag=settings.DB_REPLICA_MAX_LAG,
+    check_interval=settings.DB_REPLICA_CHECK_INTERVAL,
+    check_timeout=settings.DB_REPLICA_CHECK_TIMEOUT,
+)
+for _replica in replica_set.replicas:
+    instrument_engine(_replica.engine.sync_engine, _replica.name)
+
+session_routes = registry.counter(
+    "db_session_routes_total",
+    "セッションの SQL の振り分け先 (fallback: 読み取りだが正常なレプリカが無くプライマリを使った)",
+    ["target"],
+)
+
+# session.info のキー。True の間、そのセッションの読み取りもプライマリに送る
+PRIMARY_ONLY = "primary_only"
+
+
+class RoutingSession(Session):
+    """
+    読み取りをレプリカ、書き込みをプライマリに振り分けるセッション
+
+    SELECT (FOR UPDATE を除く) は正常なレプリカに送り、それ以外 (flush・UPDATE・テキスト SQL など) はプライマリに送る。
+    書き込みを行ったセッション (= リクエスト) では、以降の読み取りもプライマリに送り、書いた内容をすぐに読めるようにする。
+    """
+
+    def get_bind(self, mapper: Optional[Any] = None, clause: Optional[Any] = None, **kwargs: Any) -> Any:
+        if not replica_set.replicas:
+            return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+        if not self.info.get(PRIMARY_ONLY):
+            if isinstance(clause, Select) and clause._for_update_arg is None:
+                replica = replica_set.choose()
+                if replica is not None:
+                    session_routes.inc(target="replica")
+                    return replica.engine.sync_engine
+                session_routes.inc(target="fallback")
+                return async_engine.sync_engine
+            self.info[PRIMARY_ONLY] = True
+        session_routes.inc(target="primary")
+        return async_engine.sync_engine
+
+
+AsyncSessionLocal = async_sessionmaker(
+    bind=async_engine, sync_session_class=RoutingSession, autoflush=False, expire_on_commit=False
+)
+
+
+def use_primary(db: AsyncSession) -> None:
+    """以降のセッションの読み取りをプライマリに送る (直前の書き込みをレプリカの反映を待たずに読む場合など)"""
+    db.info[PRIMARY_ONLY] = True
+
+
+def reads_from_replica(db: AsyncSession) -> bool:
+    """セッションの読み取りがレプリカに振り分けられる状態か"""
+    return bool(replica_set.replicas) and not db.info.get(PRIMARY_ONLY)
+
+
+def _reset_pools_after_fork() -> None:
+    # fork した子プロセスでは親の接続を閉じずに手放し、新しい接続を張らせる
+    engine.dispose(close=False)
+    async_engine.sync_engine.dispose(close=False)
+    for replica in replica_set.replicas:
+        replica.engine.sync_engine.dispose(close=False)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_pools_after_fork)
+
+Base = declarative_base()
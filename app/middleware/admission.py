@@ -0,0 +1,58 @@
+from typing import Tuple
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from app.core.admission import EXEMPT, LOW, NORMAL, AdmissionController, AdmissionRejectedError
+from app.core.responses import ORJSONResponse
+
+
+def _paths(value: str) -> Tuple[str, ...]:
+    return tuple(path.strip() for path in value.split(",") if path.strip())
+
+
+class AdmissionMiddleware:
+    """
+    過負荷時に、ハンドラを実行する前にリクエストを 503 で拒否するミドルウェア
+
+    パスでルートを分類し (ルーティング前のため scope["route"] は使えない)、
+    AdmissionController の判定に従う。WebSocket は接続数の上限 (WS_MAX_CONNECTIONS) で別に制御するため対象外とする。
+    """
+
+    def __init__(self, app: ASGIApp, controller: AdmissionController, exempt_paths: str, low_priority_paths: str):
+        self.app = app
+        self.controller = controller
+        self.exempt_paths = _paths(exempt_paths)
+        self.low_priority_paths = frozenset(_paths(low_priority_paths))
+
+    def classify(self, scope: Scope) -> str:
+        path = scope["path"]
+        if path.startswith(self.exempt_paths):
+            return EXEMPT
+        # 低優先度は LLM を呼ぶ POST のみ。完全一致で判定し、同じパス配下の軽い処理 (/chat/jobs への追加・状態の取得) は通常の扱いにする
+        if scope["method"] == "POST" and path in self.low_priority_paths:
+            return LOW
+        return NORMAL
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        route_class = self.classify(scope)
+        if route_class == EXEMPT:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.controller.acquire(route_class)
+        except AdmissionRejectedError as e:
+            response = ORJSONResponse(
+                status_code=503,
+                content={"detail": "サーバーが混み合っています。しばらくしてから再試行してください。"},
+                headers={"Retry-After": str(e.retry_after)},
+            )
+            await response(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release(route_class)
@@ -0,0 +1,130 @@
+import zlib
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli が無い環境では gzip のみで応答する
+    brotli = None
+
+# 既に圧縮済み、または逐次配信が必要なため圧縮しない Content-Type
+EXCLUDED_CONTENT_TYPES = ("text/event-stream", "image/", "video/", "audio/", "application/zip", "application/gzip")
+
+
+def select_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    Accept-Encoding から使用するエンコーディングを選ぶ
+
+    q 値が高いものを優先し、同じ場合は br → gzip の順 (サーバー側の優先度) とする
+    """
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if name:
+            weights[name] = q
+
+    candidates = ["br", "gzip"] if brotli is not None else ["gzip"]
+    best, best_q = None, 0.0
+    for name in candidates:
+        q = weights.get(name, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = name, q
+    return best
+
+
+class _Encoder:
+    """gzip / brotli の逐次圧縮"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            self._gzip = zlib.compressobj(gzip_level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes, final: bool) -> bytes:
+        # 途中のチャンクはフラッシュしてクライアントへ逐次届くようにする
+        if self.encoding == "br":
+            return self._brotli.process(data) + (self._brotli.finish() if final else self._brotli.flush())
+        return self._gzip.compress(data) + self._gzip.flush(zlib.Z_FINISH if final else zlib.Z_SYNC_FLUSH)
+
+
+class CompressionMiddleware:
+    """
+    Accept-Encoding に応じて gzip / brotli でレスポンスを圧縮するミドルウェア
+
+    minimum_size 未満の小さなレスポンスは圧縮のCPUコストに見合わないためそのまま返す。
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = select_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        responder = _CompressionResponder(self, send, encoding)
+        await self.app(scope, receive, responder.send)
+
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, send: Send, encoding: Optional[str]):
+        self.middleware = middleware
+        self._send = send
+        self.encoding = encoding
+        self.start_message: Optional[Message] = None
+        self.encoder: Optional[_Encoder] = None
+        self.started = False
+
+    async def send(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            # 最初の本文を見て圧縮するかを決めるため、ヘッダーの送信を遅らせる
+            self.start_message = message
+            return
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+        if self.started:
+            if self.encoder is not None:
+                message = {**message, "body": self.encoder.compress(body, final=not more_body)}
+            await self._send(message)
+            return
+
+        self.started = True
+        headers = MutableHeaders(raw=self.start_message["headers"])
+        content_type = headers.get("content-type", "")
+        compressible = not content_type.startswith(EXCLUDED_CONTENT_TYPES) and "content-encoding" not in headers
+        if compressible:
+            headers.add_vary_header("Accept-Encoding")
+        if not compressible or self.encoding is None or (not more_body and len(body) < self.middleware.minimum_size):
+            await self._send(self.start_message)
+            await self._send(message)
+            return
+
+        self.encoder = _Encoder(self.encoding, self.middleware.gzip_level, self.middleware.brotli_quality)
+        data = self.encoder.compress(body, final=not more_body)
+        headers["Content-Encoding"] = self.encoding
+        if more_body:
+            # 最終的なサイズが分からないためチャンク転送にする
+            if "content-length" in headers:
+                del headers["Content-Length"]
+        else:
+            headers["Content-Length"] = str(len(data))
+        await self._send(self.start_message)
+        await self._send({**message, "body": data})
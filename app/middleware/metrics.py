@@ -0,0 +1,52 @@
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.metrics import registry
+
+# ルートが一致しなかったリクエスト (404など) はパスごとに分けずにまとめる
+UNMATCHED_ROUTE = "<unmatched>"
+
+http_requests = registry.counter("http_requests_total", "HTTPリクエスト数", ["method", "route", "status"])
+http_request_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTPリクエストの処理時間", ["method", "route", "status"]
+)
+http_requests_in_flight = registry.gauge("http_requests_in_flight", "処理中のHTTPリクエスト数")
+
+
+class MetricsMiddleware:
+    """
+    ルートのテンプレート (例: /api/v1/users/{id}) とステータスごとにリクエスト数・処理時間を記録するミドルウェア
+
+    BaseHTTPMiddleware はリクエストごとにタスクとストリームを作るため使わず、ASGI を直接ラップする。
+    ラベルにはパスそのものではなくテンプレートを使い、系列数が増え続けないようにする。
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status_code = 500
+        started = time.perf_counter()
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec()
+            # ルーティング後に FastAPI が scope["route"] に一致したルートを設定する
+            route = scope.get("route")
+            labels = {"method": scope["method"], "route": route.path if route is not None else UNMATCHED_ROUTE, "status": status_code}
+            http_requests.inc(**labels)
+            http_request_duration.observe(elapsed, **labels)
@@ -0,0 +1,71 @@
+import ipaddress
+from typing import List, Optional, Tuple, Union
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+Network = Union[ipaddress.IPv4Network, ipaddress.IPv6Network]
+
+
+def parse_trusted_proxies(value: str) -> Tuple[bool, Tuple[Network, ...]]:
+    """
+    FORWARDED_ALLOW_IPS (IP または CIDR のカンマ区切り、"*" で全て) を解釈
+
+    Returns:
+        (すべて信頼するか, 信頼するネットワーク)
+    """
+    items = [item.strip() for item in value.split(",") if item.strip()]
+    return "*" in items, tuple(ipaddress.ip_network(item, strict=False) for item in items if item != "*")
+
+
+class ProxyHeadersMiddleware:
+    """
+    信頼するプロキシ (ingress など) から届いたリクエストのみ、X-Forwarded-For / X-Forwarded-Proto でクライアントを置き換えるミドルウェア
+
+    uvicorn 0.23 の proxy_headers は IP の完全一致しか扱えず、pod の IP が入れ替わる ingress controller を
+    CIDR で指定できないため、こちらで処理する。X-Forwarded-For は右から (プロキシに近い順に) たどり、
+    信頼するプロキシ以外で最初に現れたアドレスをクライアントとする (クライアントが先頭に書いた値は信用しない)。
+    """
+
+    def __init__(self, app: ASGIApp, trusted_proxies: str):
+        self.app = app
+        self.always_trust, self.networks = parse_trusted_proxies(trusted_proxies)
+
+    def is_trusted(self, host: Optional[str]) -> bool:
+        if self.always_trust:
+            return True
+        if not host:
+            return False
+        try:
+            address = ipaddress.ip_address(host)
+        except ValueError:
+            return False
+        return any(address in network for network in self.networks)
+
+    def client_host(self, forwarded_for: List[str]) -> Optional[str]:
+        if self.always_trust:
+            return forwarded_for[0]
+        for host in reversed(forwarded_for):
+            if not self.is_trusted(host):
+                return host
+        # すべてプロキシの場合は最も遠いものをクライアントとみなす
+        return forwarded_for[0] if forwarded_for else None
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] in ("http", "websocket"):
+            client = scope.get("client")
+            if self.is_trusted(client[0] if client else None):
+                headers = dict(scope["headers"])
+                proto = headers.get(b"x-forwarded-proto")
+                if proto is not None:
+                    proto = proto.decode("latin1").strip().lower()
+                    if scope["type"] == "websocket":
+                        scope["scheme"] = "wss" if proto == "https" else "ws"
+                    elif proto in ("http", "https"):
+                        scope["scheme"] = proto
+                forwarded_for = headers.get(b"x-forwarded-for")
+                if forwarded_for is not None:
+                    host = self.client_host([item.strip() for item in forwarded_for.decode("latin1").split(",") if item.strip()])
+                    if host:
+                        # ポートはプロキシで失われるため 0 とする
+                        scope["client"] = (host, 0)
+        await self.app(scope, receive, send)
@@ -0,0 +1,54 @@
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from app.core.tracing import finish_trace, server_timing_header, span_exporter, start_trace
+
+UNMATCHED_ROUTE = "<unmatched>"
+
+
+class TracingMiddleware:
+    """
+    リクエストごとにトレースを開始し、処理段階ごとの所要時間を返すミドルウェア
+
+    ハンドラ内で `with span("..."):` により記録された区間を Server-Timing ヘッダーで返し (SERVER_TIMING_ENABLED の場合のみ)、
+    サンプリングされたトレースは span_exporter から OpenTelemetry 互換の形式で書き出す。
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        traceparent = None
+        for name, value in scope["headers"]:
+            if name == b"traceparent":
+                traceparent = value.decode("latin-1")
+                break
+        trace = start_trace(traceparent)
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if settings.SERVER_TIMING_ENABLED:
+                    headers = MutableHeaders(scope=message)
+                    headers.append("Server-Timing", server_timing_header(trace))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = scope.get("route")
+            route_path = route.path if route is not None else UNMATCHED_ROUTE
+            finish_trace(
+                trace,
+                f"{scope['method']} {route_path}",
+                error=status_code >= 500,
+                **{"http.method": scope["method"], "http.route": route_path, "http.status_code": status_code},
+            )
+            span_exporter.submit(trace)
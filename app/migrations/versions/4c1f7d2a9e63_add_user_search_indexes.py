@@ -0,0 +1,39 @@
+"""add user search indexes
+
+Revision ID: 4c1f7d2a9e63
+Revises: b205e45338d5
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c1f7d2a9e63'
+down_revision: Union[str, None] = 'b205e45338d5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+SEARCH_COLUMNS = ('email', 'name', 'github_username')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.execute('CREATE EXTENSION IF NOT EXISTS pg_trgm')
+    # 一覧のキーセットページネーション (ORDER BY created_date DESC, id DESC)
+    op.create_index('ix_users_created_date_id', 'users', ['created_date', 'id'], unique=False)
+    for column in SEARCH_COLUMNS:
+        # 前方一致検索: lower(column) LIKE 'q%'
+        op.execute(f'CREATE INDEX ix_users_{column}_lower_pattern ON users (lower({column}) text_pattern_ops)')
+        # 部分一致・類似度検索: lower(column) LIKE '%q%' / lower(column) % 'q'
+        op.execute(f'CREATE INDEX ix_users_{column}_lower_trgm ON users USING gin (lower({column}) gin_trgm_ops)')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for column in SEARCH_COLUMNS:
+        op.drop_index(f'ix_users_{column}_lower_trgm', table_name='users')
+        op.drop_index(f'ix_users_{column}_lower_pattern', table_name='users')
+    op.drop_index('ix_users_created_date_id', table_name='users')
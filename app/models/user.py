@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, DateTime, Integer, String, Text
+from sqlalchemy import Boolean, Column, DateTime, Index, Integer, String, Text
 from sqlalchemy.sql import func
 
 from app.db.base_class import Base
@@ -7,6 +7,11 @@ from app.db.base_class import Base
 class User(Base):
     """ユーザーモデル"""
     __tablename__ = "users"
+    __table_args__ = (
+        # 管理者向け一覧のキーセットページネーション用
+        # (lower(...) の検索用インデックスは式インデックスのためマイグレーションのみで管理する)
+        Index("ix_users_created_date_id", "created_date", "id"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     
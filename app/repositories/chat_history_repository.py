@@ -1,38 +1,66 @@
+import asyncio
 import logging
 from datetime import datetime
-from typing import List, Optional
+from typing import TYPE_CHECKING, Collection, List, Optional, Set
 
 from motor.motor_asyncio import AsyncIOMotorDatabase
 
+from app.core.config import settings
+from app.core.tracing import span
 from app.schemas.chat import ChatMessage
 
+if TYPE_CHECKING:
+    from app.core.llm.memory.retrieval import RetrievalMemory
+
 logger = logging.getLogger(__name__)
 
+# 応答を待たせずに実行中の長期記憶への追加 (完了まで参照を保持し、終了時に待つ)
+_background_writes: Set[asyncio.Task] = set()
+
+
+async def drain_background_writes(timeout: float) -> None:
+    """Wait for pending background memory writes (called on shutdown)"""
+    if _background_writes:
+        await asyncio.wait(list(_background_writes), timeout=timeout)
+
 
 class ChatHistoryRepository:
     """Repository for managing chat history in MongoDB"""
 
-    def __init__(self, mongodb: AsyncIOMotorDatabase):
+    def __init__(self, mongodb: AsyncIOMotorDatabase, memory: Optional["RetrievalMemory"] = None):
         """Initialize the repository with MongoDB connection
 
         Args:
             mongodb: MongoDB database connection
+            memory: Retrieval memory that appended messages are embedded into
+                (default: configured by MEMORY_ENABLED)
         """
         self.mongodb = mongodb
         self.collection = self.mongodb.talks
+        if memory is None and settings.MEMORY_ENABLED:
+            # numpy などの読み込みは有効な場合だけにする
+            from app.core.llm.memory.retrieval import get_retrieval_memory
+
+            memory = get_retrieval_memory(mongodb)
+        self.memory = memory
 
-    async def get_history(self, chat_id: str) -> List[ChatMessage]:
+    async def get_history(
+        self, chat_id: str, exclude_message_ids: Collection[str] = (), raise_errors: bool = False
+    ) -> List[ChatMessage]:
         """Get chat history for a specific chat_id
 
         Args:
             chat_id: Unique identifier for the chat
+            exclude_message_ids: Message IDs to leave out (messages saved by an earlier attempt of the same turn)
+            raise_errors: Raise MongoDB errors instead of returning an empty history
 
         Returns:
             List of chat messages
         """
         try:
             # Find the talk document by chat_id
-            talk = await self.collection.find_one({"chatId": chat_id})
+            with span("mongo_find_one", collection="talks"):
+                talk = await self.collection.find_one({"chatId": chat_id})
             if not talk:
                 logger.info(f"No chat history found for chat_id: {chat_id}, returning empty list")
                 return []
@@ -40,51 +68,88 @@ class ChatHistoryRepository:
             # Convert MongoDB messages to ChatMessage schema
             messages = []
             for msg in talk.get("messages", []):
+                if msg.get("id") in exclude_message_ids:
+                    continue
                 messages.append(ChatMessage(role=msg["role"], content=msg["text"]))
 
             return messages
         except Exception as e:
             logger.error(f"Error retrieving chat history for chat_id {chat_id}: {str(e)}")
+            if raise_errors:
+                raise
             return []
 
-    async def append_message(self, chat_id: str, message: ChatMessage, user_id: Optional[str] = None) -> bool:
+    async def append_message(
+        self,
+        chat_id: str,
+        message: ChatMessage,
+        user_id: Optional[str] = None,
+        message_id: Optional[str] = None,
+        raise_errors: bool = False,
+    ) -> bool:
         """Append a new message to the chat history
 
         Args:
             chat_id: Unique identifier for the chat
             message: Chat message to append
             user_id: Optional user ID associated with the chat
+            message_id: Optional ID that makes the append idempotent (a message with the same ID is not appended again)
+            raise_errors: Raise MongoDB errors instead of returning False
 
         Returns:
             True if successful, False otherwise
         """
         try:
             # Find the talk document
-            talk = await self.collection.find_one({"chatId": chat_id})
+            with span("mongo_find_one", collection="talks"):
+                talk = await self.collection.find_one({"chatId": chat_id})
 
             # If talk doesn't exist, create a new one
             if not talk:
                 logger.info(f"Creating new talk with chat_id: {chat_id}")
-                await self.collection.insert_one(
-                    {
-                        "chatId": chat_id,
-                        "userId": user_id,
-                        "title": "New Conversation",  # Default title
-                        "messages": [],
-                        "lastUpdated": datetime.utcnow(),
-                    }
-                )
+                with span("mongo_insert_one", collection="talks"):
+                    await self.collection.insert_one(
+                        {
+                            "chatId": chat_id,
+                            "userId": user_id,
+                            "title": "New Conversation",  # Default title
+                            "messages": [],
+                            "lastUpdated": datetime.utcnow(),
+                        }
+                    )
 
             # Append the message
-            await self.collection.update_one(
-                {"chatId": chat_id},
-                {
-                    "$push": {"messages": {"role": message.role, "text": message.content}},
-                    "$set": {"lastUpdated": datetime.utcnow()},
-                },
-            )
+            query = {"chatId": chat_id}
+            entry = {"role": message.role, "text": message.content}
+            if message_id is not None:
+                query["messages.id"] = {"$ne": message_id}
+                entry["id"] = message_id
+            with span("mongo_update_one", collection="talks"):
+                result = await self.collection.update_one(
+                    query,
+                    {
+                        "$push": {"messages": entry},
+                        "$set": {"lastUpdated": datetime.utcnow()},
+                    },
+                )
+            if result.matched_count == 0:
+                # Already appended by an earlier attempt of the same turn
+                return True
+
+            # Embed the message for retrieval (failures are logged by the memory itself)
+            if self.memory is not None:
+                if message.role == "user":
+                    # The search for this turn reuses the vector (memo), so embed it before responding
+                    await self.memory.add(chat_id, message)
+                else:
+                    # The response does not need the assistant message's vector; embed it in the background
+                    task = asyncio.create_task(self.memory.add(chat_id, message))
+                    _background_writes.add(task)
+                    task.add_done_callback(_background_writes.discard)
 
             return True
         except Exception as e:
             logger.error(f"Error appending message to chat_id {chat_id}: {str(e)}")
+            if raise_errors:
+                raise
             return False
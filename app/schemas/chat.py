@@ -1,4 +1,5 @@
-from typing import List, Optional
+from datetime import datetime
+from typing import List, Literal, Optional
 
 from pydantic import BaseModel, Field
 
@@ -27,3 +28,16 @@ class ChatOutput(BaseOutput):
 
     role: str = Field(..., description="Role of the response")
     response: str = Field(..., description="Response content")
+
+
+class ChatJob(BaseModel):
+    """Status and result of an asynchronous chat job"""
+
+    job_id: str = Field(..., description="Job identifier")
+    status: Literal["queued", "running", "succeeded", "failed"] = Field(..., description="Job status")
+    chat_id: str = Field(..., description="Chat session the job belongs to")
+    attempts: int = Field(default=0, description="Number of times a worker has started the job")
+    result: Optional[ChatOutput] = Field(default=None, description="Chat response (when succeeded)")
+    error: Optional[str] = Field(default=None, description="Error message (when failed)")
+    created_at: datetime
+    updated_at: datetime
@@ -0,0 +1,61 @@
+from typing import List, Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class LLMUsage(BaseModel):
+    """LLM呼び出し1回分のトークン数とレイテンシ"""
+
+    model_config = ConfigDict(protected_namespaces=())
+
+    model: str
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    latency_ms: float = 0.0
+
+
+class UsageCounters(BaseModel):
+    """集計済みの利用量"""
+
+    requests: int = 0
+    prompt_tokens: int = 0
+    completion_tokens: int = 0
+    total_tokens: int = 0
+    latency_ms: float = Field(0.0, description="LLM呼び出しの合計時間 (ミリ秒)")
+
+
+class DailyUsage(UsageCounters):
+    """1日 (UTC) 分の利用量"""
+
+    date: str
+
+
+class ChatUsage(UsageCounters):
+    """会話ごとの利用量"""
+
+    chat_id: str
+
+
+class UserUsage(BaseModel):
+    """ユーザー自身の利用量"""
+
+    user_id: int
+    daily_token_quota: Optional[int] = Field(None, description="1日あたりのトークン数の上限 (未設定の場合は null)")
+    today: UsageCounters
+    days: List[DailyUsage]
+    chats: List[ChatUsage]
+
+
+class TopConsumer(UsageCounters):
+    """期間内の利用量が多いユーザー"""
+
+    user_id: int
+
+
+class TopConsumers(BaseModel):
+    """期間内の利用量の多いユーザーの一覧"""
+
+    since: str
+    until: str
+    items: List[TopConsumer]
@@ -1,5 +1,5 @@
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 from pydantic import BaseModel, EmailStr, computed_field
 
@@ -78,6 +78,30 @@ class UserMe(BaseModel):
             return self.github_avatar_url
         return None
 
+class UserPage(BaseModel):
+    """管理者向けユーザー一覧のページ"""
+    items: List[User]
+    next_cursor: Optional[str] = None  # 次ページのカーソル (最終ページの場合はNone)
+
+
+class UserImportError(BaseModel):
+    """一括登録で失敗した行の情報"""
+    row: int
+    email: Optional[str] = None
+    detail: str
+
+
+class UserImportReport(BaseModel):
+    """一括登録の結果スキーマ"""
+    total: int = 0  # 読み込んだ行数
+    inserted: int = 0  # 登録した件数
+    duplicates: int = 0  # 既存・ファイル内重複でスキップした件数
+    failed: int = 0  # 検証エラー・衝突の件数
+    errors: List[UserImportError] = []  # 失敗した行 (USER_IMPORT_MAX_ERRORS件まで)
+    elapsed_seconds: float = 0.0
+    rows_per_second: float = 0.0
+
+
 class Token(BaseModel):
     """アクセストークンスキーマ"""
     access_token: str
@@ -86,6 +110,11 @@ class Token(BaseModel):
     refresh_token: Optional[str] = None
 
 
+class TokenRefresh(BaseModel):
+    """リフレッシュトークンによる再発行リクエストスキーマ"""
+    refresh_token: str
+
+
 class TokenPayload(BaseModel):
     """トークンペイロードスキーマ"""
     sub: Optional[int] = None  # subject (user id)
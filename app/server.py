@@ -0,0 +1,109 @@
+"""
+本番用のサーバー起動エントリポイント
+
+    python -m app.server
+
+ワーカー数は SERVER_WORKERS (0 の場合はコンテナに割り当てられた CPU 数) で決める。
+各ワーカーは spawn で起動した別プロセスで main:app を読み込み、lifespan で DB / Redis / Mongo などの
+接続をプロセスごとに作成する。SIGTERM を受けると新規接続の受け付けを止め、処理中のリクエストを
+SERVER_GRACEFUL_TIMEOUT 秒まで待ってから各ワーカーの lifespan の終了処理を実行する。
+複数ワーカーの場合、メトリクスは各ワーカーが METRICS_MULTIPROC_DIR に書き出した値をこのプロセスが
+METRICS_PORT でまとめて公開する (単一ワーカーの場合はワーカー自身が公開する)。
+"""
+import importlib.util
+import logging
+import math
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import Optional
+
+import uvicorn
+
+from app.core.config import settings
+from app.core.metrics_server import serve_aggregated_metrics
+
+logger = logging.getLogger(__name__)
+
+CGROUP_V2_CPU_MAX = Path("/sys/fs/cgroup/cpu.max")
+CGROUP_V1_CPU_DIRS = (Path("/sys/fs/cgroup/cpu"), Path("/sys/fs/cgroup/cpu,cpuacct"))
+
+
+def cgroup_cpu_limit() -> Optional[float]:
+    """
+    cgroup の CPU クォータ (コア数換算) を取得
+
+    Returns:
+        クォータ / 周期 (例: limits.cpu=1500m なら 1.5)。上限が無い場合は None
+    """
+    try:
+        if CGROUP_V2_CPU_MAX.exists():
+            quota, period = CGROUP_V2_CPU_MAX.read_text().split()
+            return None if quota == "max" else int(quota) / int(period)
+        for directory in CGROUP_V1_CPU_DIRS:
+            quota_file, period_file = directory / "cpu.cfs_quota_us", directory / "cpu.cfs_period_us"
+            if quota_file.exists() and period_file.exists():
+                quota = int(quota_file.read_text())
+                return None if quota <= 0 else quota / int(period_file.read_text())
+    except (OSError, ValueError) as e:
+        logger.warning(f"Failed to read cgroup CPU quota: {str(e)}")
+    return None
+
+
+def available_cpus() -> int:
+    """プロセスが実行可能な CPU 数 (taskset / cpuset を考慮)"""
+    if hasattr(os, "sched_getaffinity"):
+        return len(os.sched_getaffinity(0))
+    return os.cpu_count() or 1
+
+
+def default_workers() -> int:
+    """CPU クォータがあればその値 (切り上げ)、無ければ実行可能な CPU 数をワーカー数とする"""
+    cpus = available_cpus()
+    limit = cgroup_cpu_limit()
+    if limit is None:
+        return cpus
+    return max(1, min(cpus, math.ceil(limit)))
+
+
+def _available(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def main() -> None:
+    workers = settings.SERVER_WORKERS or default_workers()
+    loop = "uvloop" if _available("uvloop") else "asyncio"
+    http = "httptools" if _available("httptools") else "h11"
+    logging.basicConfig(level=settings.SERVER_LOG_LEVEL.upper())
+    logger.info(f"Starting {workers} worker(s) with loop={loop} http={http} (cgroup cpu limit: {cgroup_cpu_limit()})")
+
+    metrics_dir = None
+    if workers > 1 and settings.METRICS_PORT:
+        # spawn で起動するワーカーは環境変数から設定を読むため、settings ではなく環境変数で渡す
+        metrics_dir = settings.METRICS_MULTIPROC_DIR or tempfile.mkdtemp(prefix="metrics-")
+        os.environ["METRICS_MULTIPROC_DIR"] = metrics_dir
+        serve_aggregated_metrics(metrics_dir, settings.METRICS_HOST, settings.METRICS_PORT)
+
+    try:
+        uvicorn.run(
+            "main:app",
+            host=settings.SERVER_HOST,
+            port=settings.SERVER_PORT,
+            workers=workers,
+            loop=loop,
+            http=http,
+            backlog=settings.SERVER_BACKLOG,
+            timeout_keep_alive=settings.SERVER_KEEPALIVE_TIMEOUT,
+            timeout_graceful_shutdown=settings.SERVER_GRACEFUL_TIMEOUT,
+            log_level=settings.SERVER_LOG_LEVEL,
+            # X-Forwarded-For は CIDR で指定できる ProxyHeadersMiddleware (FORWARDED_ALLOW_IPS) で処理する
+            proxy_headers=False,
+        )
+    finally:
+        if metrics_dir is not None and not settings.METRICS_MULTIPROC_DIR:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,260 @@
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Dict, List, Optional, Tuple
+
+from redis.exceptions import ResponseError
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.redis_client import get_redis
+from app.schemas.chat import ChatInput, ChatJob, ChatOutput
+
+logger = logging.getLogger(__name__)
+
+jobs_enqueued = registry.counter("chat_jobs_enqueued_total", "受け付けたチャットジョブ数", ["outcome"])
+
+JOB_KEY_PREFIX = "chatjob:"
+IDEMPOTENCY_KEY_PREFIX = "chatjob:idem:"
+TERMINAL_STATUSES = ("succeeded", "failed")
+# 履歴はワーカーが MongoDB から読み直すため、クライアントが送った分はストリームに載せない
+PAYLOAD_EXCLUDE = {"history"}
+
+# ジョブの状態 (ハッシュ) とストリームへの追加を1回のラウンドトリップで原子的に行う。
+# 冪等キーがある場合は、既に受け付けたジョブがあればそのIDを返す (クライアントの再送で二重に実行しない)。
+# KEYS[1]: ジョブのキー, KEYS[2]: ストリーム, KEYS[3]: 冪等キー (省略可)
+# ARGV[1]: ジョブID, ARGV[2]: 保持期間 (秒), ARGV[3]: ストリームの MAXLEN, ARGV[4]: ユーザーID,
+# ARGV[5]: チャットID, ARGV[6]: 受付時刻, ARGV[7]: ChatInput (JSON)
+# 戻り値: ジョブID (既存のジョブの場合はそのID)
+ENQUEUE_SCRIPT = """
+if #KEYS == 3 then
+    local existing = redis.call('GET', KEYS[3])
+    if existing then
+        return existing
+    end
+    redis.call('SET', KEYS[3], ARGV[1], 'EX', ARGV[2])
+end
+redis.call('HSET', KEYS[1], 'status', 'queued', 'user_id', ARGV[4], 'chat_id', ARGV[5], 'attempts', 0,
+    'created_at', ARGV[6], 'updated_at', ARGV[6])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('XADD', KEYS[2], 'MAXLEN', '~', ARGV[3], '*', 'job_id', ARGV[1], 'user_id', ARGV[4], 'payload', ARGV[7])
+return ARGV[1]
+"""
+
+# ストリームのエントリ (メッセージID, フィールド)
+StreamEntry = Tuple[str, Dict[str, str]]
+
+
+def _to_datetime(value: str) -> datetime:
+    return datetime.fromtimestamp(float(value), tz=timezone.utc)
+
+
+class ChatJobTooLargeError(ValueError):
+    """ジョブの入力がストリームに追加できる大きさ (CHAT_JOB_MAX_PAYLOAD_BYTES) を超えた場合に送出される例外"""
+
+    def __init__(self, size: int, limit: int):
+        super().__init__(f"chat job payload is {size} bytes (limit: {limit})")
+        self.size = size
+        self.limit = limit
+
+
+class ChatJobQueue:
+    """
+    Redis Streams を使ったチャットジョブのキュー
+
+    API はジョブの状態をハッシュ (chatjob:{id}) に書き、ストリームにエントリを追加するだけで応答する。
+    ワーカー (python -m app.worker) はコンシューマーグループで読み出し、結果をハッシュに書いてから ACK する。
+    ACK されなかったエントリ (処理中にワーカーが落ちた分) は、一定時間後に他のワーカーが引き取って再実行する。
+    ACK と同時にエントリを削除し、ストリームには未完了のジョブだけを残す (Redis のメモリを結果の保持期間に比例させない)。
+    """
+
+    def __init__(self, stream: str, group: str, maxlen: int, result_ttl: int, max_payload_bytes: int):
+        self.stream = stream
+        self.group = group
+        self.maxlen = maxlen
+        self.result_ttl = result_ttl
+        self.max_payload_bytes = max_payload_bytes
+        self._enqueue = None
+
+    def _script(self):
+        # register_script はクライアントに紐づくため、Redis クライアントの作り直し (fork後など) に追従する
+        redis = get_redis()
+        if self._enqueue is None or self._enqueue.registered_client is not redis:
+            self._enqueue = redis.register_script(ENQUEUE_SCRIPT)
+        return self._enqueue
+
+    @staticmethod
+    def _job_key(job_id: str) -> str:
+        return f"{JOB_KEY_PREFIX}{job_id}"
+
+    async def enqueue(self, user_id: int, chat_input: ChatInput, idempotency_key: Optional[str] = None) -> Tuple[ChatJob, bool]:
+        """
+        ジョブを受け付ける
+
+        Args:
+            user_id: ジョブを登録するユーザー
+            chat_input: チャットの入力
+            idempotency_key: クライアントが指定する冪等キー (同じキーの再送には既存のジョブを返す)
+
+        Returns:
+            (ジョブ, 新規に受け付けたか)
+
+        Raises:
+            ChatJobTooLargeError: 入力 (履歴を除く) が max_payload_bytes を超えた場合 (Redis に書き込む前に拒否する)
+        """
+        payload = chat_input.model_dump_json(exclude=PAYLOAD_EXCLUDE)
+        size = len(payload.encode())
+        if size > self.max_payload_bytes:
+            jobs_enqueued.inc(outcome="too_large")
+            raise ChatJobTooLargeError(size, self.max_payload_bytes)
+        job_id = uuid.uuid4().hex
+        keys = [self._job_key(job_id), self.stream]
+        if idempotency_key:
+            keys.append(f"{IDEMPOTENCY_KEY_PREFIX}{user_id}:{idempotency_key}")
+        accepted_id = await self._script()(
+            keys=keys,
+            args=[job_id, self.result_ttl, self.maxlen, user_id, chat_input.chat_id, time.time(), payload],
+        )
+        created = accepted_id == job_id
+        jobs_enqueued.inc(outcome="created" if created else "duplicate")
+        job = await self.get(accepted_id, user_id)
+        if job is None:
+            # 冪等キーより先にジョブの状態が期限切れになった場合
+            raise LookupError(f"chat job {accepted_id} has expired")
+        return job, created
+
+    async def get(self, job_id: str, user_id: int) -> Optional[ChatJob]:
+        """ジョブの状態を取得 (他のユーザーのジョブや期限切れの場合は None)"""
+        data = await get_redis().hgetall(self._job_key(job_id))
+        if not data or data.get("user_id") != str(user_id):
+            return None
+        result = data.get("result")
+        return ChatJob(
+            job_id=job_id,
+            status=data["status"],
+            chat_id=data["chat_id"],
+            attempts=int(data.get("attempts", 0)),
+            result=ChatOutput.model_validate_json(result) if result else None,
+            error=data.get("error"),
+            created_at=_to_datetime(data["created_at"]),
+            updated_at=_to_datetime(data["updated_at"]),
+        )
+
+    async def wait(self, job_id: str, user_id: int, timeout: float) -> Optional[ChatJob]:
+        """ジョブが完了するまで最大 timeout 秒待って状態を返す (ロングポーリング)"""
+        deadline = time.monotonic() + timeout
+        while True:
+            job = await self.get(job_id, user_id)
+            if job is None or job.status in TERMINAL_STATUSES or time.monotonic() >= deadline:
+                return job
+            await asyncio.sleep(min(settings.CHAT_JOB_POLL_INTERVAL, max(0.0, deadline - time.monotonic())))
+
+    # 以下はワーカーが使う操作
+
+    async def ensure_group(self) -> None:
+        """コンシューマーグループを作成 (既にある場合は何もしない)"""
+        try:
+            await get_redis().xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def read(self, consumer: str, count: int, block: float) -> List[StreamEntry]:
+        """未配信のエントリを最大 count 件、最大 block 秒待って読み出す"""
+        response = await get_redis().xreadgroup(self.group, consumer, {self.stream: ">"}, count=count, block=int(block * 1000))
+        return [(message_id, fields) for _, entries in response or [] for message_id, fields in entries]
+
+    async def claim_stale(self, consumer: str, min_idle: float, count: int, max_attempts: int) -> List[StreamEntry]:
+        """
+        min_idle 秒以上 ACK されていないエントリを引き取る
+
+        配信回数が max_attempts に達したエントリは再実行せず failed にする (処理するたびにワーカーが落ちるジョブ対策)
+        """
+        redis = get_redis()
+        pending = await redis.xpending_range(self.stream, self.group, min="-", max="+", count=count, idle=int(min_idle * 1000))
+        exhausted = [entry["message_id"] for entry in pending if entry["times_delivered"] >= max_attempts]
+        retry = [entry["message_id"] for entry in pending if entry["times_delivered"] < max_attempts]
+        if exhausted:
+            for message_id, fields in await redis.xclaim(self.stream, self.group, consumer, int(min_idle * 1000), exhausted):
+                if fields:
+                    await self.fail(message_id, fields, "The job was abandoned after repeated worker failures")
+                else:
+                    # MAXLEN で本体が削除済みのエントリ
+                    await redis.xack(self.stream, self.group, message_id)
+                    await redis.xdel(self.stream, message_id)
+        if not retry:
+            return []
+        claimed = await redis.xclaim(self.stream, self.group, consumer, int(min_idle * 1000), retry)
+        return [(message_id, fields) for message_id, fields in claimed if fields]
+
+    async def backlog(self) -> Tuple[int, int]:
+        """
+        未完了のジョブ数 (ワーカーのスケールの指標)
+
+        完了したエントリは削除しているため、ストリームの長さから処理中 (配信済みで未 ACK) の数を引いたものが待機中の数になる
+
+        Returns:
+            (待機中, 処理中)
+        """
+        async with get_redis().pipeline(transaction=False) as pipe:
+            pipe.xlen(self.stream)
+            pipe.xpending(self.stream, self.group)
+            length, pending = await pipe.execute()
+        running = int(pending["pending"])
+        return max(0, int(length) - running), running
+
+    async def heartbeat(self, consumer: str, message_ids: List[str]) -> None:
+        """処理中のエントリのアイドル時間をリセットし、他のワーカーに引き取られないようにする"""
+        if message_ids:
+            await get_redis().xclaim(self.stream, self.group, consumer, 0, message_ids, justid=True)
+
+    async def start(self, message_id: str, fields: Dict[str, str]) -> Optional[ChatInput]:
+        """
+        ジョブを実行中にする
+
+        Returns:
+            実行する ChatInput。完了済み・期限切れのジョブの場合は ACK して None
+        """
+        job_key = self._job_key(fields["job_id"])
+        redis = get_redis()
+        status = await redis.hget(job_key, "status")
+        if status is None or status in TERMINAL_STATUSES:
+            # 結果を書いた後、ACK の前にワーカーが落ちた場合など
+            async with redis.pipeline(transaction=True) as pipe:
+                pipe.xack(self.stream, self.group, message_id)
+                pipe.xdel(self.stream, message_id)
+                await pipe.execute()
+            return None
+        async with redis.pipeline(transaction=True) as pipe:
+            pipe.hset(job_key, mapping={"status": "running", "updated_at": time.time()})
+            pipe.hincrby(job_key, "attempts", 1)
+            await pipe.execute()
+        return ChatInput.model_validate_json(fields["payload"])
+
+    async def complete(self, message_id: str, fields: Dict[str, str], output: ChatOutput) -> None:
+        """結果を書いてから ACK する"""
+        await self._finish(message_id, fields, {"status": "succeeded", "result": output.model_dump_json()})
+
+    async def fail(self, message_id: str, fields: Dict[str, str], error: str) -> None:
+        """ジョブを failed にして ACK する (再実行しない)"""
+        await self._finish(message_id, fields, {"status": "failed", "error": error})
+
+    async def _finish(self, message_id: str, fields: Dict[str, str], values: Dict[str, str]) -> None:
+        job_key = self._job_key(fields["job_id"])
+        async with get_redis().pipeline(transaction=True) as pipe:
+            pipe.hset(job_key, mapping={**values, "updated_at": time.time()})
+            pipe.expire(job_key, self.result_ttl)
+            pipe.xack(self.stream, self.group, message_id)
+            pipe.xdel(self.stream, message_id)
+            await pipe.execute()
+
+
+chat_job_queue = ChatJobQueue(
+    stream=settings.CHAT_JOB_STREAM,
+    group=settings.CHAT_JOB_GROUP,
+    maxlen=settings.CHAT_JOB_STREAM_MAXLEN,
+    result_ttl=settings.CHAT_JOB_RESULT_TTL,
+    max_payload_bytes=settings.CHAT_JOB_MAX_PAYLOAD_BYTES,
+)
@@ -1,13 +1,26 @@
 import logging
-from typing import Optional
+import time
+from typing import AsyncIterator, Optional
 
 from app.core.llm.chain.chatchain import ChatChain
 from app.core.llm.client.gemini_client import GeminiClient
+from app.core.metrics import registry
+from app.core.tracing import span
 from app.repositories.chat_history_repository import ChatHistoryRepository
 from app.schemas.chat import ChatInput, ChatMessage, ChatOutput
+from app.services.usage_meter import usage_meter
 
 logger = logging.getLogger(__name__)
 
+llm_requests = registry.counter("llm_requests_total", "LLMの呼び出し回数", ["model", "outcome"])
+llm_request_duration = registry.histogram(
+    "llm_request_duration_seconds",
+    "LLMの呼び出しにかかった時間",
+    ["model"],
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0),
+)
+llm_tokens = registry.counter("llm_tokens_total", "LLMで消費したトークン数", ["model", "kind"])
+
 
 class ChatService:
     """Chat service using Gemini LLM with persistent history"""
@@ -20,7 +33,8 @@ class ChatService:
     def _setup_chain(self):
         """Setup the chat chain"""
         chat_llm = self.gemini_client.get_chat_model()
-        self.chain = ChatChain(chat_llm)
+        memory = self.chat_history_repository.memory if self.chat_history_repository else None
+        self.chain = ChatChain(chat_llm, memory)
 
     async def chat(self, chat_input: ChatInput, user_id: Optional[str] = None) -> ChatOutput:
         """Process chat request with persistent history
@@ -33,33 +47,124 @@ class ChatService:
             Chat response
         """
         try:
-            # Set default model name if not provided
-            if not chat_input.model_name:
-                chat_input.model_name = "gemini-pro"
+            return await self.process(chat_input, user_id)
+        except Exception as e:
+            logger.error(f"Error in chat service: {str(e)}")
+            # Return error response
+            return ChatOutput(role="assistant", response=f"Sorry, I encountered an error: {str(e)}")
 
-            # If chat history repository is available, get history from MongoDB
-            if self.chat_history_repository:
-                # Retrieve history from repository
-                history = await self.chat_history_repository.get_history(chat_input.chat_id)
+    async def process(self, chat_input: ChatInput, user_id: Optional[str] = None, turn_id: Optional[str] = None) -> ChatOutput:
+        """Process chat request with persistent history, raising errors to the caller
 
-                # Update input with retrieved history
-                chat_input.history = history
+        Args:
+            chat_input: Chat input data
+            user_id: Optional user ID for history tracking
+            turn_id: Optional ID of this turn (e.g. the chat job ID). When the same turn is
+                processed again, its messages are not appended to the history twice, and history
+                errors are raised so that the turn is retried rather than run without its history.
 
-                # Add current user message to history
-                user_message = ChatMessage(role=chat_input.role, content=chat_input.response)
-                await self.chat_history_repository.append_message(chat_input.chat_id, user_message, user_id)
+        Returns:
+            Chat response
+        """
+        # Set default model name if not provided
+        if not chat_input.model_name:
+            chat_input.model_name = "gemini-pro"
+
+        # If chat history repository is available, get history from MongoDB
+        if self.chat_history_repository:
+            user_message_id = f"{turn_id}:user" if turn_id else None
+            assistant_message_id = f"{turn_id}:assistant" if turn_id else None
+            # Retrieve history from repository (without this turn's messages saved by an earlier attempt)
+            with span("history_load"):
+                history = await self.chat_history_repository.get_history(
+                    chat_input.chat_id,
+                    exclude_message_ids=(user_message_id, assistant_message_id) if turn_id else (),
+                    raise_errors=turn_id is not None,
+                )
+
+            # Update input with retrieved history
+            chat_input.history = history
+
+            # Add current user message to history
+            user_message = ChatMessage(role=chat_input.role, content=chat_input.response)
+            with span("history_save_user"):
+                await self.chat_history_repository.append_message(
+                    chat_input.chat_id, user_message, user_id, message_id=user_message_id, raise_errors=turn_id is not None
+                )
+
+        # Invoke the chain directly with ChatInput
+        model = self.gemini_client.model_name
+        started = time.perf_counter()
+        try:
+            result, usage = await self.chain.ainvoke_with_usage(chat_input)
+        except Exception:
+            llm_requests.inc(model=model, outcome="error")
+            raise
+        finally:
+            llm_request_duration.observe(time.perf_counter() - started, model=model)
+        llm_requests.inc(model=model, outcome="success")
+        llm_tokens.inc(usage.prompt_tokens, model=model, kind="prompt")
+        llm_tokens.inc(usage.completion_tokens, model=model, kind="completion")
+        usage_meter.record(user_id, chat_input.chat_id, usage)
+
+        # Save assistant's response to history if repository is available
+        if self.chat_history_repository:
+            assistant_message = ChatMessage(role=result.role, content=result.response)
+            with span("history_save_assistant"):
+                await self.chat_history_repository.append_message(
+                    chat_input.chat_id,
+                    assistant_message,
+                    user_id,
+                    message_id=assistant_message_id,
+                    raise_errors=turn_id is not None,
+                )
+
+        return result
+
+    async def stream_chat(self, chat_input: ChatInput, user_id: Optional[str] = None) -> AsyncIterator[str]:
+        """Stream the assistant response for an input whose history is already populated
+
+        Unlike chat(), the history is not loaded from MongoDB (the caller keeps it, e.g. per WebSocket
+        connection), but both messages are still saved. Errors are raised to the caller.
 
-            # Invoke the chain directly with ChatInput
-            result = self.chain.invoke(chat_input)
+        Args:
+            chat_input: Chat input data including the history window
+            user_id: Optional user ID for history tracking
 
-            # Save assistant's response to history if repository is available
-            if self.chat_history_repository:
-                assistant_message = ChatMessage(role=result.role, content=result.response)
-                await self.chat_history_repository.append_message(chat_input.chat_id, assistant_message, user_id)
+        Yields:
+            Text deltas of the assistant response
+        """
+        if not chat_input.model_name:
+            chat_input.model_name = "gemini-pro"
 
-            return result
+        if self.chat_history_repository:
+            user_message = ChatMessage(role=chat_input.role, content=chat_input.response)
+            with span("history_save_user"):
+                await self.chat_history_repository.append_message(chat_input.chat_id, user_message, user_id)
 
-        except Exception as e:
-            logger.error(f"Error in chat service: {str(e)}")
-            # Return error response
-            return ChatOutput(role="assistant", response=f"Sorry, I encountered an error: {str(e)}")
+        model = self.gemini_client.model_name
+        started = time.perf_counter()
+        message = None
+        try:
+            with span("llm"):
+                async for chunk in self.chain.astream(chat_input):
+                    message = chunk if message is None else message + chunk
+                    text = self.chain.chunk_text(chunk)
+                    if text:
+                        yield text
+        except Exception:
+            llm_requests.inc(model=model, outcome="error")
+            raise
+        finally:
+            llm_request_duration.observe(time.perf_counter() - started, model=model)
+        llm_requests.inc(model=model, outcome="success")
+
+        usage = self.chain.usage_from_message(chat_input, message, (time.perf_counter() - started) * 1000)
+        llm_tokens.inc(usage.prompt_tokens, model=model, kind="prompt")
+        llm_tokens.inc(usage.completion_tokens, model=model, kind="completion")
+        usage_meter.record(user_id, chat_input.chat_id, usage)
+
+        if self.chat_history_repository:
+            assistant_message = ChatMessage(role="assistant", content=self.chain.chunk_text(message) if message else "")
+            with span("history_save_assistant"):
+                await self.chat_history_repository.append_message(chat_input.chat_id, assistant_message, user_id)
@@ -0,0 +1,67 @@
+from datetime import datetime
+from typing import Dict
+
+from sqlalchemy import DateTime, Integer, column, update, values
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.db.session import AsyncSessionLocal
+from app.models.user import User
+from app.services.write_behind import WriteBehindBuffer, WriteBehindMetrics
+
+flush_duration = registry.histogram("last_login_flush_duration_seconds", "最終ログイン日時の一括更新にかかった時間")
+rows_flushed = registry.counter("last_login_rows_flushed_total", "一括更新で反映した最終ログイン日時の件数")
+logins_recorded = registry.counter("last_login_recorded_total", "バッファに記録したログインの件数")
+flush_errors = registry.counter("last_login_flush_errors_total", "一括更新に失敗した回数")
+pending_rows = registry.gauge("last_login_pending", "未反映の最終ログイン日時の件数")
+
+
+class LastLoginBuffer(WriteBehindBuffer[int, datetime]):
+    """
+    最終ログイン日時の書き込みをまとめて反映するバッファ
+
+    ログインのたびに UPDATE + COMMIT を発行する代わりに、ユーザーIDごとの最新時刻だけを
+    メモリに保持し、一定間隔 (最大遅延) または件数上限に達した時点で1文の UPDATE で反映する。
+    """
+
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession], flush_interval: float, max_pending: int):
+        super().__init__(
+            "last-login",
+            flush_interval,
+            max_pending,
+            WriteBehindMetrics(flush_duration=flush_duration, flushed=rows_flushed, errors=flush_errors, pending=pending_rows),
+        )
+        self.session_factory = session_factory
+
+    def record(self, user_id: int, logged_in_at: datetime) -> None:
+        """ログイン時刻を記録 (同一ユーザーは最新の時刻のみ保持)"""
+        logins_recorded.inc()
+        self._put(user_id, logged_in_at)
+
+    def _merge(self, current: datetime, value: datetime) -> datetime:
+        return max(current, value)
+
+    async def _write(self, batch: Dict[int, datetime]) -> None:
+        async with self.session_factory() as db:
+            if db.get_bind().dialect.name == "postgresql":
+                # UPDATE users SET last_login = v.last_login FROM (VALUES ...) AS v(id, last_login) WHERE users.id = v.id
+                rows = values(column("id", Integer), column("last_login", DateTime), name="v").data(list(batch.items()))
+                statement = (
+                    update(User)
+                    .where(User.id == rows.c.id)
+                    .values(last_login=rows.c.last_login)
+                    .execution_options(synchronize_session=False)
+                )
+                await db.execute(statement)
+            else:
+                # VALUES句を結合できないDBでは主キー指定のexecutemanyで反映する
+                await db.execute(update(User), [{"id": user_id, "last_login": logged_in_at} for user_id, logged_in_at in batch.items()])
+            await db.commit()
+
+
+last_login_buffer = LastLoginBuffer(
+    AsyncSessionLocal,
+    flush_interval=settings.LAST_LOGIN_FLUSH_INTERVAL,
+    max_pending=settings.LAST_LOGIN_MAX_PENDING,
+)
@@ -0,0 +1,55 @@
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import update
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.db.session import AsyncSessionLocal
+from app.models.user import User
+from app.services.write_behind import WriteBehindBuffer, WriteBehindMetrics
+
+flush_duration = registry.histogram("refresh_token_flush_duration_seconds", "リフレッシュトークンのハッシュの一括更新にかかった時間")
+rows_flushed = registry.counter("refresh_token_rows_flushed_total", "一括更新で反映したリフレッシュトークンのハッシュの件数")
+flush_errors = registry.counter("refresh_token_flush_errors_total", "一括更新に失敗した回数")
+pending_rows = registry.gauge("refresh_token_pending", "未反映のリフレッシュトークンのハッシュの件数")
+
+# (ハッシュ, 有効期限) / 失効させる場合は (None, None)
+TokenState = Tuple[Optional[str], Optional[datetime]]
+
+
+class RefreshTokenBuffer(WriteBehindBuffer[int, TokenState]):
+    """
+    リフレッシュトークンのハッシュを users.refresh_token にまとめて反映するバッファ
+
+    検証は Redis で完結するため、Postgres の値は Redis のデータが失われた場合の照合にのみ使う。
+    ログイン・ローテーションのたびに UPDATE + COMMIT を待たず、ユーザーIDごとの最新の値だけを保持して
+    一定間隔 (最大遅延) または件数上限に達した時点で反映する。
+    """
+
+    def __init__(self, session_factory: async_sessionmaker[AsyncSession], flush_interval: float, max_pending: int):
+        super().__init__(
+            "refresh-token",
+            flush_interval,
+            max_pending,
+            WriteBehindMetrics(flush_duration=flush_duration, flushed=rows_flushed, errors=flush_errors, pending=pending_rows),
+        )
+        self.session_factory = session_factory
+
+    def record(self, user_id: int, digest: Optional[str], expires: Optional[datetime]) -> None:
+        """ユーザーの最新のトークンを記録 (同一ユーザーは最後に記録した値のみ保持)"""
+        self._put(user_id, (digest, expires))
+
+    async def _write(self, batch: Dict[int, TokenState]) -> None:
+        async with self.session_factory() as db:
+            rows = [{"id": user_id, "refresh_token": digest, "token_expires": expires} for user_id, (digest, expires) in batch.items()]
+            await db.execute(update(User), rows)
+            await db.commit()
+
+
+refresh_token_buffer = RefreshTokenBuffer(
+    AsyncSessionLocal,
+    flush_interval=settings.REFRESH_TOKEN_FLUSH_INTERVAL,
+    max_pending=settings.REFRESH_TOKEN_MAX_PENDING,
+)
@@ -0,0 +1,167 @@
+import hashlib
+import logging
+import secrets
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional, Tuple
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.services.refresh_token_buffer import refresh_token_buffer
+from app.services.user_service import UserService
+
+logger = logging.getLogger(__name__)
+
+TOKEN_KEY = "refresh_token:{digest}"
+FAMILY_KEY = "refresh_family:{family}"
+# この時刻 (UNIXエポック秒) 以前に発行されたユーザーのトークンをすべて無効とする
+REVOKED_KEY = "refresh_revoked:{user_id}"
+
+# トークンを原子的に「使用済み」にし、使用前の状態と系列の最新トークンを返す (Redis への往復は1回)
+# 戻り値: {user_id, family, status, 系列の最新トークンのハッシュ ('' の場合は失効済み)} / 存在しない場合は false
+# status はユーザー単位で失効済みの場合 'revoked' になる
+CLAIM_SCRIPT = """
+local user_id = redis.call('HGET', KEYS[1], 'user_id')
+if not user_id then
+    return false
+end
+local family = redis.call('HGET', KEYS[1], 'family')
+local status = redis.call('HGET', KEYS[1], 'status')
+local issued_at = tonumber(redis.call('HGET', KEYS[1], 'issued_at') or '0')
+local revoked_at = redis.call('GET', KEYS[2])
+local current = redis.call('GET', ARGV[1] .. family) or ''
+if revoked_at and issued_at <= tonumber(revoked_at) then
+    status = 'revoked'
+elseif status == 'active' then
+    redis.call('HSET', KEYS[1], 'status', 'used')
+end
+return {user_id, family, status, current}
+"""
+
+
+def hash_token(token: str) -> str:
+    """リフレッシュトークンのハッシュ値 (十分なエントロピーがあるためSHA-256で保存する)"""
+    return hashlib.sha256(token.encode()).hexdigest()
+
+
+class RefreshTokenService:
+    """
+    リフレッシュトークンの発行とローテーションを行うサービス
+
+    トークンはハッシュ化してRedisに保存し、検証 (ユーザーID・系列・使用済みかどうか・ユーザー単位の失効) はRedisのみで完結させる。
+    使用済みトークンが再提示された場合は漏洩とみなし、同じ系列 (family) のトークンをすべて失効させる。
+    Postgres (users.refresh_token) には最新トークンのハッシュを refresh_token_buffer で非同期に永続化し
+    (Redisに書き込めなかった場合のみ同期的に反映)、Redisのデータが失われた場合にのみ参照する。
+    無効化されたユーザーはアクセストークンの利用時 (get_current_user) に拒否される。
+    """
+
+    def __init__(self, redis: Redis, user_service: UserService):
+        self.redis = redis
+        self.user_service = user_service
+        self.ttl = timedelta(days=settings.REFRESH_TOKEN_EXPIRE_DAYS)
+
+    async def issue(self, user_id: int, family: Optional[str] = None) -> str:
+        """
+        新しいリフレッシュトークンを発行
+
+        Args:
+            user_id: 対象ユーザーのID
+            family: ローテーション元の系列ID (新規ログインの場合はNone)
+
+        Returns:
+            クライアントに返すリフレッシュトークン
+        """
+        token = f"{user_id}.{secrets.token_urlsafe(32)}"
+        digest = hash_token(token)
+        family = family or uuid.uuid4().hex
+        ttl_seconds = int(self.ttl.total_seconds())
+        record = {"user_id": user_id, "family": family, "status": "active", "issued_at": time.time()}
+
+        refresh_token_buffer.record(user_id, digest, datetime.utcnow() + self.ttl)
+        try:
+            async with self.redis.pipeline(transaction=True) as pipe:
+                pipe.hset(TOKEN_KEY.format(digest=digest), mapping=record)
+                pipe.expire(TOKEN_KEY.format(digest=digest), ttl_seconds)
+                pipe.set(FAMILY_KEY.format(family=family), digest, ex=ttl_seconds)
+                await pipe.execute()
+        except RedisError as e:
+            # Redisに無いトークンはDBでしか照合できないため、反映を待ってから返す
+            logger.warning(f"Failed to store refresh token in Redis, falling back to database only: {str(e)}")
+            await refresh_token_buffer.flush()
+        return token
+
+    async def rotate(self, token: str) -> Optional[Tuple[int, str]]:
+        """
+        リフレッシュトークンを検証し、新しいトークンに交換
+
+        Args:
+            token: クライアントから提示されたリフレッシュトークン
+
+        Returns:
+            (ユーザーID, 新しいリフレッシュトークン) / 無効な場合はNone
+        """
+        user_id, _, secret = token.partition(".")
+        if not user_id.isdigit() or not secret:
+            return None
+        digest = hash_token(token)
+
+        try:
+            claimed = await self.redis.eval(
+                CLAIM_SCRIPT,
+                2,
+                TOKEN_KEY.format(digest=digest),
+                REVOKED_KEY.format(user_id=user_id),
+                FAMILY_KEY.format(family=""),
+            )
+        except RedisError as e:
+            logger.warning(f"Redis unavailable for refresh token check, using database fallback: {str(e)}")
+            return await self._rotate_from_database(int(user_id), digest)
+
+        if not claimed:
+            # Redisに存在しない (期限切れ・Redisのデータ消失) 場合はDBの最新トークンと照合する
+            return await self._rotate_from_database(int(user_id), digest)
+
+        stored_user_id, family, status, current = claimed
+        if status == "revoked":
+            await self._revoke_family(family, current)
+            return None
+        if status != "active" or current != digest:
+            # 使用済みトークンの再利用: 系列ごと失効させる
+            logger.warning(f"Refresh token reuse detected for user {stored_user_id}, revoking family {family}")
+            await self._revoke_family(family, current)
+            # DBに残る最新トークンでの照合も止めるため、この場合は反映を待つ
+            refresh_token_buffer.record(int(stored_user_id), None, None)
+            await refresh_token_buffer.flush()
+            return None
+        return int(stored_user_id), await self.issue(int(stored_user_id), family=family)
+
+    async def revoke_user(self, user_id: int) -> None:
+        """ユーザーのこれまでに発行したトークンをすべて失効させる (ユーザーの無効化・全端末のログアウト用)"""
+        refresh_token_buffer.record(user_id, None, None)
+        try:
+            await self.redis.set(REVOKED_KEY.format(user_id=user_id), time.time(), ex=int(self.ttl.total_seconds()))
+        except RedisError as e:
+            logger.error(f"Failed to revoke refresh tokens for user {user_id}: {str(e)}")
+        await refresh_token_buffer.flush()
+
+    async def _rotate_from_database(self, user_id: int, digest: str) -> Optional[Tuple[int, str]]:
+        user = await self.user_service.get(user_id=user_id)
+        if not user or not user.is_active or not user.refresh_token:
+            return None
+        if not secrets.compare_digest(user.refresh_token, digest):
+            return None
+        if user.token_expires is None or user.token_expires < datetime.utcnow():
+            return None
+        return user.id, await self.issue(user.id)
+
+    async def _revoke_family(self, family: str, current_digest: Optional[str]) -> None:
+        keys = [FAMILY_KEY.format(family=family)]
+        if current_digest:
+            keys.append(TOKEN_KEY.format(digest=current_digest))
+        try:
+            await self.redis.delete(*keys)
+        except RedisError as e:
+            logger.error(f"Failed to revoke refresh token family {family}: {str(e)}")
@@ -0,0 +1,201 @@
+import logging
+from datetime import datetime, timedelta, timezone
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.schemas.usage import LLMUsage
+from app.services.write_behind import WriteBehindBuffer, WriteBehindMetrics
+
+if TYPE_CHECKING:
+    from motor.motor_asyncio import AsyncIOMotorDatabase
+
+logger = logging.getLogger(__name__)
+
+DAILY_COLLECTION = "usage_daily"
+CHAT_COLLECTION = "usage_chats"
+COUNTER_FIELDS = ("requests", "prompt_tokens", "completion_tokens", "total_tokens", "latency_ms")
+
+flush_duration = registry.histogram("usage_flush_duration_seconds", "トークン使用量の一括書き込みにかかった時間", ["collection"])
+documents_flushed = registry.counter("usage_documents_flushed_total", "一括書き込みで更新した集計ドキュメント数", ["collection"])
+flush_errors = registry.counter("usage_flush_errors_total", "トークン使用量の一括書き込みに失敗した回数", ["collection"])
+pending_documents = registry.gauge("usage_pending", "未反映の集計ドキュメント数", ["collection"])
+
+Counters = Dict[str, float]
+
+
+def usage_date(at: Optional[datetime] = None) -> str:
+    """集計に使う日付 (UTC, YYYY-MM-DD)"""
+    return (at or datetime.now(timezone.utc)).strftime("%Y-%m-%d")
+
+
+def seconds_until_next_day(at: Optional[datetime] = None) -> int:
+    """次の集計日 (UTC の0時) までの秒数"""
+    now = at or datetime.now(timezone.utc)
+    tomorrow = (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return max(1, int((tomorrow - now).total_seconds()))
+
+
+def _add(target: Counters, source: Counters) -> None:
+    for field in COUNTER_FIELDS:
+        target[field] = target.get(field, 0) + source.get(field, 0)
+
+
+class _UsageBuffer(WriteBehindBuffer[Tuple[Any, ...], Counters]):
+    """集計ドキュメントごとのカウンター (コレクションごとに1つ)"""
+
+    def __init__(
+        self,
+        collection: str,
+        query: Callable[[Tuple[Any, ...]], Tuple[Dict[str, Any], Dict[str, Any]]],
+        indexes: List[Tuple[List[Tuple[str, int]], Dict[str, Any]]],
+        flush_interval: float,
+        max_pending: int,
+    ):
+        super().__init__(
+            collection,
+            flush_interval,
+            max_pending,
+            WriteBehindMetrics(
+                flush_duration=flush_duration,
+                flushed=documents_flushed,
+                errors=flush_errors,
+                pending=pending_documents,
+                labels={"collection": collection},
+            ),
+        )
+        self.collection = collection
+        self.query = query
+        self.indexes = indexes
+        self.database: Optional["AsyncIOMotorDatabase"] = None
+
+    def record(self, key: Tuple[Any, ...], counters: Counters) -> None:
+        self._put(key, dict(counters))
+
+    def _merge(self, current: Counters, value: Counters) -> Counters:
+        _add(current, value)
+        return current
+
+    async def ensure_indexes(self) -> None:
+        for keys, options in self.indexes:
+            await self.database[self.collection].create_index(keys, **options)
+
+    async def _prepare(self) -> None:
+        # MongoDB に接続できない場合に起動を待たせないよう、インデックスの作成もバックグラウンドで行う
+        # (インデックスが無くても集計はできるため、失敗しても処理は続ける)
+        await self.ensure_indexes()
+
+    async def _write(self, batch: Dict[Tuple[Any, ...], Counters]) -> None:
+        from pymongo import UpdateOne
+
+        now = datetime.now(timezone.utc)
+        updates = []
+        for key, counters in batch.items():
+            query, on_insert = self.query(key)
+            update: Dict[str, Any] = {"$inc": counters, "$set": {"updated_at": now}}
+            if on_insert:
+                update["$setOnInsert"] = on_insert
+            updates.append(UpdateOne(query, update, upsert=True))
+        # 順序に依存しない更新のため ordered=False で並列に適用させる
+        await self.database[self.collection].bulk_write(updates, ordered=False)
+
+
+class UsageMeter:
+    """
+    LLM のトークン使用量をユーザー×日 (UTC) と会話ごとに集計するバッファ
+
+    呼び出しのたびに Mongo へ書き込む代わりに、メモリ上のカウンターに加算しておき、一定間隔
+    (最大遅延) または件数上限に達した時点で集計ドキュメントごとに1つの $inc (upsert) を bulk_write で反映する。
+    コレクションごとに別のバッファで反映し、失敗した側だけを次回に持ち越す (二重加算を避ける)。
+    未反映の分はプロセス内にしか無いため、集計の参照は最大 flush_interval 秒遅れる。
+    """
+
+    def __init__(self, flush_interval: float, max_pending: int):
+        self.database: Optional["AsyncIOMotorDatabase"] = None
+        self.daily = _UsageBuffer(
+            DAILY_COLLECTION,
+            lambda key: ({"user_id": key[0], "date": key[1]}, {}),
+            [([("user_id", 1), ("date", 1)], {"unique": True}), ([("date", 1)], {})],
+            flush_interval,
+            max_pending,
+        )
+        # キーに所有者を含め、最初に作成したときだけ user_id を設定する
+        self.chats = _UsageBuffer(
+            CHAT_COLLECTION,
+            lambda key: ({"chat_id": key[0]}, {"user_id": key[1]}),
+            [([("chat_id", 1)], {"unique": True}), ([("user_id", 1), ("total_tokens", -1)], {})],
+            flush_interval,
+            max_pending,
+        )
+
+    def record(self, user_id: Optional[int], chat_id: str, usage: LLMUsage) -> None:
+        """1回分の使用量を加算"""
+        counters = {
+            "requests": 1,
+            "prompt_tokens": usage.prompt_tokens,
+            "completion_tokens": usage.completion_tokens,
+            "total_tokens": usage.total_tokens,
+            "latency_ms": usage.latency_ms,
+        }
+        if user_id is not None:
+            self.daily.record((user_id, usage_date()), counters)
+        self.chats.record((chat_id, user_id), counters)
+
+    def pending_tokens(self, user_id: int, date: Optional[str] = None) -> int:
+        """未反映の当日 (または指定日) のトークン数"""
+        counters = self.daily.get((user_id, date or usage_date()))
+        return int(counters.get("total_tokens", 0)) if counters else 0
+
+    async def daily_tokens(self, user_id: int, date: Optional[str] = None) -> int:
+        """反映済みと未反映を合わせた当日 (または指定日) のトークン数"""
+        date = date or usage_date()
+        stored = 0
+        if self.database is not None:
+            document = await self.database[DAILY_COLLECTION].find_one({"user_id": user_id, "date": date})
+            stored = int(document.get("total_tokens", 0)) if document else 0
+        return stored + self.pending_tokens(user_id, date)
+
+    async def start(self, database: "AsyncIOMotorDatabase") -> None:
+        """書き込み先を設定して定期フラッシュを開始"""
+        self.database = self.daily.database = self.chats.database = database
+        await self.daily.start()
+        await self.chats.start()
+
+    async def stop(self) -> None:
+        """定期フラッシュを停止し、残りを反映"""
+        for buffer in (self.daily, self.chats):
+            try:
+                await buffer.stop()
+            except Exception as e:
+                logger.error(f"Failed to flush usage counters on shutdown: {str(e)}")
+
+    async def ensure_indexes(self) -> None:
+        """upsert の検索条件と集計の参照に使うインデックスを作成"""
+        await self.daily.ensure_indexes()
+        await self.chats.ensure_indexes()
+
+    async def flush(self) -> int:
+        """
+        カウンターを Mongo に反映
+
+        Returns:
+            更新した集計ドキュメント数
+        """
+        if self.database is None:
+            return 0
+        error: Optional[Exception] = None
+        flushed = 0
+        for buffer in (self.daily, self.chats):
+            try:
+                flushed += await buffer.flush()
+            except Exception as e:
+                error = e
+        if error is not None:
+            raise error
+        return flushed
+
+
+usage_meter = UsageMeter(
+    flush_interval=settings.USAGE_FLUSH_INTERVAL,
+    max_pending=settings.USAGE_MAX_PENDING,
+)
@@ -0,0 +1,181 @@
+import asyncio
+import csv
+import io
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import IO, Any, Dict, Iterator, List, Optional, Set, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy import select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.security import get_password_hash
+from app.models.user import User
+from app.schemas.user import UserCreate, UserImportError, UserImportReport
+
+SUPPORTED_FORMATS = ("csv", "ndjson")
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str] = None) -> str:
+    """ファイル名・Content-Typeから入力形式を判定 (判定できない場合はCSV)"""
+    name = (filename or "").lower()
+    if name.endswith((".ndjson", ".jsonl")) or (content_type or "").startswith(("application/x-ndjson", "application/jsonl")):
+        return "ndjson"
+    return "csv"
+
+
+def iter_rows(stream: IO[bytes], fmt: str) -> Iterator[Tuple[int, Any]]:
+    """
+    入力を1行ずつ読み出す (ファイル全体をメモリに載せない)
+
+    Yields:
+        (行番号, 行データ) / パースできない行は (行番号, 例外)
+    """
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+    else:
+        for line_no, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                yield line_no, json.loads(line)
+            except ValueError as e:
+                yield line_no, e
+
+
+class ImportHashPool:
+    """
+    一括登録のパスワードハッシュ用のプロセスプール
+
+    リクエストごとにプロセスを起動・停止せず、最初の取り込みで作成したプールをプロセスの終了まで使い回す
+    (停止は AppResources の shutdown から行う)。
+    """
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def get(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    # fork だとイベントループやDB接続を子プロセスに複製してしまうため spawn を使う
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=multiprocessing.get_context("spawn"))
+        return self._executor
+
+    async def shutdown(self) -> None:
+        """プールを停止 (ワーカーの終了待ちはイベントループの外で行う)"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            await asyncio.to_thread(executor.shutdown, wait=True)
+
+
+import_hash_pool = ImportHashPool(max_workers=settings.USER_IMPORT_HASH_WORKERS or os.cpu_count() or 1)
+
+
+class UserImportService:
+    """ユーザーの一括登録を行うサービス"""
+
+    def __init__(self, db: AsyncSession):
+        self.db = db
+        self.chunk_size = settings.USER_IMPORT_CHUNK_SIZE
+
+    async def import_stream(self, stream: IO[bytes], fmt: str) -> UserImportReport:
+        """
+        CSV / NDJSON のストリームからユーザーを一括登録
+
+        チャンクごとに「検証 → 既存メールアドレスの一括照合 → パスワードの並列ハッシュ化 → 複数行INSERT」を行う。
+        入力の読み込みとパースはスレッドで行い、bcrypt はログイン用のワーカープールとは別のプロセスプール
+        (import_hash_pool) で実行するため、イベントループとログインを妨げない。
+
+        Args:
+            stream: 入力 (バイナリ)
+            fmt: "csv" または "ndjson"
+
+        Returns:
+            取り込み結果
+        """
+        if fmt not in SUPPORTED_FORMATS:
+            raise ValueError(f"Unsupported import format: {fmt}")
+
+        report = UserImportReport()
+        seen: Set[str] = set()
+        started = time.perf_counter()
+        rows = iter_rows(stream, fmt)
+        pool = import_hash_pool.get()
+        while True:
+            chunk = await asyncio.to_thread(lambda: list(islice(rows, self.chunk_size)))
+            if not chunk:
+                break
+            await self._import_chunk(chunk, seen, pool, report)
+
+        report.elapsed_seconds = time.perf_counter() - started
+        report.rows_per_second = report.total / report.elapsed_seconds if report.elapsed_seconds else 0.0
+        return report
+
+    async def _import_chunk(self, chunk: List[Tuple[int, Any]], seen: Set[str], pool: ProcessPoolExecutor, report: UserImportReport) -> None:
+        candidates: List[Tuple[int, UserCreate]] = []
+        for line_no, raw in chunk:
+            report.total += 1
+            if isinstance(raw, Exception):
+                self._add_error(report, line_no, None, f"invalid JSON: {raw}")
+                continue
+            try:
+                user_in = UserCreate(**raw)
+            except (ValidationError, TypeError) as e:
+                email = raw.get("email") if isinstance(raw, dict) else None
+                self._add_error(report, line_no, email, str(e).replace("\n", " "))
+                continue
+            if user_in.email in seen:
+                report.duplicates += 1
+                continue
+            seen.add(user_in.email)
+            candidates.append((line_no, user_in))
+
+        if not candidates:
+            return
+
+        # 既存ユーザーとの重複はチャンクごとに1クエリで照合する
+        emails = [user_in.email for _, user_in in candidates]
+        result = await self.db.execute(select(User.email).where(User.email.in_(emails)))
+        existing = set(result.scalars().all())
+        report.duplicates += len(existing)
+        candidates = [(line_no, user_in) for line_no, user_in in candidates if user_in.email not in existing]
+        if not candidates:
+            return
+
+        loop = asyncio.get_running_loop()
+        hashed = await asyncio.gather(*(loop.run_in_executor(pool, get_password_hash, user_in.password) for _, user_in in candidates))
+
+        values: List[Dict[str, Any]] = [
+            {"email": user_in.email, "name": user_in.name, "hashed_password": hashed_password, "is_active": user_in.is_active}
+            for (_, user_in), hashed_password in zip(candidates, hashed)
+        ]
+        # 同時登録やユーザー名の重複による衝突はスキップし、挿入できた行だけを返す
+        statement = pg_insert(User).values(values).on_conflict_do_nothing().returning(User.email)
+        result = await self.db.execute(statement)
+        inserted = set(result.scalars().all())
+        await self.db.commit()
+
+        report.inserted += len(inserted)
+        for line_no, user_in in candidates:
+            if user_in.email not in inserted:
+                self._add_error(report, line_no, user_in.email, "conflicts with an existing user (email or name)")
+
+    @staticmethod
+    def _add_error(report: UserImportReport, line_no: int, email: Optional[str], detail: str) -> None:
+        report.failed += 1
+        if len(report.errors) < settings.USER_IMPORT_MAX_ERRORS:
+            report.errors.append(UserImportError(row=line_no, email=email, detail=detail))
@@ -1,26 +1,100 @@
+import base64
+import json
 from datetime import datetime
-from typing import Any, Dict, Optional, Union
+from typing import Any, Dict, List, Optional, Tuple, Union
 
-from sqlalchemy.orm import Session
+from sqlalchemy import Select, bindparam, func, insert, or_, select, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
 
-from app.core.security import get_password_hash, verify_password
+from app.core.hashing import password_hasher
+from app.db.session import reads_from_replica, use_primary
 from app.models.user import User
 from app.schemas.user import UserCreate, UserOAuthCreate, UserUpdate
+from app.services.last_login_buffer import last_login_buffer
+
+SEARCH_MATCH_MODES = ("prefix", "fuzzy")
+
+# 更新を受け付けるカラム (プロパティなどマッピングされていない属性は無視する)
+USER_COLUMNS = frozenset(User.__table__.columns.keys())
+
+# よく使う読み取りは、値をバインドパラメータにした文を一度だけ組み立てて使い回す
+# (呼び出しごとの文の組み立てを省き、キャッシュキーが常に同じになるためコンパイル済みの SQL が再利用される)
+SELECT_BY_EMAIL = select(User).where(User.email == bindparam("email"))
+SELECT_BY_OAUTH_ID = select(User).where(User.oauth_provider == bindparam("provider"), User.oauth_id == bindparam("oauth_id"))
+
+
+def encode_cursor(user: User) -> str:
+    """一覧の最終行から次ページのカーソルを作成"""
+    payload = json.dumps([user.created_date.isoformat(), user.id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """
+    カーソルを (created_date, id) に復元
+
+    Raises:
+        ValueError: 不正なカーソルの場合
+    """
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_date, user_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_date), int(user_id)
+    except (TypeError, ValueError) as e:
+        raise ValueError(f"Invalid cursor: {cursor}") from e
 
 
 class UserService:
     """ユーザー関連のビジネスロジックを処理するサービス"""
 
-    def __init__(self, db: Session):
+    def __init__(self, db: AsyncSession):
         self.db = db
 
-    def get(self, user_id: int) -> Optional[User]:
+    async def get(self, user_id: int) -> Optional[User]:
         """
         IDでユーザーを取得
+
+        レプリカで見つからない場合は、作成直後でまだ反映されていない可能性があるためプライマリで確認する
+        """
+        user = await self.db.get(User, user_id)
+        if user is None and reads_from_replica(self.db):
+            use_primary(self.db)
+            user = await self.db.get(User, user_id)
+        return user
+
+    async def _insert(self, values: Dict[str, Any]) -> User:
         """
-        return self.db.query(User).filter(User.id == user_id).first()
+        INSERT ... RETURNING で作成してコミットする
 
-    def update(self, db_obj: User, obj_in: Union[UserUpdate, Dict[str, Any]]) -> User:
+        DB 側で決まる値 (ID・作成日時など) も同じ往復で読み込むため、コミット後に再取得しない
+        """
+        result = await self.db.execute(insert(User).values(**values).returning(User))
+        db_obj = result.scalar_one()
+        await self.db.commit()
+        return db_obj
+
+    async def _update(self, db_obj: User, values: Dict[str, Any]) -> User:
+        """
+        UPDATE ... RETURNING で更新してコミットする
+
+        更新日時など DB 側で決まる値も同じ往復で db_obj (セッション上の同じオブジェクト) に反映する
+        """
+        if not values:
+            return db_obj
+        statement = (
+            update(User)
+            .where(User.id == db_obj.id)
+            .values(**values)
+            .returning(User)
+            .execution_options(synchronize_session=False, populate_existing=True)
+        )
+        result = await self.db.execute(statement)
+        db_obj = result.scalar_one()
+        await self.db.commit()
+        return db_obj
+
+    async def update(self, db_obj: User, obj_in: Union[UserUpdate, Dict[str, Any]]) -> User:
         """
         ユーザー情報を更新
         """
@@ -30,82 +104,116 @@ class UserService:
             update_data = obj_in.dict(exclude_unset=True)
 
         if update_data.get("password"):
-            hashed_password = get_password_hash(update_data["password"])
+            hashed_password = await password_hasher.hash(update_data["password"])
             del update_data["password"]
             update_data["hashed_password"] = hashed_password
 
-        for field in update_data:
-            if hasattr(db_obj, field):
-                setattr(db_obj, field, update_data[field])
-
-        self.db.add(db_obj)
-        self.db.commit()
-        self.db.refresh(db_obj)
-        return db_obj
+        return await self._update(db_obj, {field: value for field, value in update_data.items() if field in USER_COLUMNS})
 
-    def get_by_email(self, email: str) -> Optional[User]:
+    async def get_by_email(self, email: str) -> Optional[User]:
         """メールアドレスでユーザーを取得"""
-        return self.db.query(User).filter(User.email == email).first()
+        result = await self.db.execute(SELECT_BY_EMAIL, {"email": email})
+        return result.scalars().first()
 
-    def get_by_oauth_id(self, provider: str, oauth_id: str) -> Optional[User]:
+    async def get_by_oauth_id(self, provider: str, oauth_id: str) -> Optional[User]:
         """OAuth IDでユーザーを取得"""
-        return self.db.query(User).filter(User.oauth_provider == provider, User.oauth_id == oauth_id).first()
+        result = await self.db.execute(SELECT_BY_OAUTH_ID, {"provider": provider, "oauth_id": oauth_id})
+        return result.scalars().first()
+
+    @staticmethod
+    def build_search_statement(
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None,
+        q: Optional[str] = None,
+        match: str = "prefix",
+    ) -> Select:
+        """
+        管理者向けユーザー一覧のクエリを生成
 
-    def create(self, obj_in: UserCreate) -> User:
+        (created_date, id) の降順でキーセットページネーションを行う。
+        検索は lower(email / name / github_username) に対して行い、
+        前方一致は text_pattern_ops、あいまい検索は pg_trgm の GIN インデックスを使う。
+
+        Args:
+            limit: 取得件数
+            after: 前ページ最後の (created_date, id)
+            q: 検索文字列
+            match: "prefix" (前方一致) / "fuzzy" (部分一致 + 類似度)
+        """
+        statement = select(User)
+        if after is not None:
+            statement = statement.where(tuple_(User.created_date, User.id) < tuple_(*after))
+        if q:
+            term = q.lower()
+            columns = [func.lower(User.email), func.lower(User.name), func.lower(User.github_username)]
+            escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+            if match == "fuzzy":
+                conditions = [column.like(f"%{escaped}%", escape="\\") for column in columns]
+                conditions += [column.op("%")(term) for column in columns]
+            else:
+                conditions = [column.like(f"{escaped}%", escape="\\") for column in columns]
+            statement = statement.where(or_(*conditions))
+        return statement.order_by(User.created_date.desc(), User.id.desc()).limit(limit)
+
+    async def search(
+        self,
+        limit: int,
+        after: Optional[Tuple[datetime, int]] = None,
+        q: Optional[str] = None,
+        match: str = "prefix",
+    ) -> List[User]:
+        """管理者向けにユーザーを一覧・検索"""
+        result = await self.db.execute(self.build_search_statement(limit=limit, after=after, q=q, match=match))
+        return list(result.scalars().all())
+
+    async def create(self, obj_in: UserCreate) -> User:
         """パスワード認証ユーザーを作成"""
-        db_obj = User(
-            email=obj_in.email,
-            name=obj_in.name,
-            hashed_password=get_password_hash(obj_in.password),
-            is_active=True,
+        return await self._insert(
+            {
+                "email": obj_in.email,
+                "name": obj_in.name,
+                "hashed_password": await password_hasher.hash(obj_in.password),
+                "is_active": True,
+            }
         )
-        self.db.add(db_obj)
-        self.db.commit()
-        self.db.refresh(db_obj)
-        return db_obj
 
-    def create_oauth_user(self, obj_in: UserOAuthCreate) -> User:
+    async def create_oauth_user(self, obj_in: UserOAuthCreate) -> User:
         """OAuthユーザーを作成"""
-        db_obj = User(
-            email=obj_in.email,
-            name=obj_in.name,
-            oauth_provider=obj_in.oauth_provider,
-            oauth_id=obj_in.oauth_id,
-            github_username=obj_in.github_username,
-            github_avatar_url=obj_in.github_avatar_url,
-            is_active=True,
+        return await self._insert(
+            {
+                "email": obj_in.email,
+                "name": obj_in.name,
+                "oauth_provider": obj_in.oauth_provider,
+                "oauth_id": obj_in.oauth_id,
+                "github_username": obj_in.github_username,
+                "github_avatar_url": obj_in.github_avatar_url,
+                "is_active": True,
+            }
         )
-        self.db.add(db_obj)
-        self.db.commit()
-        self.db.refresh(db_obj)
-        return db_obj
 
-    def authenticate(self, email: str, password: str) -> Optional[User]:
+    async def authenticate(self, email: str, password: str) -> Optional[User]:
         """パスワード認証"""
-        user = self.get_by_email(email=email)
+        user = await self.get_by_email(email=email)
         if not user:
             return None
         if not user.hashed_password:
             return None
-        if not verify_password(password, user.hashed_password):
+        if not await password_hasher.verify(password, user.hashed_password):
             return None
         return user
 
-    def update_login_time(self, user: User) -> User:
-        """最終ログイン日時を更新"""
-        from datetime import datetime
+    async def update_login_time(self, user: User) -> User:
+        """
+        最終ログイン日時を更新
 
-        user.last_login = datetime.utcnow()
-        self.db.add(user)
-        self.db.commit()
-        self.db.refresh(user)
+        DBへの書き込みは last_login_buffer がまとめて行うため、ここではコミットしない
+        """
+        logged_in_at = datetime.utcnow()
+        last_login_buffer.record(user.id, logged_in_at)
+        # 返却値には反映しつつ、セッション上は変更扱いにしない
+        set_committed_value(user, "last_login", logged_in_at)
         return user
 
-    def update_refresh_token(self, user: User, token: Optional[str], expires: Optional[datetime]) -> User:
+    async def update_refresh_token(self, user: User, token: Optional[str], expires: Optional[datetime]) -> User:
         """リフレッシュトークンを更新"""
-        user.refresh_token = token
-        user.token_expires = expires
-        self.db.add(user)
-        self.db.commit()
-        self.db.refresh(user)
-        return user
+        return await self._update(user, {"refresh_token": token, "token_expires": expires})
@@ -0,0 +1,131 @@
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass, field
+from typing import Dict, Generic, Hashable, Optional, TypeVar
+
+from app.core.metrics import Counter, Gauge, Histogram
+
+logger = logging.getLogger(__name__)
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+@dataclass
+class WriteBehindMetrics:
+    """バッファごとのメトリクス (labels は各メトリクスに付けるラベル)"""
+
+    flush_duration: Histogram
+    flushed: Counter
+    errors: Counter
+    pending: Gauge
+    labels: Dict[str, str] = field(default_factory=dict)
+
+
+class WriteBehindBuffer(ABC, Generic[K, V]):
+    """
+    書き込みをまとめて反映するバッファ (write-behind) の共通処理
+
+    書き込みのたびに DB へ反映する代わりに、キーごとの値をメモリに保持し (同じキーは _merge でまとめる)、
+    一定間隔 (最大遅延) または件数上限に達した時点で _write で一括して反映する。
+    反映に失敗した分は次回に持ち越す。サブクラスは record と _write (必要なら _merge) を実装する。
+    """
+
+    def __init__(self, name: str, flush_interval: float, max_pending: int, metrics: WriteBehindMetrics):
+        self.name = name
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.metrics = metrics
+        self._pending: Dict[K, V] = {}
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._flush_lock: Optional[asyncio.Lock] = None
+
+    def _merge(self, current: V, value: V) -> V:
+        """同じキーに記録済みの値 current と、より新しい値 value をまとめる (既定は新しい値で置き換える)"""
+        return value
+
+    @abstractmethod
+    async def _write(self, batch: Dict[K, V]) -> None:
+        """まとめた値を反映 (失敗した場合は例外を送出し、batch は次回に持ち越される)"""
+
+    async def _prepare(self) -> None:
+        """定期フラッシュの開始前にバックグラウンドで行う処理 (インデックスの作成など)"""
+
+    def _put(self, key: K, value: V) -> None:
+        current = self._pending.get(key)
+        self._pending[key] = value if current is None else self._merge(current, value)
+        self.metrics.pending.set(len(self._pending), **self.metrics.labels)
+        if len(self._pending) >= self.max_pending and self._wakeup is not None:
+            self._wakeup.set()
+
+    def get(self, key: K) -> Optional[V]:
+        """未反映の値 (反映中・反映済みの場合は None)"""
+        return self._pending.get(key)
+
+    async def start(self) -> None:
+        """定期フラッシュを開始"""
+        if self._task is not None:
+            return
+        self._wakeup = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = asyncio.create_task(self._run(), name=f"{self.name}-flush")
+
+    async def stop(self) -> None:
+        """定期フラッシュを停止し、残りを反映 (失敗した場合は例外を送出する)"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.flush()
+
+    async def _run(self) -> None:
+        try:
+            await self._prepare()
+        except Exception as e:
+            logger.warning(f"Failed to prepare {self.name} buffer: {str(e) or e.__class__.__name__}")
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Failed to flush {self.name} buffer: {str(e)}")
+
+    async def flush(self) -> int:
+        """
+        バッファの内容を反映
+
+        Returns:
+            反映した件数
+        """
+        if self._flush_lock is None:
+            self._flush_lock = asyncio.Lock()
+        async with self._flush_lock:
+            batch, self._pending = self._pending, {}
+            self.metrics.pending.set(0, **self.metrics.labels)
+            if not batch:
+                return 0
+            started = time.perf_counter()
+            try:
+                await self._write(batch)
+            except Exception:
+                self.metrics.errors.inc(**self.metrics.labels)
+                # 失敗分は次回に持ち越す (その間に記録された値とまとめる)
+                for key, value in batch.items():
+                    current = self._pending.get(key)
+                    self._pending[key] = value if current is None else self._merge(value, current)
+                self.metrics.pending.set(len(self._pending), **self.metrics.labels)
+                raise
+            finally:
+                self.metrics.flush_duration.observe(time.perf_counter() - started, **self.metrics.labels)
+            self.metrics.flushed.inc(len(batch), **self.metrics.labels)
+            return len(batch)
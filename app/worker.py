@@ -0,0 +1,188 @@
+"""
+チャットジョブのワーカーの起動エントリポイント
+
+    python -m app.worker
+
+API (POST /chat/jobs) が Redis Streams に追加したジョブをコンシューマーグループで読み出し、ChatService で
+処理して結果を書き込む。API の pod とは別の Deployment として起動し、キューの長さに応じて独立にスケールさせる。
+各ジョブは結果を書き込んでから ACK するため、処理中にワーカーが落ちた場合や LLM・MongoDB の呼び出しに失敗した場合は
+WORKER_CLAIM_IDLE 秒後に他のワーカーが引き取って再実行する (最大 WORKER_MAX_ATTEMPTS 回)。
+SIGTERM を受けると新しいジョブの読み出しを止め、実行中のジョブを WORKER_SHUTDOWN_TIMEOUT 秒まで待つ。
+メトリクス (キューの長さ・処理件数) と probe 用の /livez・/readyz は METRICS_PORT で公開する。
+"""
+import asyncio
+import importlib.util
+import logging
+import os
+import signal
+import socket
+import time
+from typing import Dict, Optional
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.metrics import registry
+from app.core.resources import resources
+from app.services.chat_job_queue import ChatJobQueue, chat_job_queue
+
+logger = logging.getLogger(__name__)
+
+jobs_processed = registry.counter("chat_jobs_processed_total", "ワーカーが処理したチャットジョブ数", ["outcome"])
+jobs_reclaimed = registry.counter("chat_jobs_reclaimed_total", "他のワーカーから引き取ったチャットジョブ数")
+jobs_backlog = registry.gauge("chat_jobs_backlog", "未完了のチャットジョブ数 (queued: 待機中, running: 処理中)", ["state"])
+jobs_inflight = registry.gauge("chat_jobs_inflight", "このワーカーで処理中のチャットジョブ数")
+job_duration = registry.histogram(
+    "chat_job_duration_seconds",
+    "チャットジョブの処理時間",
+    buckets=(0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0),
+)
+
+# Redis に接続できない場合に読み出しを再試行するまでの時間 (秒)
+ERROR_BACKOFF = 1.0
+# キューの長さを確認する間隔 (秒)
+BACKLOG_INTERVAL = 5.0
+
+
+class ChatWorker:
+    """
+    チャットジョブを同時に最大 concurrency 件まで処理するワーカー
+
+    空きがある分だけストリームから読み出し、定期的に応答の無いワーカーのジョブを引き取る。
+    処理中のジョブは heartbeat でアイドル時間をリセットし、長い生成の途中で引き取られないようにする。
+    """
+
+    def __init__(self, queue: ChatJobQueue, concurrency: int, consumer: Optional[str] = None):
+        self.queue = queue
+        self.concurrency = concurrency
+        self.consumer = consumer or f"{socket.gethostname()}-{os.getpid()}"
+        self.claim_idle = settings.WORKER_CLAIM_IDLE
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._stopping = asyncio.Event()
+
+    def stop(self) -> None:
+        """新しいジョブの読み出しを止める"""
+        self._stopping.set()
+
+    async def run(self) -> None:
+        await self.queue.ensure_group()
+        logger.info(f"Chat worker {self.consumer} is consuming {self.queue.stream} (concurrency: {self.concurrency})")
+        heartbeat = asyncio.create_task(self._heartbeat(), name="chat-worker-heartbeat")
+        backlog = asyncio.create_task(self._observe_backlog(), name="chat-worker-backlog")
+        next_claim = 0.0
+        try:
+            while not self._stopping.is_set():
+                free = self.concurrency - len(self._inflight)
+                if free <= 0:
+                    await self._wait_for_slot()
+                    continue
+                try:
+                    if time.monotonic() >= next_claim:
+                        next_claim = time.monotonic() + self.claim_idle / 2
+                        entries = await self.queue.claim_stale(self.consumer, self.claim_idle, free, settings.WORKER_MAX_ATTEMPTS)
+                        jobs_reclaimed.inc(len(entries))
+                    else:
+                        entries = await self.queue.read(self.consumer, free, settings.WORKER_BLOCK_TIMEOUT)
+                except (RedisError, OSError, asyncio.TimeoutError) as e:
+                    logger.warning(f"Failed to read chat jobs: {str(e) or e.__class__.__name__}")
+                    await asyncio.sleep(ERROR_BACKOFF)
+                    continue
+                for message_id, fields in entries:
+                    if message_id in self._inflight:
+                        continue
+                    self._inflight[message_id] = asyncio.create_task(self._process(message_id, fields))
+                jobs_inflight.set(len(self._inflight))
+        finally:
+            heartbeat.cancel()
+            backlog.cancel()
+            await self._drain()
+
+    async def _wait_for_slot(self) -> None:
+        stopping = asyncio.create_task(self._stopping.wait())
+        await asyncio.wait([stopping, *self._inflight.values()], return_when=asyncio.FIRST_COMPLETED)
+        stopping.cancel()
+
+    async def _drain(self) -> None:
+        if not self._inflight:
+            return
+        logger.info(f"Waiting for {len(self._inflight)} chat job(s) to finish")
+        _, pending = await asyncio.wait(list(self._inflight.values()), timeout=settings.WORKER_SHUTDOWN_TIMEOUT)
+        for task in pending:
+            # ACK していないため、他のワーカーが WORKER_CLAIM_IDLE 秒後に引き取る
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+
+    async def _heartbeat(self) -> None:
+        while True:
+            await asyncio.sleep(self.claim_idle / 3)
+            try:
+                await self.queue.heartbeat(self.consumer, list(self._inflight))
+            except Exception as e:
+                logger.warning(f"Failed to refresh chat job leases: {str(e) or e.__class__.__name__}")
+
+    async def _observe_backlog(self) -> None:
+        # 全ワーカーで同じ値になるため、スケールの判定には max などで1つにまとめて使う
+        while True:
+            try:
+                queued, running = await self.queue.backlog()
+                jobs_backlog.set(queued, state="queued")
+                jobs_backlog.set(running, state="running")
+            except Exception as e:
+                logger.warning(f"Failed to read the chat job backlog: {str(e) or e.__class__.__name__}")
+            await asyncio.sleep(BACKLOG_INTERVAL)
+
+    async def _process(self, message_id: str, fields: Dict[str, str]) -> None:
+        from app.repositories.chat_history_repository import ChatHistoryRepository
+        from app.services.chat_service import ChatService
+
+        started = time.perf_counter()
+        try:
+            chat_input = await self.queue.start(message_id, fields)
+            if chat_input is None:
+                jobs_processed.inc(outcome="skipped")
+                return
+            chat_service = ChatService(
+                resources.get_llm_client(),
+                ChatHistoryRepository(resources.get_mongo_client()[settings.MONGODB_DB_NAME]),
+            )
+            # 失敗は例外で受け取り、ACK せずに再実行させる (エラーの文言を結果として保存しない)。
+            # 引き取られて再実行された場合も、ジョブIDで履歴への二重の追加を防ぐ
+            output = await chat_service.process(chat_input, int(fields["user_id"]), turn_id=fields["job_id"])
+            await self.queue.complete(message_id, fields, output)
+            jobs_processed.inc(outcome="succeeded")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            # ACK せずに残し、heartbeat が止まった後で (このワーカーを含む) いずれかのワーカーが再実行する
+            jobs_processed.inc(outcome="error")
+            logger.error(f"Failed to process chat job {fields.get('job_id')}: {str(e)}")
+        finally:
+            job_duration.observe(time.perf_counter() - started)
+            self._inflight.pop(message_id, None)
+            jobs_inflight.set(len(self._inflight))
+
+
+async def serve() -> None:
+    await resources.startup()
+    worker = ChatWorker(chat_job_queue, settings.WORKER_CONCURRENCY)
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGTERM, signal.SIGINT):
+        loop.add_signal_handler(signum, worker.stop)
+    try:
+        await worker.run()
+    finally:
+        await resources.shutdown()
+
+
+def main() -> None:
+    logging.basicConfig(level=settings.SERVER_LOG_LEVEL.upper())
+    if importlib.util.find_spec("uvloop") is not None:
+        import uvloop
+
+        uvloop.run(serve())
+    else:
+        asyncio.run(serve())
+
+
+if __name__ == "__main__":
+    main()
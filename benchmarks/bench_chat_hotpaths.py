@@ -0,0 +1,189 @@
+"""
+チャット1往復のうち CPU を使う処理のマイクロベンチマーク
+
+履歴の件数 (既定: 10 / 100 / 1,000 / 10,000) ごとに以下を計測し、1回あたりの時間を表示する。
+
+- chain_get_prompt:    ChatChain.get_prompt (履歴の整形とプロンプトの組み立て)
+- chain_invoke:        ChatChain.invoke (LLM はスタンドインに差し替え、呼び出しのオーバーヘッドのみ)
+- history_convert:     ChatHistoryRepository.get_history (Mongo のドキュメント → ChatMessage への変換)
+- chat_input_validate: 履歴付きリクエストボディの ChatInput への検証
+- memory_search:       長期記憶の VectorIndex.search (履歴と同じ件数のベクトルから上位5件, クエリの埋め込みは含めない)
+- jwt_current_user:    get_current_user での JWT のデコードとペイロードの検証 (履歴件数に依存しない)
+
+benchmarks/chat_hotpaths_baseline.json の基準値と比較し、許容範囲 (tolerance) を超えて遅くなった
+ケースがあれば終了コード 1 を返す。基準値は計測環境に依存するため、CI など同じ環境で --update して更新する。
+
+    python -m benchmarks.bench_chat_hotpaths
+    python -m benchmarks.bench_chat_hotpaths --sizes 10 1000 --filter chain_
+    python -m benchmarks.bench_chat_hotpaths --update
+"""
+import argparse
+import asyncio
+import gc
+import json
+import os
+import sys
+import time
+from datetime import timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+# 設定の読み込みに必須の値 (実際の接続は行わない)
+os.environ.setdefault("GOOGLE_API_KEY", "chat-hotpaths-benchmark")
+os.environ.setdefault("MINIO_ENDPOINT_URL", "http://localhost:9000")
+
+from app.api.deps import get_current_user  # noqa: E402
+from app.core.llm.chain.chatchain import ChatChain  # noqa: E402
+from app.core.llm.memory.embedders import HashingEmbedder  # noqa: E402
+from app.core.llm.memory.vector_index import VectorIndex  # noqa: E402
+from app.core.security import create_access_token  # noqa: E402
+from app.repositories.chat_history_repository import ChatHistoryRepository  # noqa: E402
+from app.schemas.chat import ChatInput  # noqa: E402
+from benchmarks.standins.fake_llm import FakeLLMClient  # noqa: E402
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "chat_hotpaths_baseline.json"
+DEFAULT_SIZES = (10, 100, 1000, 10000)
+MESSAGE_TEXT = "ソファを窓際に置くと部屋が広く見えますか？ 北向きの部屋なので明るさも気になります。"
+
+
+class _StaticCollection:
+    """常に同じドキュメントを返すコレクション (変換処理のみを計測するため I/O を含めない)"""
+
+    def __init__(self, document: Dict[str, Any]):
+        self.document = document
+
+    async def find_one(self, query: Dict[str, Any]) -> Dict[str, Any]:
+        return self.document
+
+
+class _StaticDatabase:
+    def __init__(self, document: Dict[str, Any]):
+        self.talks = _StaticCollection(document)
+
+
+class _UserService:
+    """get_current_user が使う get() のみを持つスタブ (DB アクセスを含めない)"""
+
+    class _User:
+        is_active = True
+
+    async def get(self, user_id: Any) -> Any:
+        return self._User()
+
+
+def history_messages(size: int) -> List[Dict[str, str]]:
+    return [{"role": "user" if i % 2 == 0 else "assistant", "content": MESSAGE_TEXT} for i in range(size)]
+
+
+def build_cases(sizes: List[int]) -> Dict[str, Callable[[], Any]]:
+    """ケース名 → 1回分の処理 (同期関数) を返す"""
+    chain = ChatChain(FakeLLMClient(latency_ms=0, jitter_ms=0).get_chat_model())
+    loop = asyncio.new_event_loop()
+    cases: Dict[str, Callable[[], Any]] = {}
+
+    embedder = HashingEmbedder(512)
+    query = loop.run_until_complete(embedder.aembed([MESSAGE_TEXT]))[0]
+
+    for size in sizes:
+        messages = history_messages(size)
+        body = {"role": "user", "response": MESSAGE_TEXT, "history": messages, "chat_id": "bench"}
+        chat_input = ChatInput.model_validate(body)
+        repository = ChatHistoryRepository(
+            _StaticDatabase({"chatId": "bench", "messages": [{"role": m["role"], "text": m["content"]} for m in messages]})
+        )
+
+        cases[f"chain_get_prompt[{size}]"] = lambda chat_input=chat_input: chain.get_prompt(chat_input)
+        cases[f"chain_invoke[{size}]"] = lambda chat_input=chat_input: chain.invoke(chat_input)
+        cases[f"history_convert[{size}]"] = lambda repository=repository: loop.run_until_complete(repository.get_history("bench"))
+        cases[f"chat_input_validate[{size}]"] = lambda body=body: ChatInput.model_validate(body)
+
+        index = VectorIndex(embedder.dim)
+        for i, vector in enumerate(loop.run_until_complete(embedder.aembed([f"{MESSAGE_TEXT} {i}" for i in range(size)]))):
+            index.add(vector, i)
+        cases[f"memory_search[{size}]"] = lambda index=index: index.search(query, 5)
+
+    token = create_access_token(1, expires_delta=timedelta(minutes=30))
+    user_service = _UserService()
+    cases["jwt_current_user"] = lambda: loop.run_until_complete(get_current_user(user_service=user_service, token=token))
+    return cases
+
+
+def measure(fn: Callable[[], Any], min_time: float, repeat: int) -> float:
+    """1回あたりの時間 (マイクロ秒) を返す。繰り返し回数は min_time 秒以上になるよう調整し、最小値を採用する"""
+    fn()
+    number = 1
+    while True:
+        started = time.perf_counter()
+        for _ in range(number):
+            fn()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_time / 10:
+            break
+        number *= 10
+    number = max(1, int(number * min_time / elapsed))
+
+    best = float("inf")
+    # timeit と同様に、計測中は GC を止めて大きな履歴でのばらつきを抑える
+    gc.disable()
+    try:
+        for _ in range(repeat):
+            started = time.perf_counter()
+            for _ in range(number):
+                fn()
+            best = min(best, (time.perf_counter() - started) / number)
+    finally:
+        gc.enable()
+        gc.collect()
+    return best * 1e6
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=list(DEFAULT_SIZES), help="履歴の件数")
+    parser.add_argument("--filter", default="", help="ケース名にこの文字列を含むものだけ実行する")
+    parser.add_argument("--min-time", type=float, default=0.2, help="1回の計測で処理を繰り返す時間 (秒)")
+    parser.add_argument("--repeat", type=int, default=5, help="計測回数 (最小値を採用)")
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--tolerance", type=float, default=None, help="許容する増加率 (省略時は基準値ファイルの値)")
+    parser.add_argument("--update", action="store_true", help="計測結果で基準値を更新する")
+    parser.add_argument("--json", type=Path, default=None, help="計測結果を JSON で書き出す")
+    args = parser.parse_args()
+
+    baseline = json.loads(args.baseline.read_text()) if args.baseline.exists() else {"tolerance": 0.25, "results_us": {}}
+    tolerance = args.tolerance if args.tolerance is not None else baseline["tolerance"]
+
+    results: Dict[str, float] = {}
+    failures: List[str] = []
+    print(f"{'case':<30} {'us/op':>12} {'baseline':>12} {'change':>9}")
+    for name, fn in build_cases(args.sizes).items():
+        if args.filter not in name:
+            continue
+        results[name] = measure(fn, args.min_time, args.repeat)
+        expected: Optional[float] = baseline["results_us"].get(name)
+        if expected is None:
+            print(f"{name:<30} {results[name]:>12.2f} {'-':>12} {'-':>9}")
+            continue
+        change = results[name] / expected - 1
+        status = ""
+        if change > tolerance:
+            status = "  NG"
+            failures.append(name)
+        print(f"{name:<30} {results[name]:>12.2f} {expected:>12.2f} {change:>+9.1%}{status}")
+
+    if args.json:
+        args.json.write_text(json.dumps({"results_us": results}, indent=2) + "\n")
+
+    if args.update:
+        baseline["results_us"] = {**baseline["results_us"], **{name: round(us, 2) for name, us in results.items()}}
+        args.baseline.write_text(json.dumps(baseline, indent=2, ensure_ascii=False) + "\n")
+        print(f"\nupdated {args.baseline}")
+        return 0
+
+    if failures:
+        print(f"\n{len(failures)} case(s) regressed by more than {tolerance:.0%}: {', '.join(failures)}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
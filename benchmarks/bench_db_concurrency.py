@@ -0,0 +1,87 @@
+"""
+同期エンジン(スレッドプール経由)と非同期エンジン(asyncpg)の同時実行性能を比較するベンチマーク
+
+設定済みの PostgreSQL に対して、同じユーザー取得クエリを指定した並列度で実行し、
+スループットとレイテンシを表示する。同期側は FastAPI の sync エンドポイントと同じく
+AnyIO のデフォルトスレッドプール (40 スレッド) で実行される。
+
+    python -m benchmarks.bench_db_concurrency --concurrency 10 50 200 --requests 2000 --user-id 1
+"""
+import argparse
+import asyncio
+import time
+from typing import Awaitable, Callable, List
+
+import anyio.to_thread
+from sqlalchemy import func, select
+
+from app.db.session import AsyncSessionLocal, SessionLocal, async_engine, engine
+from app.models.user import User
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def build_statement(user_id: int, sleep_ms: float):
+    statement = select(User).where(User.id == user_id)
+    if sleep_ms:
+        # ネットワーク越しのDBを模すためにサーバー側で待機させる
+        statement = statement.where(func.pg_sleep(sleep_ms / 1000).is_not(None))
+    return statement
+
+
+def sync_lookup(user_id: int, sleep_ms: float) -> None:
+    with SessionLocal() as db:
+        db.execute(build_statement(user_id, sleep_ms)).scalars().first()
+
+
+async def sync_via_threadpool(user_id: int, sleep_ms: float) -> None:
+    await anyio.to_thread.run_sync(sync_lookup, user_id, sleep_ms)
+
+
+async def async_lookup(user_id: int, sleep_ms: float) -> None:
+    async with AsyncSessionLocal() as db:
+        (await db.execute(build_statement(user_id, sleep_ms))).scalars().first()
+
+
+async def run(name: str, func: Callable[[int, float], Awaitable[None]], concurrency: int, total: int, user_id: int, sleep_ms: float) -> None:
+    latencies: List[float] = []
+    remaining = total
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            await func(user_id, sleep_ms)
+            latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    print(
+        f"{name:<8} concurrency={concurrency:<5} rps={total / elapsed:9.1f} "
+        f"p50={percentile(latencies, 50) * 1000:8.2f}ms p99={percentile(latencies, 99) * 1000:8.2f}ms"
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    # 接続確立のコストを計測に含めないよう、先にプールを温めておく
+    await async_lookup(args.user_id, 0)
+    sync_lookup(args.user_id, 0)
+    for concurrency in args.concurrency:
+        await run("sync", sync_via_threadpool, concurrency, args.requests, args.user_id, args.sleep_ms)
+        await run("async", async_lookup, concurrency, args.requests, args.user_id, args.sleep_ms)
+    await async_engine.dispose()
+    engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 200])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--user-id", type=int, default=1)
+    parser.add_argument("--sleep-ms", type=float, default=0.0, help="クエリごとにサーバー側で待機する時間 (ミリ秒)")
+    asyncio.run(main(parser.parse_args()))
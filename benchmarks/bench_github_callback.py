@@ -0,0 +1,64 @@
+"""
+GitHub OAuth コールバックのレイテンシを計測するベンチマーク
+
+benchmarks/standins/fake_github.py を起動し、API サーバーを以下の設定で起動してから実行する。
+
+    GITHUB_OAUTH_BASE_URL=http://127.0.0.1:9100 GITHUB_API_BASE_URL=http://127.0.0.1:9100 uvicorn main:app
+    python benchmarks/bench_github_callback.py --base-url http://localhost:8000/api/v1 --requests 200 --concurrency 8
+
+スタンドインに遅延 L を注入した場合、プロフィールとメールアドレスを並行取得していれば
+コールバック1回あたりの外部呼び出し時間はおよそ 2L (直列なら 3L) になる。
+"""
+import argparse
+import asyncio
+import statistics
+import time
+import uuid
+from typing import List
+
+import httpx
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+async def main(args: argparse.Namespace) -> None:
+    latencies: List[float] = []
+    failures = 0
+    remaining = args.requests
+    # 同一ユーザーで繰り返すか (既存ユーザーのログイン)、毎回新規ユーザーにするか
+    codes = [args.code] if args.code else None
+
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=30, follow_redirects=False) as client:
+
+        async def worker():
+            nonlocal remaining, failures
+            while remaining > 0:
+                remaining -= 1
+                code = codes[0] if codes else uuid.uuid4().hex
+                started = time.perf_counter()
+                response = await client.get("/auth/github/callback", params={"code": code, "state": "bench"})
+                latencies.append(time.perf_counter() - started)
+                if response.status_code not in (302, 307):
+                    failures += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    print(
+        f"callbacks={len(latencies)} failures={failures} rps={len(latencies) / elapsed:.1f} "
+        f"mean={statistics.fmean(latencies) * 1000:.2f}ms p50={percentile(latencies, 50) * 1000:.2f}ms "
+        f"p99={percentile(latencies, 99) * 1000:.2f}ms"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000/api/v1")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--code", default=None, help="固定の認可コード (省略時は毎回新規ユーザー)")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,95 @@
+"""
+アプリケーションの import 時間 (コールドスタート) を計測し、予算を超えていないかを確認するベンチマーク
+
+`python -X importtime -c "import main"` を別プロセスで複数回実行し、モジュールごとの累積 import 時間の
+最小値を表示する。benchmarks/import_budget.json の予算と比較し、次のいずれかに該当すれば終了コード 1 を返す。
+
+- 予算を設定したモジュールの import 時間が予算を超えた
+- 起動時に読み込まないはずのモジュール (LangChain / Motor など) が import された
+
+予算の値は計測環境に依存するため、CIなど同じ環境で計測した値を元に --update で更新する。
+
+    python benchmarks/bench_import_time.py --runs 5
+    python benchmarks/bench_import_time.py --update --headroom 1.5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent
+DEFAULT_BUDGET = Path(__file__).resolve().parent / "import_budget.json"
+
+
+def measure(module: str) -> Dict[str, int]:
+    """1回分の import を計測し、モジュール名 → 累積時間 (マイクロ秒) を返す"""
+    env = dict(os.environ)
+    # 設定の読み込みに必須の値 (実際の接続は行わない)
+    env.setdefault("GOOGLE_API_KEY", "import-time-benchmark")
+    env.setdefault("MINIO_ENDPOINT_URL", "http://localhost:9000")
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+    )
+    if proc.returncode != 0:
+        raise RuntimeError(f"import {module} failed:\n{proc.stderr}")
+
+    timings: Dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:"):
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        if not cumulative.strip().isdigit():
+            continue  # ヘッダー行
+        timings[name.strip()] = int(cumulative)
+    return timings
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--module", default="main", help="計測対象のモジュール")
+    parser.add_argument("--runs", type=int, default=5, help="計測回数 (最小値を採用)")
+    parser.add_argument("--top", type=int, default=20, help="表示するモジュール数")
+    parser.add_argument("--budget", type=Path, default=DEFAULT_BUDGET)
+    parser.add_argument("--update", action="store_true", help="計測結果から予算を更新する")
+    parser.add_argument("--headroom", type=float, default=1.5, help="--update 時に計測値に掛ける係数")
+    args = parser.parse_args()
+
+    runs: List[Dict[str, int]] = [measure(args.module) for _ in range(args.runs)]
+    # ディスクキャッシュなどのばらつきを除くため、モジュールごとに最小値を採用する
+    best = {name: min(run[name] for run in runs if name in run) for name in runs[0]}
+
+    print(f"{'module':<60} {'cumulative ms':>14}")
+    for name, us in sorted(best.items(), key=lambda item: item[1], reverse=True)[: args.top]:
+        print(f"{name:<60} {us / 1000:>14.1f}")
+
+    budget = json.loads(args.budget.read_text()) if args.budget.exists() else {"modules_ms": {}, "forbidden": []}
+
+    if args.update:
+        names = list(budget["modules_ms"]) or [args.module]
+        budget["modules_ms"] = {name: round(best[name] / 1000 * args.headroom) for name in names if name in best}
+        args.budget.write_text(json.dumps(budget, indent=2, ensure_ascii=False) + "\n")
+        print(f"\nupdated {args.budget}")
+        return 0
+
+    print()
+    failures = []
+    for name, limit_ms in budget["modules_ms"].items():
+        actual_ms = best.get(name, 0) / 1000
+        print(f"{'OK' if actual_ms <= limit_ms else 'NG'} {name}: {actual_ms:.1f} ms (budget {limit_ms} ms)")
+        if actual_ms > limit_ms:
+            failures.append(name)
+    loaded = sorted(name for name in budget["forbidden"] if any(name in run for run in runs))
+    for name in loaded:
+        print(f"NG {name} is imported at startup (should be loaded lazily)")
+    return 1 if failures or loaded else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,108 @@
+"""
+ログイン集中時に認証以外のエンドポイントのレイテンシが維持されるかを計測するベンチマーク
+
+起動中のAPIサーバーに対して、まず /users/me のみを一定時間叩いてベースラインを取り、
+続けて /auth/login/password への大量リクエストを並行で流しながら同じ計測を行う。
+
+    python benchmarks/bench_login_flood.py --base-url http://localhost:8000/api/v1 \\
+        --email user@example.com --password secret --flood-concurrency 64 --duration 10
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from collections import Counter
+from typing import Dict, List
+
+import httpx
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return float("nan")
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def summarize(name: str, latencies: List[float], statuses: Counter) -> Dict[str, float]:
+    result = {
+        "count": len(latencies),
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "mean_ms": (statistics.fmean(latencies) * 1000) if latencies else float("nan"),
+    }
+    print(
+        f"{name:<24} n={result['count']:<6} p50={result['p50_ms']:8.2f}ms p95={result['p95_ms']:8.2f}ms "
+        f"p99={result['p99_ms']:8.2f}ms statuses={dict(statuses)}"
+    )
+    return result
+
+
+async def probe_loop(client: httpx.AsyncClient, token: str, stop_at: float, concurrency: int) -> tuple:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    headers = {"Authorization": f"Bearer {token}"}
+
+    async def worker():
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            response = await client.get("/users/me", headers=headers)
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses
+
+
+async def login_flood(client: httpx.AsyncClient, email: str, password: str, stop_at: float, concurrency: int) -> tuple:
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    form = {"username": email, "password": password}
+
+    async def worker():
+        while time.perf_counter() < stop_at:
+            started = time.perf_counter()
+            response = await client.post("/auth/login/password", data=form)
+            latencies.append(time.perf_counter() - started)
+            # 503 (Retry-After) を受けても待たずに叩き続け、最悪ケースのクライアントを模す
+            statuses[response.status_code] += 1
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return latencies, statuses
+
+
+async def main(args: argparse.Namespace) -> None:
+    limits = httpx.Limits(max_connections=args.flood_concurrency + args.probe_concurrency + 8)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        response = await client.post("/auth/login/password", data={"username": args.email, "password": args.password})
+        response.raise_for_status()
+        token = response.json()["access_token"]
+
+        print("== baseline (no login flood)")
+        stop_at = time.perf_counter() + args.duration
+        baseline = summarize("/users/me", *await probe_loop(client, token, stop_at, args.probe_concurrency))
+
+        print(f"== login flood (concurrency={args.flood_concurrency})")
+        stop_at = time.perf_counter() + args.duration
+        (probe, probe_statuses), (flood, flood_statuses) = await asyncio.gather(
+            probe_loop(client, token, stop_at, args.probe_concurrency),
+            login_flood(client, args.email, args.password, stop_at, args.flood_concurrency),
+        )
+        during = summarize("/users/me", probe, probe_statuses)
+        summarize("/auth/login/password", flood, flood_statuses)
+
+        ratio = during["p99_ms"] / baseline["p99_ms"] if baseline["p99_ms"] else float("nan")
+        print(f"/users/me p99 during flood / baseline = {ratio:.2f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000/api/v1")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--duration", type=float, default=10.0, help="各フェーズの計測時間 (秒)")
+    parser.add_argument("--flood-concurrency", type=int, default=64)
+    parser.add_argument("--probe-concurrency", type=int, default=4)
+    asyncio.run(main(parser.parse_args()))
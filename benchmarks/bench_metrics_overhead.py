@@ -0,0 +1,93 @@
+"""
+MetricsMiddleware のリクエストあたりのオーバーヘッドを計測するベンチマーク
+
+同じルートを持つ最小の FastAPI アプリをミドルウェアあり・なしで用意し、ネットワークを介さずに
+ASGI アプリを直接呼び出して 1 リクエストあたりの処理時間を比較する。
+あわせて Prometheus 形式への書き出しにかかる時間も表示する。
+
+    python -m benchmarks.bench_metrics_overhead --requests 20000
+"""
+import argparse
+import asyncio
+import statistics
+import time
+from typing import List
+
+from fastapi import FastAPI
+
+from app.core.metrics import registry
+from app.middleware.metrics import MetricsMiddleware
+
+
+def build_app(with_metrics: bool) -> FastAPI:
+    app = FastAPI()
+
+    @app.get("/items/{item_id}")
+    async def read_item(item_id: int):
+        return {"id": item_id}
+
+    if with_metrics:
+        app.add_middleware(MetricsMiddleware)
+    return app
+
+
+async def call(app: FastAPI, item_id: int) -> None:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": f"/items/{item_id}",
+        "raw_path": f"/items/{item_id}".encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [],
+        "client": ("127.0.0.1", 12345),
+        "server": ("testserver", 80),
+    }
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def run(app: FastAPI, requests: int) -> float:
+    # lifespan を経由しないため、ミドルウェアスタックは初回呼び出しで構築される
+    await call(app, 0)
+    started = time.perf_counter()
+    for i in range(requests):
+        await call(app, i)
+    return (time.perf_counter() - started) / requests
+
+
+async def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=5, help="計測の繰り返し回数 (中央値を採用)")
+    args = parser.parse_args()
+
+    baseline_app, metrics_app = build_app(False), build_app(True)
+    baseline: List[float] = []
+    instrumented: List[float] = []
+    for _ in range(args.repeat):
+        baseline.append(await run(baseline_app, args.requests))
+        instrumented.append(await run(metrics_app, args.requests))
+
+    base_us = statistics.median(baseline) * 1e6
+    metrics_us = statistics.median(instrumented) * 1e6
+    print(f"without middleware: {base_us:8.2f} us/request")
+    print(f"with middleware:    {metrics_us:8.2f} us/request")
+    print(f"overhead:           {metrics_us - base_us:8.2f} us/request ({(metrics_us / base_us - 1) * 100:.1f}%)")
+
+    started = time.perf_counter()
+    body = registry.render_prometheus()
+    print(f"render_prometheus:  {(time.perf_counter() - started) * 1000:8.2f} ms ({len(body.splitlines())} lines)")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
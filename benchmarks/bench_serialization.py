@@ -0,0 +1,84 @@
+"""
+JSONレスポンスのシリアライズ時間と転送サイズを比較するベンチマーク
+
+代表的なペイロード (ユーザー一覧・長いチャット応答・チャット履歴) について、
+Starlette 標準の JSONResponse と ORJSONResponse のシリアライズ時間、
+および無圧縮 / gzip / brotli の転送サイズと圧縮時間を表示する。
+
+    python -m benchmarks.bench_serialization --iterations 2000
+"""
+import argparse
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict
+
+from starlette.responses import JSONResponse
+
+from app.core.config import settings
+from app.core.responses import ORJSONResponse
+from app.middleware.compression import brotli
+from app.schemas.chat import ChatMessage, ChatOutput
+from app.schemas.user import User, UserPage
+
+
+def build_payloads() -> Dict[str, Any]:
+    now = datetime(2025, 6, 1)
+    users = [
+        User(
+            id=i,
+            name=f"user{i}",
+            email=f"user{i}@example.com",
+            is_active=True,
+            is_superuser=False,
+            github_username=f"gh-user{i}" if i % 2 else None,
+            created_date=now - timedelta(minutes=i),
+            updated_date=now,
+        )
+        for i in range(200)
+    ]
+    answer = "LangChain と Gemini を使ったチャットの応答です。" * 200
+    history = [ChatMessage(role="user" if i % 2 else "assistant", content=answer[:400]) for i in range(100)]
+    # response_model を経由した後と同じ形 (JSON互換の dict) にしておく
+    return {
+        "user_page": UserPage(items=users, next_cursor="eyJjdXJzb3IiOjF9").model_dump(mode="json"),
+        "chat_output": ChatOutput(role="assistant", response=answer).model_dump(mode="json"),
+        "chat_history": {"messages": [message.model_dump(mode="json") for message in history]},
+    }
+
+
+def timeit(fn: Callable[[], Any], iterations: int) -> float:
+    started = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - started) / iterations * 1e6
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    stdlib = JSONResponse.__new__(JSONResponse)
+    fast = ORJSONResponse.__new__(ORJSONResponse)
+
+    print(f"{'payload':<14} {'json us':>9} {'orjson us':>10} {'raw B':>8} {'gzip B':>8} {'gzip us':>8} {'br B':>8} {'br us':>8}")
+    for name, payload in build_payloads().items():
+        json_us = timeit(lambda: stdlib.render(payload), args.iterations)
+        orjson_us = timeit(lambda: fast.render(payload), args.iterations)
+        body = fast.render(payload)
+
+        gzip_body = zlib.compress(body, settings.COMPRESSION_GZIP_LEVEL)
+        gzip_us = timeit(lambda: zlib.compress(body, settings.COMPRESSION_GZIP_LEVEL), max(1, args.iterations // 10))
+        if brotli is not None:
+            br_size = str(len(brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY)))
+            br_us = f"{timeit(lambda: brotli.compress(body, quality=settings.COMPRESSION_BROTLI_QUALITY), max(1, args.iterations // 10)):.1f}"
+        else:
+            br_size = br_us = "n/a"
+        print(
+            f"{name:<14} {json_us:>9.1f} {orjson_us:>10.1f} {len(body):>8} {len(gzip_body):>8} {gzip_us:>8.1f} {br_size:>8} {br_us:>8}"
+        )
+
+
+if __name__ == "__main__":
+    main()
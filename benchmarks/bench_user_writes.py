@@ -0,0 +1,169 @@
+"""
+UserService の書き込み・検索1回あたりの SQL の往復回数とレイテンシを計測するベンチマーク
+
+設定済みの DB (DATABASE_URL / POSTGRES_*) に対して各操作を新しいセッション (= 1リクエスト) で繰り返し、
+操作ごとの SQL 文の実行回数・コミット回数とレイテンシを表示する。--legacy を付けると、比較用に
+add → commit → refresh (書き込み後に SELECT で再取得) と呼び出しごとの文の組み立てによる従来の実装も計測する。
+SQLite の場合はテーブルを作成してから計測する。--rtt-ms を指定すると、SQL 文とコミットのたびにその時間だけ待機し、
+ネットワーク越しの DB への往復を模擬する (往復回数の差がそのままレイテンシの差として現れる)。
+
+    DATABASE_URL=sqlite:///./bench.db python -m benchmarks.bench_user_writes --iterations 500 --legacy --rtt-ms 1
+    python -m benchmarks.bench_user_writes --iterations 2000
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+# 設定の読み込みに必須の値 (実際の接続は行わない)
+os.environ.setdefault("GOOGLE_API_KEY", "user-writes-benchmark")
+os.environ.setdefault("MINIO_ENDPOINT_URL", "http://localhost:9000")
+
+from sqlalchemy import event, select  # noqa: E402
+from sqlalchemy.ext.asyncio import AsyncSession  # noqa: E402
+
+from app.core.config import settings  # noqa: E402
+from app.db.session import AsyncSessionLocal, async_engine  # noqa: E402
+from app.models.user import User  # noqa: E402
+from app.schemas.user import UserOAuthCreate  # noqa: E402
+from app.services.user_service import UserService  # noqa: E402
+
+
+class LegacyUserService(UserService):
+    """比較用: 書き込み後に refresh で再取得し、検索のたびに文を組み立てる従来の実装"""
+
+    async def _save(self, db_obj: User) -> User:
+        self.db.add(db_obj)
+        await self.db.commit()
+        await self.db.refresh(db_obj)
+        return db_obj
+
+    async def _insert(self, values: Dict[str, Any]) -> User:
+        return await self._save(User(**values))
+
+    async def _update(self, db_obj: User, values: Dict[str, Any]) -> User:
+        for field, value in values.items():
+            setattr(db_obj, field, value)
+        return await self._save(db_obj)
+
+    async def get_by_email(self, email: str) -> Optional[User]:
+        result = await self.db.execute(select(User).where(User.email == email))
+        return result.scalars().first()
+
+    async def get_by_oauth_id(self, provider: str, oauth_id: str) -> Optional[User]:
+        result = await self.db.execute(select(User).where(User.oauth_provider == provider, User.oauth_id == oauth_id))
+        return result.scalars().first()
+
+
+class StatementCounter:
+    """エンジンで実行された SQL 文とコミットの回数"""
+
+    def __init__(self, rtt: float = 0.0) -> None:
+        self.statements = 0
+        self.commits = 0
+        self.rtt = rtt
+        sync_engine = async_engine.sync_engine
+        event.listen(sync_engine, "before_cursor_execute", self._on_execute)
+        event.listen(sync_engine, "commit", self._on_commit)
+
+    def _roundtrip(self) -> None:
+        # ドライバのスレッド (aiosqlite) または同期コンテキストで呼ばれるため、ブロッキングで待つ
+        if self.rtt:
+            time.sleep(self.rtt)
+
+    def _on_execute(self, *args: Any) -> None:
+        self.statements += 1
+        self._roundtrip()
+
+    def _on_commit(self, *args: Any) -> None:
+        self.commits += 1
+        self._roundtrip()
+
+    def reset(self) -> None:
+        self.statements = 0
+        self.commits = 0
+
+
+def percentile(values: List[float], q: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(q / 100 * (len(ordered) - 1))))]
+
+
+def oauth_user(tag: str) -> UserOAuthCreate:
+    key = f"bench-{tag}-{uuid.uuid4().hex[:12]}"
+    return UserOAuthCreate(
+        email=f"{key}@example.com",
+        name=key,
+        oauth_provider="bench",
+        oauth_id=key,
+        github_username=key,
+        github_avatar_url=None,
+    )
+
+
+# 操作名 → (サービス, セッション, 計測前に用意したユーザー) を受け取って1回分の操作を行う関数
+Operation = Callable[[UserService, AsyncSession, User], Awaitable[Any]]
+
+OPERATIONS: Dict[str, Operation] = {
+    "create_oauth_user": lambda service, db, user: service.create_oauth_user(oauth_user("create")),
+    "update": lambda service, db, user: service.update(user, {"bio": uuid.uuid4().hex}),
+    "update_refresh_token": lambda service, db, user: service.update_refresh_token(user, uuid.uuid4().hex, None),
+    "get_by_email": lambda service, db, user: service.get_by_email(user.email),
+    "get_by_oauth_id": lambda service, db, user: service.get_by_oauth_id(user.oauth_provider, user.oauth_id),
+}
+
+
+async def measure(service_class: type, name: str, operation: Operation, iterations: int, counter: StatementCounter) -> str:
+    async with AsyncSessionLocal() as db:
+        user = await UserService(db).create_oauth_user(oauth_user(name))
+    user_id = user.id
+
+    latencies: List[float] = []
+    statements = commits = 0
+    for _ in range(iterations):
+        async with AsyncSessionLocal() as db:
+            service = service_class(db)
+            # リクエストの認証と同様に、対象ユーザーを読み込んだ状態から計測する
+            target = await db.get(User, user_id)
+            counter.reset()
+            started = time.perf_counter()
+            await operation(service, db, target)
+            latencies.append(time.perf_counter() - started)
+            statements += counter.statements
+            commits += counter.commits
+    return (
+        f"{service_class.__name__:<18} {name:<22} {statements / iterations:>10.1f} {commits / iterations:>8.1f} "
+        f"{statistics.fmean(latencies) * 1000:>9.3f} {percentile(latencies, 50) * 1000:>9.3f} {percentile(latencies, 99) * 1000:>9.3f}"
+    )
+
+
+async def main(args: argparse.Namespace) -> None:
+    if async_engine.dialect.name == "sqlite":
+        from app.db.base_class import Base
+
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+    counter = StatementCounter(args.rtt_ms / 1000)
+    service_classes = [UserService, LegacyUserService] if args.legacy else [UserService]
+    print(f"target: {settings.SQLALCHEMY_ASYNC_DATABASE_URI.split('@')[-1]}")
+    print(f"database: {async_engine.dialect.name}  iterations: {args.iterations}  injected rtt: {args.rtt_ms} ms")
+    print(f"{'service':<18} {'operation':<22} {'stmts/op':>10} {'commits':>8} {'mean ms':>9} {'p50 ms':>9} {'p99 ms':>9}")
+    for name, operation in OPERATIONS.items():
+        if args.filter not in name:
+            continue
+        for service_class in service_classes:
+            print(await measure(service_class, name, operation, args.iterations, counter))
+    await async_engine.dispose()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=500)
+    parser.add_argument("--filter", default="", help="操作名にこの文字列を含むものだけ実行する")
+    parser.add_argument("--rtt-ms", type=float, default=0.0, help="SQL 文・コミットごとに加える往復時間 (ミリ秒)")
+    parser.add_argument("--legacy", action="store_true", help="従来の実装 (add → commit → refresh) も計測する")
+    asyncio.run(main(parser.parse_args()))
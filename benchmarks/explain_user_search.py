@@ -0,0 +1,103 @@
+"""
+管理者向けユーザー一覧・検索のクエリが想定したインデックスを使うかを確認するスクリプト
+
+UserService.build_search_statement が生成するクエリを EXPLAIN し、
+キーセットページネーション・前方一致・あいまい検索のそれぞれで期待するインデックスが
+プランに含まれるかを検査する。テーブルが小さいとシーケンシャルスキャンが選ばれるため、
+enable_seqscan を無効にしたトランザクションで「インデックスが使用可能か」を確認する。
+--seed で投入したダミーユーザーは確認後にトランザクションごとロールバックし、DB には残さない。
+想定外のプランがあった場合は終了コード 1 で終了する (tests/services/test_user_search_plans.py でも同じ確認を行う)。
+
+    alembic upgrade head
+    python -m benchmarks.explain_user_search --seed 50000
+"""
+import argparse
+import json
+import sys
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Set
+
+from sqlalchemy import Connection, insert
+
+from app.db.session import engine
+from app.models.user import User
+from app.services.user_service import UserService
+
+CASES = [
+    ("first page", {"limit": 51}, {"ix_users_created_date_id"}),
+    ("next page", {"limit": 51, "after": (datetime(2030, 1, 1), 10**9)}, {"ix_users_created_date_id"}),
+    (
+        "prefix search",
+        {"limit": 51, "q": "user1", "match": "prefix"},
+        {"ix_users_email_lower_pattern", "ix_users_name_lower_pattern", "ix_users_github_username_lower_pattern"},
+    ),
+    (
+        "fuzzy search",
+        {"limit": 51, "q": "ser12", "match": "fuzzy"},
+        {"ix_users_email_lower_trgm", "ix_users_name_lower_trgm", "ix_users_github_username_lower_trgm"},
+    ),
+]
+
+
+def index_names(plan: Dict[str, Any]) -> Set[str]:
+    names = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", []):
+        names |= index_names(child)
+    return names
+
+
+def seed(conn: Connection, count: int) -> None:
+    """ダミーユーザーを投入して統計を更新 (コミットは呼び出し側に任せる)"""
+    started = datetime.utcnow() - timedelta(days=365)
+    rows: List[Dict[str, Any]] = [
+        {
+            "email": f"explain-user{i}@example.com",
+            "name": f"explain-user{i}",
+            "github_username": f"explain-gh{i}" if i % 3 == 0 else None,
+            "is_active": True,
+            "is_superuser": False,
+            "created_date": started + timedelta(seconds=i),
+            "updated_date": started + timedelta(seconds=i),
+        }
+        for i in range(count)
+    ]
+    conn.execute(insert(User), rows)
+    conn.exec_driver_sql("ANALYZE users")
+
+
+def used_indexes(conn: Connection, kwargs: Dict[str, Any]) -> Set[str]:
+    """検索クエリのプランで使われるインデックス名 (トランザクション内で呼ぶ)"""
+    conn.exec_driver_sql("SET LOCAL enable_seqscan = off")
+    compiled = UserService.build_search_statement(**kwargs).compile(dialect=conn.dialect)
+    plan = conn.exec_driver_sql(f"EXPLAIN (FORMAT JSON) {compiled}", compiled.params).scalar()
+    # ドライバによっては json 型を文字列のまま返す
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return index_names(plan[0]["Plan"])
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seed", type=int, default=0, help="事前に投入するダミーユーザー数")
+    args = parser.parse_args()
+
+    failures = 0
+    with engine.connect() as conn:
+        transaction = conn.begin()
+        try:
+            if args.seed:
+                seed(conn, args.seed)
+            for label, kwargs, expected in CASES:
+                used = used_indexes(conn, kwargs)
+                ok = expected <= used
+                failures += not ok
+                print(f"{'OK' if ok else 'NG':<3} {label:<14} used={sorted(used)}")
+                if not ok:
+                    print(f"    missing={sorted(expected - used)}")
+        finally:
+            transaction.rollback()
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
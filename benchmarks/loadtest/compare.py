@@ -0,0 +1,97 @@
+"""
+2つの負荷試験レポートを比較し、性能の劣化を検出する
+
+操作ごとに p50 / p95 / p99 レイテンシ・スループット・エラー率を並べて表示し、
+いずれかが許容範囲を超えて悪化していれば終了コード 1 で終了する (CI のゲートとして使える)。
+
+    python -m benchmarks.loadtest.compare baseline.json candidate.json --max-latency-increase 0.15
+"""
+import argparse
+import json
+import sys
+from typing import Any, Dict, List, Optional
+
+LATENCY_KEYS = ("p50", "p95", "p99")
+
+
+def load(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def ratio(base: Optional[float], new: Optional[float]) -> Optional[float]:
+    if base is None or new is None or base == 0:
+        return None
+    return new / base - 1
+
+
+def compare_section(name: str, base: Dict[str, Any], new: Dict[str, Any], args: argparse.Namespace) -> List[str]:
+    """1つの操作 (または全体) を比較して表示し、許容範囲を超えた項目を返す"""
+    regressions: List[str] = []
+    for key in LATENCY_KEYS:
+        before, after = base["latency_ms"][key], new["latency_ms"][key]
+        change = ratio(before, after)
+        flag = ""
+        # 小さな値の揺らぎで誤検知しないよう、絶対値の差も閾値を超えた場合のみ劣化とする
+        if change is not None and change > args.max_latency_increase and after - before > args.min_latency_delta_ms:
+            flag = "  <-- regression"
+            regressions.append(f"{name} {key} {before:.1f}ms -> {after:.1f}ms ({change:+.1%})")
+        print(f"  {key:<12} {_fmt(before):>10} {_fmt(after):>10} {_fmt_ratio(change):>9}{flag}")
+
+    before, after = base["throughput_rps"], new["throughput_rps"]
+    change = ratio(before, after)
+    flag = ""
+    if change is not None and change < -args.max_throughput_decrease:
+        flag = "  <-- regression"
+        regressions.append(f"{name} throughput {before:.1f}rps -> {after:.1f}rps ({change:+.1%})")
+    print(f"  {'throughput':<12} {before:>10.1f} {after:>10.1f} {_fmt_ratio(change):>9}{flag}")
+
+    before, after = base["error_rate"], new["error_rate"]
+    flag = ""
+    if after - before > args.max_error_rate_increase:
+        flag = "  <-- regression"
+        regressions.append(f"{name} error_rate {before:.2%} -> {after:.2%}")
+    print(f"  {'error_rate':<12} {before:>10.2%} {after:>10.2%} {(after - before) * 100:>+8.2f}pt{flag}")
+    return regressions
+
+
+def _fmt(value: Optional[float]) -> str:
+    return "n/a" if value is None else f"{value:.1f}"
+
+
+def _fmt_ratio(value: Optional[float]) -> str:
+    return "n/a" if value is None else f"{value:+.1%}"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("baseline")
+    parser.add_argument("candidate")
+    parser.add_argument("--max-latency-increase", type=float, default=0.10, help="許容するレイテンシの増加率")
+    parser.add_argument("--min-latency-delta-ms", type=float, default=2.0, help="これ未満のレイテンシの増加は無視する (ミリ秒)")
+    parser.add_argument("--max-throughput-decrease", type=float, default=0.05, help="許容するスループットの低下率")
+    parser.add_argument("--max-error-rate-increase", type=float, default=0.005, help="許容するエラー率の増加 (割合)")
+    args = parser.parse_args()
+
+    base, new = load(args.baseline), load(args.candidate)
+    if base["meta"]["scenario"] != new["meta"]["scenario"]:
+        print("warning: the reports were produced with different scenarios", file=sys.stderr)
+    print(f"baseline:  {args.baseline} ({base['meta'].get('git_revision')})")
+    print(f"candidate: {args.candidate} ({new['meta'].get('git_revision')})")
+
+    print(f"\n[total]{'baseline':>16} {'candidate':>10} {'change':>9}")
+    regressions = compare_section("total", base["summary"], new["summary"], args)
+    for name in sorted(set(base["operations"]) & set(new["operations"])):
+        print(f"\n[{name}]")
+        regressions += compare_section(name, base["operations"][name], new["operations"][name], args)
+
+    if regressions:
+        print("\nRegressions:")
+        for line in regressions:
+            print(f"  - {line}")
+        sys.exit(1)
+    print("\nNo regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+負荷試験用に API サーバーをスタンドイン付きで起動する
+
+MongoDB と LLM はプロセス内のスタンドイン (AppResources の factory を差し替え) を使い、
+PostgreSQL / Redis / GitHub は環境変数 (DATABASE_URL, REDIS_HOST, GITHUB_*_BASE_URL) で指定された接続先を使う。
+通常は benchmarks.loadtest.run から起動されるが、単体でも起動できる。
+
+    DATABASE_URL=sqlite:////tmp/loadtest.db REDIS_HOST=127.0.0.1 REDIS_PORT=16379 \\
+        python -m benchmarks.loadtest.serve --port 8100 --users 50 --llm-latency-ms 300
+"""
+import argparse
+import os
+
+import uvicorn
+from fastapi import FastAPI
+
+SEED_EMAIL = "loadtest-{index}@example.com"
+
+
+def seed_database(users: int, password: str) -> None:
+    """テーブルを作成し、パスワードログイン用のユーザーを用意する (既存のユーザーはそのまま)"""
+    from sqlalchemy import func, select
+
+    from app.core.security import get_password_hash
+    from app.db.base_class import Base
+    from app.db.session import SessionLocal, engine
+    from app.models.user import User
+
+    Base.metadata.create_all(bind=engine)
+    with SessionLocal() as db:
+        existing = db.scalar(select(func.count()).select_from(User).where(User.email.like("loadtest-%@example.com")))
+        # ハッシュ化は遅いため、全ユーザーで同じハッシュを使う
+        hashed_password = get_password_hash(password)
+        db.add_all(
+            User(email=SEED_EMAIL.format(index=i), name=f"loadtest-{i}", hashed_password=hashed_password, is_active=True)
+            for i in range(existing, users)
+        )
+        db.commit()
+    engine.dispose()
+
+
+def create_app() -> FastAPI:
+    """スタンドインを組み込んだアプリケーション (uvicorn の factory としてワーカーごとに呼ばれる)"""
+    from app.core.resources import resources
+    from benchmarks.standins.fake_llm import FakeLLMClient
+    from benchmarks.standins.memory_mongo import MemoryMongoClient
+    from main import app
+
+    llm_latency = float(os.getenv("LOADTEST_LLM_LATENCY_MS", "300"))
+    llm_jitter = float(os.getenv("LOADTEST_LLM_JITTER_MS", "50"))
+    mongo_latency = float(os.getenv("LOADTEST_MONGO_LATENCY_MS", "1"))
+    resources.llm_client_factory = lambda: FakeLLMClient(latency_ms=llm_latency, jitter_ms=llm_jitter)
+    resources.mongo_client_factory = lambda: MemoryMongoClient(latency_ms=mongo_latency)
+    return app
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--users", type=int, default=50, help="パスワードログイン用に作成するユーザー数")
+    parser.add_argument("--password", default="loadtest-password")
+    parser.add_argument("--llm-latency-ms", type=float, default=300.0)
+    parser.add_argument("--llm-jitter-ms", type=float, default=50.0)
+    parser.add_argument("--mongo-latency-ms", type=float, default=1.0)
+    args = parser.parse_args()
+
+    # spawn されたワーカーにも引き継ぐため環境変数で渡す
+    os.environ["LOADTEST_LLM_LATENCY_MS"] = str(args.llm_latency_ms)
+    os.environ["LOADTEST_LLM_JITTER_MS"] = str(args.llm_jitter_ms)
+    os.environ["LOADTEST_MONGO_LATENCY_MS"] = str(args.mongo_latency_ms)
+    seed_database(args.users, args.password)
+    uvicorn.run(
+        "benchmarks.loadtest.serve:create_app",
+        factory=True,
+        host=args.host,
+        port=args.port,
+        workers=args.workers,
+        log_level="warning",
+    )
@@ -0,0 +1,63 @@
+"""
+GitHub OAuth / REST API のローカルスタンドイン
+
+アクセストークン発行・/user・/user/emails のみを実装し、任意の遅延を注入できる。
+API サーバーは GITHUB_OAUTH_BASE_URL / GITHUB_API_BASE_URL をこのサーバーに向けて起動する。
+
+    python -m benchmarks.standins.fake_github --port 9100 --latency-ms 80
+"""
+import argparse
+import asyncio
+import hashlib
+import os
+
+from fastapi import FastAPI, Form, Header, HTTPException, Request
+
+app = FastAPI(title="fake-github")
+
+LATENCY_SECONDS = float(os.getenv("FAKE_GITHUB_LATENCY_MS", "0")) / 1000
+
+
+def _user_id(access_token: str) -> int:
+    # 同じ認可コードからは常に同じユーザーを返す
+    return int(hashlib.sha256(access_token.encode()).hexdigest()[:8], 16)
+
+
+def _token_from_header(authorization: str) -> str:
+    if not authorization or not authorization.startswith("token "):
+        raise HTTPException(status_code=401, detail="Bad credentials")
+    return authorization.removeprefix("token ")
+
+
+@app.post("/login/oauth/access_token")
+async def access_token(request: Request, code: str = Form(default=None)):
+    await asyncio.sleep(LATENCY_SECONDS)
+    if code is None:
+        code = (await request.json()).get("code")
+    return {"access_token": f"gho_{code}", "token_type": "bearer", "scope": "user:email"}
+
+
+@app.get("/user")
+async def user(authorization: str = Header(default=None)):
+    await asyncio.sleep(LATENCY_SECONDS)
+    user_id = _user_id(_token_from_header(authorization))
+    return {"id": user_id, "login": f"fake-user-{user_id}", "name": None, "avatar_url": f"https://avatars.example.com/{user_id}"}
+
+
+@app.get("/user/emails")
+async def user_emails(authorization: str = Header(default=None)):
+    await asyncio.sleep(LATENCY_SECONDS)
+    user_id = _user_id(_token_from_header(authorization))
+    return [{"email": f"fake-user-{user_id}@example.com", "primary": True, "verified": True}]
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9100)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="各エンドポイントで注入する遅延 (ミリ秒)")
+    args = parser.parse_args()
+    LATENCY_SECONDS = args.latency_ms / 1000
+    uvicorn.run(app, host=args.host, port=args.port, log_level="warning")
@@ -0,0 +1,88 @@
+"""
+LLM クライアントのローカルスタンドイン
+
+GeminiClient と同じ get_chat_model() を持ち、with_structured_output() で得られる Runnable は
+外部 API を呼ばずに一定の遅延の後で固定長の ChatOutput を返す。
+遅延は time.sleep で再現する (ChatService が使う ainvoke では、本物の同期呼び出しと同様にスレッドで実行される)。
+include_raw=True の場合は本物と同じく raw (usage_metadata 付きの AIMessage) / parsed / parsing_error の dict を返す。
+astream() は同じ応答を STREAM_CHUNK_CHARS 文字ずつ、遅延を均等に分けて返す (最後のチャンクに usage_metadata)。
+"""
+import asyncio
+import random
+import time
+from typing import Any, AsyncIterator, Dict
+
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.runnables import RunnableLambda
+
+from app.schemas.chat import ChatOutput
+
+STREAM_CHUNK_CHARS = 16
+
+
+class FakeChatModel:
+    """ChatChain が利用する with_structured_output() と astream() のみを実装したチャットモデル"""
+
+    def __init__(self, latency_ms: float, jitter_ms: float, response_chars: int):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.response_chars = response_chars
+
+    def _delay(self) -> float:
+        return max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000
+
+    def _text(self) -> str:
+        return ("fake response " * (self.response_chars // 14 + 1))[: self.response_chars]
+
+    @staticmethod
+    def _usage(prompt_value: Any, text: str) -> Dict[str, int]:
+        # 文字数からおおよそのトークン数を見積もる (1トークン ≒ 4文字)
+        prompt_tokens = len(prompt_value.to_string()) // 4 + 1
+        completion_tokens = len(text) // 4 + 1
+        return {"input_tokens": prompt_tokens, "output_tokens": completion_tokens, "total_tokens": prompt_tokens + completion_tokens}
+
+    def _respond(self, prompt_value: Any) -> ChatOutput:
+        delay = self._delay()
+        if delay:
+            time.sleep(delay)
+        return ChatOutput(role="assistant", response=self._text())
+
+    def _respond_with_raw(self, prompt_value: Any) -> Dict[str, Any]:
+        output = self._respond(prompt_value)
+        raw = AIMessage(
+            content="",
+            response_metadata={"model_name": FakeLLMClient.model_name},
+            usage_metadata=self._usage(prompt_value, output.response),
+        )
+        return {"raw": raw, "parsed": output, "parsing_error": None}
+
+    def with_structured_output(self, schema: Any, include_raw: bool = False, **kwargs: Any) -> RunnableLambda:
+        return RunnableLambda(self._respond_with_raw if include_raw else self._respond)
+
+    async def astream(self, prompt_value: Any, **kwargs: Any) -> AsyncIterator[AIMessageChunk]:
+        text = self._text()
+        pieces = [text[i : i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)] or [""]
+        interval = self._delay() / len(pieces)
+        for index, piece in enumerate(pieces):
+            if interval:
+                await asyncio.sleep(interval)
+            if index < len(pieces) - 1:
+                yield AIMessageChunk(content=piece)
+            else:
+                yield AIMessageChunk(
+                    content=piece,
+                    response_metadata={"model_name": FakeLLMClient.model_name},
+                    usage_metadata=self._usage(prompt_value, text),
+                )
+
+
+class FakeLLMClient:
+    """GeminiClient のスタンドイン (AppResources の llm_client_factory に渡す)"""
+
+    model_name = "fake-llm"
+
+    def __init__(self, latency_ms: float = 300.0, jitter_ms: float = 50.0, response_chars: int = 400):
+        self._model = FakeChatModel(latency_ms, jitter_ms, response_chars)
+
+    def get_chat_model(self) -> FakeChatModel:
+        return self._model
@@ -0,0 +1,26 @@
+"""
+Redis のローカルスタンドイン (fakeredis の TCP サーバー)
+
+API サーバーは REDIS_HOST / REDIS_PORT をこのサーバーに向けて起動する。
+データはプロセス内のメモリにのみ保持され、終了すると消える。
+
+    python -m benchmarks.standins.fake_redis --port 16379
+"""
+import argparse
+
+from fakeredis import TcpFakeServer
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=16379)
+    args = parser.parse_args()
+
+    server = TcpFakeServer((args.host, args.port), server_type="redis")
+    server.daemon_threads = True
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
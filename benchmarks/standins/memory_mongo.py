@@ -0,0 +1,131 @@
+"""
+MongoDB (motor) のインメモリスタンドイン
+
+ChatHistoryRepository・RetrievalMemory・UsageMeter とヘルスチェックが使う操作 (find_one (projection) / insert_one /
+update_one (配列内のフィールドの $ne による絞り込み) と bulk_write の $set・$setOnInsert・$push ($each・$slice)・$inc、create_index、admin.command("ping")) のみを実装する。
+任意の遅延を注入してネットワーク越しの往復を模擬できる。
+"""
+import asyncio
+import copy
+import itertools
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+
+def _matches(document: Dict[str, Any], query: Dict[str, Any]) -> bool:
+    for key, value in query.items():
+        if isinstance(value, dict) and "$ne" in value:
+            # 配列内のドキュメントのフィールド ("messages.id") の $ne のみ対応
+            field, _, sub = key.partition(".")
+            if any(isinstance(item, dict) and item.get(sub) == value["$ne"] for item in document.get(field, [])):
+                return False
+        elif document.get(key) != value:
+            return False
+    return True
+
+
+class _InsertOneResult:
+    def __init__(self, inserted_id: int):
+        self.inserted_id = inserted_id
+
+
+class _UpdateResult:
+    def __init__(self, matched_count: int):
+        self.matched_count = matched_count
+        self.modified_count = matched_count
+
+
+class MemoryCollection:
+    def __init__(self, latency: float):
+        self._latency = latency
+        self._documents: List[Dict[str, Any]] = []
+        self._ids = itertools.count(1)
+
+    async def _roundtrip(self) -> None:
+        await asyncio.sleep(self._latency)
+
+    async def find_one(self, query: Dict[str, Any], projection: Optional[Dict[str, Any]] = None) -> Optional[Dict[str, Any]]:
+        await self._roundtrip()
+        for document in self._documents:
+            if _matches(document, query):
+                if projection:
+                    # 含めるフィールドの指定のみ対応
+                    return {key: copy.deepcopy(value) for key, value in document.items() if key == "_id" or projection.get(key)}
+                return copy.deepcopy(document)
+        return None
+
+    async def insert_one(self, document: Dict[str, Any]) -> _InsertOneResult:
+        await self._roundtrip()
+        document = {"_id": next(self._ids), **copy.deepcopy(document)}
+        self._documents.append(document)
+        return _InsertOneResult(document["_id"])
+
+    def _apply(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool) -> int:
+        target = next((document for document in self._documents if _matches(document, query)), None)
+        if target is None:
+            if not upsert:
+                return 0
+            target = {"_id": next(self._ids), **query}
+            self._documents.append(target)
+            for key, value in update.get("$setOnInsert", {}).items():
+                target[key] = copy.deepcopy(value)
+        for key, value in update.get("$set", {}).items():
+            target[key] = copy.deepcopy(value)
+        for key, value in update.get("$push", {}).items():
+            values = target.setdefault(key, [])
+            if isinstance(value, dict) and "$each" in value:
+                values.extend(copy.deepcopy(value["$each"]))
+                if "$slice" in value:
+                    # 負の値 (末尾の N 件を残す) のみ対応
+                    del values[: max(0, len(values) + value["$slice"])]
+            else:
+                values.append(copy.deepcopy(value))
+        for key, value in update.get("$inc", {}).items():
+            target[key] = target.get(key, 0) + value
+        return 1
+
+    async def update_one(self, query: Dict[str, Any], update: Dict[str, Any], upsert: bool = False) -> _UpdateResult:
+        await self._roundtrip()
+        return _UpdateResult(self._apply(query, update, upsert))
+
+    async def bulk_write(self, requests: List[Any], ordered: bool = True) -> _UpdateResult:
+        # pymongo の UpdateOne のみ対応 (1回の往復でまとめて適用する)
+        await self._roundtrip()
+        return _UpdateResult(sum(self._apply(request._filter, request._doc, bool(request._upsert)) for request in requests))
+
+    async def create_index(self, keys: Any, **kwargs: Any) -> str:
+        await self._roundtrip()
+        return "_".join(f"{key}_{direction}" for key, direction in keys)
+
+
+class MemoryDatabase:
+    def __init__(self, latency: float):
+        self._latency = latency
+        self._collections: Dict[str, MemoryCollection] = defaultdict(lambda: MemoryCollection(self._latency))
+
+    def __getattr__(self, name: str) -> MemoryCollection:
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return self._collections[name]
+
+    def __getitem__(self, name: str) -> MemoryCollection:
+        return self._collections[name]
+
+    async def command(self, name: str, *args: Any, **kwargs: Any) -> Dict[str, Any]:
+        await asyncio.sleep(self._latency)
+        return {"ok": 1.0}
+
+
+class MemoryMongoClient:
+    """AsyncIOMotorClient のスタンドイン (AppResources の mongo_client_factory に渡す)"""
+
+    def __init__(self, latency_ms: float = 1.0):
+        self._latency = latency_ms / 1000
+        self._databases: Dict[str, MemoryDatabase] = defaultdict(lambda: MemoryDatabase(self._latency))
+        self.admin = self._databases["admin"]
+
+    def __getitem__(self, name: str) -> MemoryDatabase:
+        return self._databases[name]
+
+    def close(self) -> None:
+        self._databases.clear()
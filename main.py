@@ -1,19 +1,51 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.api.v1.api import api_router
+from app.core.admission import admission
 from app.core.config import settings
+from app.core.hashing import PasswordHasherBusyError
+from app.core.rate_limit import RateLimitExceededError
+from app.core.resources import resources
+from app.core.responses import ORJSONResponse
+from app.middleware.admission import AdmissionMiddleware
+from app.middleware.compression import CompressionMiddleware
+from app.middleware.metrics import MetricsMiddleware
+from app.middleware.proxy_headers import ProxyHeadersMiddleware
+from app.middleware.tracing import TracingMiddleware
 
 # OPENAPI_URLの処理を修正
 openapi_url = f"{settings.OPENAPI_URL}/openapi.json" if settings.OPENAPI_URL else "/openapi.json"
 
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 共有リソースの作成とウォームアップが終わるまで readiness は ready にならない
+    await resources.startup()
+    yield
+    await resources.shutdown()
+
+
 app = FastAPI(
     title=settings.PROJECT_NAME,
     version=settings.VERSION,
     openapi_url=openapi_url,
     openapi_version="3.0.2",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
 
+# CORS より内側で拒否し、503 にも CORS ヘッダーが付いてブラウザから Retry-After を読めるようにする
+if settings.ADMISSION_ENABLED:
+    app.add_middleware(
+        AdmissionMiddleware,
+        controller=admission,
+        exempt_paths=settings.ADMISSION_EXEMPT_PATHS,
+        low_priority_paths=settings.ADMISSION_LOW_PRIORITY_PATHS,
+    )
+
 origins = []
 
 if settings.ALLOWED_ORIGINS:
@@ -27,4 +59,41 @@ app.add_middleware(
     allow_headers=["*"],  # Allow all headers
 )
 
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=settings.COMPRESSION_GZIP_LEVEL,
+    brotli_quality=settings.COMPRESSION_BROTLI_QUALITY,
+)
+
+# 最も外側で計測し、CORS のプリフライトなども含めたレイテンシを記録する
+app.add_middleware(TracingMiddleware)
+app.add_middleware(MetricsMiddleware)
+# 他のミドルウェアより先にクライアントのIPを置き換える
+app.add_middleware(ProxyHeadersMiddleware, trusted_proxies=settings.FORWARDED_ALLOW_IPS)
+
 app.include_router(api_router, prefix=settings.API_V1_STR)
+
+
+@app.exception_handler(PasswordHasherBusyError)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusyError):
+    # ログイン集中時はハッシュ処理を待たせずに即座に503を返す
+    return ORJSONResponse(
+        status_code=503,
+        content={"detail": "認証処理が混み合っています。しばらくしてから再試行してください。"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+@app.exception_handler(RateLimitExceededError)
+async def rate_limit_exceeded_handler(request: Request, exc: RateLimitExceededError):
+    return ORJSONResponse(
+        status_code=429,
+        content={"detail": "リクエストが多すぎます。しばらくしてから再試行してください。"},
+        headers={
+            "Retry-After": str(exc.retry_after),
+            "X-RateLimit-Limit": str(exc.limit),
+            "X-RateLimit-Remaining": "0",
+            "X-RateLimit-Reset": str(exc.reset_after),
+        },
+    )
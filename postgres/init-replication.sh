@@ -0,0 +1,4 @@
+#!/bin/sh
+# 読み取りレプリカ (docker compose --profile replica) からのストリーミングレプリケーション接続を許可する
+# (docker-entrypoint-initdb.d のスクリプトはデータディレクトリの初回作成時にのみ実行される)
+echo "host replication all all scram-sha-256" >> "$PGDATA/pg_hba.conf"
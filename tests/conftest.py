@@ -0,0 +1,49 @@
+import os
+import tempfile
+
+# 設定の必須項目。app を import する前に設定する
+os.environ.setdefault("GOOGLE_API_KEY", "test")
+os.environ.setdefault("MINIO_ENDPOINT_URL", "http://localhost:9000")
+os.environ.setdefault("TRACE_EXPORTER", "")
+# 開発用の DB を誤って使わないよう、常に一時ディレクトリの SQLite (aiosqlite) を使う
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp(prefix='app-test-')}/test.db"
+os.environ["DB_REPLICA_URLS"] = ""
+
+import fakeredis
+import pytest
+
+from app.core import redis_client
+from app.db.base import Base
+from app.db.session import AsyncSessionLocal, async_engine
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+async def redis():
+    """Redis の代わりに fakeredis (Lua スクリプトも実行できる) を get_redis() から返す"""
+    client = fakeredis.FakeAsyncRedis(decode_responses=True)
+    previous, redis_client._client = redis_client._client, client
+    try:
+        yield client
+    finally:
+        redis_client._client = previous
+        await client.aclose()
+
+
+@pytest.fixture
+async def db():
+    """テーブルを作成した SQLite のセッション (テストごとに作り直す)"""
+    async with async_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    try:
+        async with AsyncSessionLocal() as session:
+            yield session
+    finally:
+        async with async_engine.begin() as conn:
+            await conn.run_sync(Base.metadata.drop_all)
+        # aiosqlite の接続をテストのイベントループをまたいで使わない
+        await async_engine.dispose()
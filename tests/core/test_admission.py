@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+
+from app.core.admission import LOW, NORMAL, AdmissionRejectedError, RouteClassLimiter
+from app.middleware.admission import AdmissionMiddleware
+
+pytestmark = pytest.mark.anyio
+
+
+def limiter(limit: int = 1, max_queue: int = 1, max_wait: float = 1.0) -> RouteClassLimiter:
+    return RouteClassLimiter(LOW, limit=limit, max_queue=max_queue, max_wait=max_wait, max_loop_lag=0.1)
+
+
+async def test_accepts_up_to_limit_then_queues():
+    low = limiter(limit=1)
+    await low.acquire(loop_lag=0.0)
+
+    waiting = asyncio.create_task(low.acquire(loop_lag=0.0))
+    await asyncio.sleep(0)
+    assert not waiting.done()
+
+    # 返却した枠は待っているリクエストにそのまま譲る
+    low.release()
+    await waiting
+    assert low.inflight == 1
+    low.release()
+    assert low.inflight == 0
+
+
+async def test_rejects_when_loop_is_lagging():
+    with pytest.raises(AdmissionRejectedError) as error:
+        await limiter().acquire(loop_lag=0.5)
+    assert error.value.reason == "loop_lag"
+
+
+async def test_rejects_when_queue_is_full():
+    low = limiter(limit=1, max_queue=1)
+    await low.acquire(loop_lag=0.0)
+    waiting = asyncio.create_task(low.acquire(loop_lag=0.0))
+    await asyncio.sleep(0)
+
+    with pytest.raises(AdmissionRejectedError) as error:
+        await low.acquire(loop_lag=0.0)
+    assert error.value.reason == "queue_full"
+    low.release()
+    await waiting
+
+
+async def test_rejects_after_waiting_too_long_and_sheds_early():
+    low = limiter(limit=1, max_queue=10, max_wait=0.05)
+    await low.acquire(loop_lag=0.0)
+
+    with pytest.raises(AdmissionRejectedError) as error:
+        await low.acquire(loop_lag=0.0)
+    assert error.value.reason == "queue_timeout"
+    assert not low._waiters
+
+    # 時間切れが続いた後は待たせずに拒否する
+    low.wait_ewma = low.max_wait
+    with pytest.raises(AdmissionRejectedError) as error:
+        await low.acquire(loop_lag=0.0)
+    assert error.value.reason == "queue_wait"
+
+
+async def test_cancelled_waiter_does_not_leak_slot():
+    low = limiter(limit=1, max_queue=2)
+    await low.acquire(loop_lag=0.0)
+    cancelled = asyncio.create_task(low.acquire(loop_lag=0.0))
+    waiting = asyncio.create_task(low.acquire(loop_lag=0.0))
+    await asyncio.sleep(0)
+
+    cancelled.cancel()
+    low.release()
+    await waiting
+    assert low.inflight == 1
+
+
+def test_classifies_routes():
+    middleware = AdmissionMiddleware(None, None, exempt_paths="/api/v1/healthcheck", low_priority_paths="/api/v1/chat")
+
+    assert middleware.classify({"path": "/api/v1/healthcheck/readyz", "method": "GET"}) == "exempt"
+    assert middleware.classify({"path": "/api/v1/chat", "method": "POST"}) == LOW
+    assert middleware.classify({"path": "/api/v1/chat/jobs", "method": "POST"}) == NORMAL
+    assert middleware.classify({"path": "/api/v1/users", "method": "GET"}) == NORMAL
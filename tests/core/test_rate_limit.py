@@ -0,0 +1,79 @@
+import asyncio
+
+import fakeredis
+import pytest
+
+from app.core import redis_client
+from app.core.rate_limit import KEY_PREFIX, RateLimiter
+
+pytestmark = pytest.mark.anyio
+
+
+async def test_sliding_window_rejects_over_limit(redis):
+    limiter = RateLimiter()
+
+    results = [await limiter.hit("login:ip:1", limit=3, window=60) for _ in range(4)]
+
+    assert [result.allowed for result in results] == [True, True, True, False]
+    assert [result.remaining for result in results] == [2, 1, 0, 0]
+    assert 0 < results[-1].reset_after <= 60
+    # 拒否したリクエストはウィンドウに記録しない
+    assert await redis.zcard(f"{KEY_PREFIX}login:ip:1") == 3
+
+
+async def test_sliding_window_counts_keys_separately(redis):
+    limiter = RateLimiter()
+
+    assert (await limiter.hit("chat:user:1", limit=1, window=60)).allowed
+    assert (await limiter.hit("chat:user:2", limit=1, window=60)).allowed
+    assert not (await limiter.hit("chat:user:1", limit=1, window=60)).allowed
+
+
+async def test_sliding_window_slides(redis):
+    limiter = RateLimiter()
+
+    assert (await limiter.hit("refresh:ip:1", limit=1, window=1)).allowed
+    assert not (await limiter.hit("refresh:ip:1", limit=1, window=1)).allowed
+    await asyncio.sleep(1.1)
+    assert (await limiter.hit("refresh:ip:1", limit=1, window=1)).allowed
+
+
+async def test_concurrency_lease_is_released(redis):
+    limiter = RateLimiter()
+
+    first = await limiter.acquire("chat:user:1", limit=2, ttl=60)
+    second = await limiter.acquire("chat:user:1", limit=2, ttl=60)
+    assert first is not None and second is not None
+    assert await limiter.acquire("chat:user:1", limit=2, ttl=60) is None
+
+    await limiter.release(first)
+    assert await limiter.acquire("chat:user:1", limit=2, ttl=60) is not None
+
+
+async def test_concurrency_lease_expires(redis):
+    limiter = RateLimiter()
+
+    # release されずにプロセスが落ちた場合も、ttl を過ぎれば枠が空く
+    assert await limiter.acquire("chat:user:1", limit=1, ttl=1) is not None
+    assert await limiter.acquire("chat:user:1", limit=1, ttl=1) is None
+    await asyncio.sleep(1.1)
+    assert await limiter.acquire("chat:user:1", limit=1, ttl=1) is not None
+
+
+async def test_falls_back_to_local_state_without_redis():
+    server = fakeredis.FakeServer()
+    server.connected = False
+    client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    previous, redis_client._client = redis_client._client, client
+    try:
+        limiter = RateLimiter()
+        assert [(await limiter.hit("login:ip:1", limit=2, window=60)).allowed for _ in range(3)] == [True, True, False]
+
+        lease = await limiter.acquire("chat:user:1", limit=1, ttl=60)
+        assert lease is not None and lease.local
+        assert await limiter.acquire("chat:user:1", limit=1, ttl=60) is None
+        await limiter.release(lease)
+        assert await limiter.acquire("chat:user:1", limit=1, ttl=60) is not None
+    finally:
+        redis_client._client = previous
+        await client.aclose()
@@ -0,0 +1,97 @@
+import httpx
+import pytest
+from starlette.applications import Starlette
+from starlette.responses import PlainTextResponse, StreamingResponse
+from starlette.routing import Route
+
+from app.middleware.compression import CompressionMiddleware, select_encoding
+
+pytestmark = pytest.mark.anyio
+
+LARGE = "x" * 4096
+
+
+async def large(request):
+    return PlainTextResponse(LARGE)
+
+
+async def small(request):
+    return PlainTextResponse("ok")
+
+
+async def stream(request):
+    async def chunks():
+        for _ in range(3):
+            yield LARGE
+
+    return StreamingResponse(chunks(), media_type="text/plain")
+
+
+async def events(request):
+    return StreamingResponse(iter([LARGE]), media_type="text/event-stream")
+
+
+@pytest.fixture
+async def client():
+    app = Starlette(routes=[Route("/large", large), Route("/small", small), Route("/stream", stream), Route("/events", events)])
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+        yield client
+
+
+@pytest.mark.parametrize(
+    "accept_encoding, expected",
+    [
+        ("gzip, br", "br"),
+        ("gzip", "gzip"),
+        ("br;q=0.5, gzip;q=0.8", "gzip"),
+        ("br;q=0, gzip;q=0", None),
+        ("*", "br"),
+        ("identity", None),
+        ("", None),
+    ],
+)
+def test_select_encoding(accept_encoding, expected):
+    assert select_encoding(accept_encoding) == expected
+
+
+async def test_compresses_large_response(client):
+    response = await client.get("/large", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert int(response.headers["content-length"]) < len(LARGE)
+    assert response.text == LARGE
+
+
+async def test_compresses_with_brotli(client):
+    response = await client.get("/large", headers={"Accept-Encoding": "br"})
+
+    assert response.headers["content-encoding"] == "br"
+    assert int(response.headers["content-length"]) < len(LARGE)
+    assert response.text == LARGE
+
+
+async def test_skips_small_and_unaccepted_responses(client):
+    small_response = await client.get("/small", headers={"Accept-Encoding": "gzip"})
+    identity_response = await client.get("/large", headers={"Accept-Encoding": "identity"})
+
+    assert "content-encoding" not in small_response.headers
+    assert "content-encoding" not in identity_response.headers
+    # 圧縮しなかった場合もキャッシュがエンコーディングごとに分けられるようにする
+    assert identity_response.headers["vary"] == "Accept-Encoding"
+
+
+async def test_streams_compressed_chunks(client):
+    response = await client.get("/stream", headers={"Accept-Encoding": "gzip"})
+
+    assert response.headers["content-encoding"] == "gzip"
+    assert "content-length" not in response.headers
+    assert response.text == LARGE * 3
+
+
+async def test_does_not_compress_event_stream(client):
+    response = await client.get("/events", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in response.headers
+    assert response.text == LARGE
@@ -0,0 +1,115 @@
+import asyncio
+
+import pytest
+
+from app.schemas.chat import ChatInput, ChatMessage, ChatOutput
+from app.services.chat_job_queue import ChatJobQueue, ChatJobTooLargeError
+
+pytestmark = pytest.mark.anyio
+
+USER_ID = 1
+CONSUMER = "worker-1"
+MIN_IDLE = 0.01
+
+
+@pytest.fixture
+async def queue(redis):
+    queue = ChatJobQueue(stream="test:chatjobs", group="test-workers", maxlen=1000, result_ttl=60, max_payload_bytes=1024)
+    await queue.ensure_group()
+    return queue
+
+
+def chat_input(response: str = "hello") -> ChatInput:
+    return ChatInput(role="user", response=response, chat_id="chat-1")
+
+
+async def test_job_succeeds(redis, queue):
+    job, created = await queue.enqueue(USER_ID, chat_input())
+    assert created and job.status == "queued"
+
+    [(message_id, fields)] = await queue.read(CONSUMER, count=10, block=0.1)
+    assert (await queue.start(message_id, fields)).response == "hello"
+    assert (await queue.get(job.job_id, USER_ID)).status == "running"
+    await queue.complete(message_id, fields, ChatOutput(role="assistant", response="hi"))
+
+    done = await queue.get(job.job_id, USER_ID)
+    assert done.status == "succeeded" and done.attempts == 1
+    assert done.result.response == "hi"
+    # ACK したエントリはストリームから削除する
+    assert await queue.backlog() == (0, 0)
+    assert await redis.xlen(queue.stream) == 0
+
+
+async def test_job_is_private_to_its_user(queue):
+    job, _ = await queue.enqueue(USER_ID, chat_input())
+
+    assert await queue.get(job.job_id, USER_ID + 1) is None
+
+
+async def test_idempotency_key_returns_existing_job(redis, queue):
+    job, created = await queue.enqueue(USER_ID, chat_input(), idempotency_key="retry-1")
+    again, created_again = await queue.enqueue(USER_ID, chat_input(), idempotency_key="retry-1")
+
+    assert created and not created_again
+    assert again.job_id == job.job_id
+    assert await redis.xlen(queue.stream) == 1
+
+
+async def test_payload_excludes_history_and_is_bounded(redis, queue):
+    with_history = chat_input().model_copy(update={"history": [ChatMessage(role="user", content="x" * 4096)]})
+    await queue.enqueue(USER_ID, with_history)
+    [(_, fields)] = await queue.read(CONSUMER, count=10, block=0.1)
+    assert "history" not in fields["payload"]
+
+    with pytest.raises(ChatJobTooLargeError):
+        await queue.enqueue(USER_ID, chat_input("x" * 2048))
+    assert await redis.xlen(queue.stream) == 1
+
+
+async def claim_stale(queue, consumer, max_attempts):
+    # ワーカーが落ちて ACK されないまま min_idle が過ぎた状態にする
+    await asyncio.sleep(MIN_IDLE * 2)
+    return await queue.claim_stale(consumer, min_idle=MIN_IDLE, count=10, max_attempts=max_attempts)
+
+
+async def test_stale_job_is_retried(queue):
+    job, _ = await queue.enqueue(USER_ID, chat_input())
+    [(message_id, fields)] = await queue.read(CONSUMER, count=10, block=0.1)
+    await queue.start(message_id, fields)
+    assert await queue.backlog() == (0, 1)
+
+    # ACK されないまま min_idle を過ぎたエントリは他のワーカーが引き取る
+    claimed = await claim_stale(queue, "worker-2", max_attempts=3)
+    assert [entry_id for entry_id, _ in claimed] == [message_id]
+    await queue.start(message_id, fields)
+    await queue.complete(message_id, fields, ChatOutput(role="assistant", response="hi"))
+
+    done = await queue.get(job.job_id, USER_ID)
+    assert done.status == "succeeded" and done.attempts == 2
+    assert await claim_stale(queue, "worker-2", max_attempts=3) == []
+
+
+async def test_job_is_abandoned_after_max_attempts(redis, queue):
+    job, _ = await queue.enqueue(USER_ID, chat_input())
+    [(message_id, fields)] = await queue.read(CONSUMER, count=10, block=0.1)
+    await queue.start(message_id, fields)
+    assert len(await claim_stale(queue, "worker-2", max_attempts=2)) == 1
+    await queue.start(message_id, fields)
+
+    # 配信回数が max_attempts に達したら再実行せず failed にする
+    assert await claim_stale(queue, "worker-3", max_attempts=2) == []
+    failed = await queue.get(job.job_id, USER_ID)
+    assert failed.status == "failed" and failed.attempts == 2
+    assert "abandoned" in failed.error
+    assert await redis.xlen(queue.stream) == 0
+
+
+async def test_finished_job_is_not_run_again(queue):
+    job, _ = await queue.enqueue(USER_ID, chat_input())
+    [(message_id, fields)] = await queue.read(CONSUMER, count=10, block=0.1)
+    await queue.start(message_id, fields)
+    await queue.fail(message_id, fields, "boom")
+
+    # 結果を書いた後に ACK 前に落ちて再配信された場合も、完了済みのジョブは実行しない
+    assert await queue.start(message_id, fields) is None
+    assert (await queue.get(job.job_id, USER_ID)).status == "failed"
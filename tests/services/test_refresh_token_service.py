@@ -0,0 +1,96 @@
+import pytest
+
+from app.db.session import AsyncSessionLocal
+from app.models.user import User
+from app.services.refresh_token_buffer import refresh_token_buffer
+from app.services.refresh_token_service import FAMILY_KEY, TOKEN_KEY, RefreshTokenService, hash_token
+from app.services.user_service import UserService
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+async def user_id(db):
+    user = User(email="refresh@example.com", name="refresh", is_active=True)
+    db.add(user)
+    await db.commit()
+    yield user.id
+    # 未反映の値を次のテスト (作り直したテーブル) に持ち越さない
+    await refresh_token_buffer.flush()
+
+
+async def rotate(redis, token):
+    # リクエストごとにセッションを作るのと同じく、DB の値は毎回読み直す
+    async with AsyncSessionLocal() as session:
+        return await RefreshTokenService(redis, UserService(session)).rotate(token)
+
+
+async def stored_digest(user_id):
+    async with AsyncSessionLocal() as session:
+        return (await session.get(User, user_id)).refresh_token
+
+
+async def test_rotate_issues_new_token_in_same_family(redis, db, user_id):
+    service = RefreshTokenService(redis, UserService(db))
+    token = await service.issue(user_id)
+
+    rotated = await rotate(redis, token)
+
+    assert rotated is not None
+    rotated_user_id, new_token = rotated
+    assert rotated_user_id == user_id and new_token != token
+    family = await redis.hget(TOKEN_KEY.format(digest=hash_token(token)), "family")
+    assert await redis.get(FAMILY_KEY.format(family=family)) == hash_token(new_token)
+    await refresh_token_buffer.flush()
+    assert await stored_digest(user_id) == hash_token(new_token)
+
+
+async def test_reuse_revokes_family(redis, db, user_id):
+    service = RefreshTokenService(redis, UserService(db))
+    token = await service.issue(user_id)
+    _, new_token = await rotate(redis, token)
+
+    # 使用済みトークンの再提示 (漏洩) は拒否し、系列の最新トークンも失効させる
+    assert await rotate(redis, token) is None
+    assert await rotate(redis, new_token) is None
+    assert await redis.exists(TOKEN_KEY.format(digest=hash_token(new_token))) == 0
+    # DB に残る最新トークンでの照合もできない
+    assert await stored_digest(user_id) is None
+
+
+async def test_reuse_does_not_revoke_other_families(redis, db, user_id):
+    service = RefreshTokenService(redis, UserService(db))
+    leaked = await service.issue(user_id)
+    other_device = await service.issue(user_id)
+    await rotate(redis, leaked)
+
+    assert await rotate(redis, leaked) is None
+    assert await redis.exists(TOKEN_KEY.format(digest=hash_token(other_device))) == 1
+
+
+async def test_revoke_user_rejects_issued_tokens(redis, db, user_id):
+    service = RefreshTokenService(redis, UserService(db))
+    token = await service.issue(user_id)
+
+    await service.revoke_user(user_id)
+
+    assert await rotate(redis, token) is None
+    assert await stored_digest(user_id) is None
+
+
+async def test_falls_back_to_database_when_redis_lost_token(redis, db, user_id):
+    service = RefreshTokenService(redis, UserService(db))
+    stale = await service.issue(user_id)
+    latest = await service.issue(user_id)
+    await refresh_token_buffer.flush()
+    await redis.flushall()
+
+    # DB には最新のトークンのハッシュのみ残る
+    assert await rotate(redis, stale) is None
+    rotated = await rotate(redis, latest)
+    assert rotated is not None and rotated[0] == user_id
+
+
+async def test_rejects_malformed_token(redis, db, user_id):
+    assert await rotate(redis, "not-a-token") is None
+    assert await rotate(redis, f"{user_id}.unknown") is None
@@ -0,0 +1,62 @@
+"""
+管理者向けユーザー一覧・検索のクエリがマイグレーションで作成したインデックスを使うかを EXPLAIN で確認する
+
+PostgreSQL が必要なため、TEST_DATABASE_URL (postgresql://...) が指定されていない場合はスキップする。
+一時スキーマにテーブルとインデックスを作成してダミーユーザーを投入し、最後にトランザクションごとロールバックする。
+"""
+import importlib.util
+import os
+import uuid
+from pathlib import Path
+
+import pytest
+from alembic.migration import MigrationContext
+from alembic.operations import Operations
+from sqlalchemy import create_engine
+from sqlalchemy.schema import CreateTable
+
+from app.models.user import User
+from benchmarks.explain_user_search import CASES, seed, used_indexes
+
+TEST_DATABASE_URL = os.getenv("TEST_DATABASE_URL", "")
+SEARCH_INDEX_MIGRATION = Path(__file__).resolve().parents[2] / "app/migrations/versions/4c1f7d2a9e63_add_user_search_indexes.py"
+SEED_USERS = 2000
+
+pytestmark = pytest.mark.skipif(not TEST_DATABASE_URL.startswith("postgresql"), reason="TEST_DATABASE_URL (PostgreSQL) is not set")
+
+
+def upgrade_search_indexes(conn) -> None:
+    """検索用インデックスのマイグレーションを、接続中のスキーマに対して実行"""
+    spec = importlib.util.spec_from_file_location("add_user_search_indexes", SEARCH_INDEX_MIGRATION)
+    migration = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(migration)
+    with Operations.context(MigrationContext.configure(conn)):
+        migration.upgrade()
+
+
+@pytest.fixture(scope="module")
+def conn():
+    engine = create_engine(TEST_DATABASE_URL)
+    try:
+        with engine.connect() as conn:
+            transaction = conn.begin()
+            try:
+                schema = f"test_user_search_{uuid.uuid4().hex[:8]}"
+                conn.exec_driver_sql(f"CREATE SCHEMA {schema}")
+                # pg_trgm が public にある場合はそれを使い、ない場合は一時スキーマに作成される
+                conn.exec_driver_sql(f"SET LOCAL search_path TO {schema}, public")
+                # 式インデックスはモデルに定義していないため、テーブルのみ作成してインデックスはマイグレーションで作る
+                conn.execute(CreateTable(User.__table__))
+                upgrade_search_indexes(conn)
+                seed(conn, SEED_USERS)
+                yield conn
+            finally:
+                transaction.rollback()
+    finally:
+        engine.dispose()
+
+
+@pytest.mark.parametrize("kwargs, expected", [(kwargs, expected) for _, kwargs, expected in CASES], ids=[label for label, _, _ in CASES])
+def test_search_uses_indexes(conn, kwargs, expected):
+    used = used_indexes(conn, kwargs)
+    assert expected <= used, f"missing indexes: {sorted(expected - used)}"
@@ -0,0 +1,61 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from app.models.user import User
+from app.services.user_service import UserService, decode_cursor, encode_cursor
+
+pytestmark = pytest.mark.anyio
+
+CREATED = datetime(2026, 1, 1)
+
+
+@pytest.fixture
+async def users(db):
+    # 作成日時が同じユーザーを含め、(created_date, id) で順序が決まることを確認する
+    rows = [
+        User(email=f"user{i}@example.com", name=f"user{i}", is_active=True, created_date=CREATED + timedelta(minutes=i // 2))
+        for i in range(7)
+    ]
+    rows.append(User(email="percent%@example.com", name="100%_match", is_active=True, created_date=CREATED))
+    db.add_all(rows)
+    await db.commit()
+    return rows
+
+
+async def test_keyset_pagination_visits_every_user_once(db, users):
+    service = UserService(db)
+    seen, after = [], None
+    while True:
+        # エンドポイントと同じく1件多く取得して次ページの有無を判定する
+        page = await service.search(limit=3, after=after)
+        seen += [user.id for user in page[:2]]
+        if len(page) <= 2:
+            break
+        after = decode_cursor(encode_cursor(page[1]))
+
+    expected = sorted(users, key=lambda user: (user.created_date, user.id), reverse=True)
+    assert seen == [user.id for user in expected]
+
+
+def test_cursor_round_trip_and_rejects_garbage():
+    user = User(id=42, created_date=datetime(2026, 1, 2, 3, 4, 5, 678900))
+
+    assert decode_cursor(encode_cursor(user)) == (user.created_date, 42)
+    with pytest.raises(ValueError):
+        decode_cursor("not-a-cursor")
+
+
+async def test_prefix_search_is_case_insensitive(db, users):
+    found = await UserService(db).search(limit=10, q="USER1")
+
+    assert [user.email for user in found] == ["user1@example.com"]
+
+
+async def test_prefix_search_escapes_wildcards(db, users):
+    service = UserService(db)
+
+    assert [user.name for user in await service.search(limit=10, q="100%_")] == ["100%_match"]
+    # % や _ をワイルドカードとして扱わない
+    assert await service.search(limit=10, q="%") == []
+    assert await service.search(limit=10, q="user_") == []